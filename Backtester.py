@@ -0,0 +1,111 @@
+# replays recorded market data through the real bots, as fast as they can take it
+# each exchange's ticks are recorded into its own store in config.TICK_DIR (see TickRecorder.py / TickStore.py).
+# the streams are merged by timestamp. every timestamp is one bot tick, which sees the latest recorded
+# books of every exchange. nothing sleeps and nothing goes over the network: the brokers take their
+# books from the replay (see Broker.update_multiple_depths) instead of the exchanges.
+# bots are built offline (see config.OFFLINE): exchanges take their metadata (pairs, majors, min volumes)
+# from config.METADATA_CACHE only, and there has to be one. bots built elsewhere need config.OFFLINE set too.
+# simulated profit assumes every opportunity is taken once, on the tick it shows up (see Bot.opportunities).
+# an opportunity that is still there, unchanged, on the next tick isn't counted again.
+
+import heapq
+import os
+import time
+from operator import itemgetter
+
+import config
+from TickStore import TickReader
+
+
+def make_bot(strategy, xchg_name=None):
+    # the bot main_pair.py / main_tri.py would run, strategy = 'pair' or 'tri' (on exchange xchg_name)
+    config.OFFLINE = True
+    if strategy == 'pair':
+        import config_pair
+        from PairwiseBot import PairwiseBot
+        return PairwiseBot(config_pair.EXCHANGES, config_pair.TICK_PERIOD, config_pair.DEPTH_LIMIT)
+    if strategy == 'tri':
+        import config_tri
+        from TriangularBot import TriangularBot
+        return TriangularBot(xchg_name, config_tri.TARGETS[xchg_name], config_tri.TICK_PERIOD)
+    raise ValueError('unknown strategy {}'.format(strategy))
+
+
+def tagged(stream, xchg_name):
+    for t, depths in stream:
+        yield t, xchg_name, depths
+
+
+class Backtester(object):
+    def __init__(self, bot, tick_dir=config.TICK_DIR):
+        self.bot = bot  # a PairwiseBot or TriangularBot, not started
+        self.tick_dir = tick_dir
+        self.stats = {}
+        self.seen = {}  # opportunities of the previous tick
+        self.opportunities = 0
+        self.profit = {}  # profit[currency] = simulated profit
+
+    def streams(self, start=None, end=None):
+        # one recorded stream per exchange the bot watches, only the markets it reads are decoded
+        streams = []
+        for xchg, pairs in self.bot.watched_pairs().items():
+            path = os.path.join(self.tick_dir, xchg.name)
+            if not os.path.isdir(path):
+                self.bot.log.info('no recorded ticks for {} in {}'.format(xchg.name, path))
+                continue
+            # recorded books may be the other way around from what the bot asks for this run
+            markets = set(a + '_' + b for a, b in pairs) | set(b + '_' + a for a, b in pairs)
+            stream = TickReader(path).replay(start, end, markets, xchg.fixed_point_digits)
+            streams.append(tagged(stream, xchg.name))
+        return streams
+
+    def run(self, start=None, end=None):
+        """
+        replays the ticks recorded between start and end (timestamps, None for no bound).
+        returns the stats, also kept in self.stats.
+        """
+        bot = self.bot
+        bot.init()
+        books = {}  # books[xchg_name]['base_alt'] = latest recorded OrderBook
+        bot.backtest_data = {'ticks': {}}
+        self.seen, self.opportunities, self.profit = {}, 0, {}
+        ticks = events = 0
+        first = current = None
+        started = time.perf_counter()
+        for t, xchg_name, depths in heapq.merge(*self.streams(start, end), key=itemgetter(0)):
+            if current is not None and t != current:
+                self.tick(ticks, books)
+                ticks += 1
+            books.setdefault(xchg_name, {}).update(depths)
+            events += 1
+            if first is None:
+                first = t
+            current = t
+        if current is not None:
+            self.tick(ticks, books)
+            ticks += 1
+        bot.backtest_data = None
+
+        elapsed = time.perf_counter() - started
+        span = current - first if current is not None else 0.0
+        self.stats = {'ticks': ticks, 'snapshots': events, 'seconds': elapsed,
+                      'ticks_per_second': ticks / elapsed if elapsed > 0 else 0.0,
+                      'recorded_seconds': span, 'speedup': span / elapsed if elapsed > 0 else 0.0,
+                      'opportunities': self.opportunities, 'profit': dict(self.profit)}
+        bot.log.info('replayed {} ticks ({}s recorded) in {:.2f}s, {:.0f} ticks/s, {:.0f}x real time'.format(
+            ticks, span, elapsed, self.stats['ticks_per_second'], self.stats['speedup']))
+        bot.log.info('{} opportunities, simulated profit {}'.format(self.opportunities, self.profit))
+        return self.stats
+
+    def tick(self, tick_i, books):
+        # only the current tick is kept around, weeks of ticks never sit in memory at once
+        self.bot.tick_i = tick_i
+        self.bot.backtest_data['ticks'] = {tick_i: books}
+        self.bot.tick()
+        opportunities = self.bot.opportunities
+        for key, (profit, currency) in opportunities.items():
+            # the same trade on unchanged books was already counted, changed books make it a new one
+            if self.seen.get(key) != (profit, currency):
+                self.profit[currency] = self.profit.get(currency, 0) + profit
+                self.opportunities += 1
+        self.seen = dict(opportunities)
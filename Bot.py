@@ -6,9 +6,12 @@
 import abc
 import logging
 import logging.handlers
-import time
 from threading import Thread
 
+from TickScheduler import TickScheduler
+from WorkerPool import current_owner, get_pool
+from exchanges.api.rate_limit import get_limiter
+
 
 class Bot(Thread):
     def __init__(self, name, sleep):
@@ -25,6 +28,11 @@ class Bot(Thread):
         self.log.addHandler(file_handler)
         self.log.addHandler(stream_handler)
         self.sleep = sleep
+        # set by the Backtester, ticks then read their books from the replay instead of the exchanges
+        self.backtest_data = None
+        self.tick_i = 0
+        # profitable trades seen by the last tick, {key: (profit, currency the profit is in)}
+        self.opportunities = {}
 
     @abc.abstractmethod
     def init(self):
@@ -34,17 +42,39 @@ class Bot(Thread):
     def tick(self):
         return NotImplemented
     
+    def watched_pairs(self):
+        # {<Exchange>: [(base, alt), ...]} of every market the bot reads
+        return {}
+
+    def data_event(self):
+        # threading.Event set when fresh book data arrives, the bot then ticks right away
+        # instead of waiting out the period. None to tick on the period only.
+        return None
+
+    def requests_per_tick(self):
+        # {api name: number of requests} one tick makes, ticks wait until the rate limits allow them.
+        # None when ticks don't poll the exchanges.
+        return None
+
+    def budget_wait(self):
+        # seconds until the exchanges' request budgets cover another tick
+        requests = self.requests_per_tick()
+        return get_limiter().wait_time(requests) if requests else 0
+
     def kill(self):
         self.error = True
 
     def run(self):
+        current_owner.set(self.logger_name)  # blocking exchange calls from this thread are queued under our name
         self.init()
-        start = time.time()
-        last_tick = start - self.sleep
+        self.scheduler = TickScheduler(self.sleep, self.data_event(), self.budget_wait)
+        missed = 0
         while not self.error:
-            delta = time.time() - last_tick
-            if delta < self.sleep:
-                # sleep for the remaining seconds
-                time.sleep(self.sleep - delta)
-            last_tick = time.time()
+            self.scheduler.wait()
+            if self.scheduler.stats['missed'] > missed:
+                self.log.info('overloaded, skipped {} ticks ({} so far)'.format(
+                    self.scheduler.stats['missed'] - missed, self.scheduler.stats['missed']))
+                missed = self.scheduler.stats['missed']
+            # anything still queued for us belongs to a tick we already gave up on
+            get_pool().cancel(self.logger_name)
             self.tick()
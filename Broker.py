@@ -1,6 +1,8 @@
 # class for Broker
 import sys
-from utils import get_swapped_order
+import time
+
+from OrderBook import OrderBook
 
 
 class Broker(object):
@@ -17,15 +19,15 @@ class Broker(object):
         #  flip my market slugs or not.
         self.depth = {}
         self.orders = []  # list of outstanding orders
+        self.fetched = set()  # slugs fetched since the last clear() / new_tick()
+        self.updated = set()  # slugs whose levels changed in the last update call
+        self.recorder = None  # TickRecorder every fetched book goes to, see config.RECORD_TICKS
 
     def get_highest_bid(self, pair):
         base, alt = pair
         slug = base + "_" + alt
         if slug in self.depth:
-            if len(self.depth[slug]['bids']) > 0:
-                return self.depth[slug]['bids'][0].p
-            else:
-                return None
+            return self.depth[slug].best_bid()
         else:
             self.xchg.log.info('No {} in depth list'.format(slug))
             return None
@@ -40,10 +42,7 @@ class Broker(object):
         base, alt = pair
         slug = base + "_" + alt
         if slug in self.depth:
-            if len(self.depth[slug]['asks']) > 0:
-                return self.depth[slug]['asks'][0].p
-            else:
-                return None
+            return self.depth[slug].best_ask()
         else:
             self.xchg.log.info('No {} in depth list'.format(slug))
             return None
@@ -70,6 +69,7 @@ class Broker(object):
         fly when we need it again.
 
         type = 'bids' or 'asks'
+        returns the BookSide for that type (parallel price/volume arrays, best first)
         """
         base, alt = pair
         slug = base + '_' + alt
@@ -78,18 +78,18 @@ class Broker(object):
 
         return None
 
-    def update_depth(self, pair, backtest_data=None, tick_i=0):
+    def update_depth(self, pair, backtest_data=None, tick_i=0, depth=None):
         # updates the highest_bid and lowest_ask for given pair
-        # depths are sorted by best first
+        # depths are sorted by best first, depth = levels to fetch per side (None for all)
         base, alt = pair
         slug = base + "_" + alt
         if backtest_data is not None:
             # load in backtest data provided by the bot
             try:
-                self.depth[slug] = backtest_data['ticks'][tick_i][self.xchg.name][slug]
+                self.depth[slug] = OrderBook.from_orders(backtest_data['ticks'][tick_i][self.xchg.name][slug])
             except:
                 print('uh oh, missing depth data from this exchange')
-                self.depth[slug] = {"bids": [], "asks": []}
+                self.depth[slug] = OrderBook()
             """
             TODO - if backtesting, need to modify depth so that it appears as if we had
             actually moved the market with our previous orders.
@@ -98,16 +98,18 @@ class Broker(object):
             """
         else:
             try:
-                self.depth[slug] = self.xchg.get_depth(base, alt)
+                self.depth[slug] = self.xchg.get_depth(base, alt, depth)
                 # sort the depth by descending bid price and ascending ask price
-                self.depth[slug]['bids'].sort(key=lambda x: x.p, reverse=True)
-                self.depth[slug]['asks'].sort(key=lambda x: x.p, reverse=False)
+                if not self.xchg.sorted_depth:
+                    self.depth[slug].ensure_sorted()
+                if self.recorder is not None:
+                    self.recorder.record(time.time(), self.xchg.name, {slug: self.depth[slug]})
             except:
-                self.depth[slug] = {'bids': [], 'asks': []}  # keep going
+                self.depth[slug] = OrderBook()  # keep going
                 e = sys.exc_info()[0]
                 self.xchg.log.info('{} error: {}'.format(self.xchg.name, e))
 
-    def update_multiple_depths(self, pairs, backtest_data=None, tick_i=0):
+    def update_multiple_depths(self, pairs, backtest_data=None, tick_i=0, depth=None):
         """
         TODO - it is very likely that when backtesting, we will see an opportunity come up
         multiple times on several ticks, even across large intervals like 1 minute
@@ -118,28 +120,56 @@ class Broker(object):
         the next tick will probably still display 0.4BTC being sold. I need to deduct 0.2 on the next tick
         """
 
-        # assume that we have called broker.clear() before this.
-        # remove all pairs that have already been updated in brokers!
-        
+        # assume that we have called broker.clear() or broker.new_tick() before this.
+        # skip all pairs that have already been updated in brokers!
+        # depth limits the levels fetched per side, for all pairs or per pair (see Exchange.depth_limit)
+        pairs = self.pairs_to_fetch(pairs)
+        if backtest_data is not None:
+            depths = self.backtest_depths(pairs, backtest_data['ticks'][tick_i].get(self.xchg.name, {}))
+            self.set_multiple_depths(pairs, depths, record=False)
+        else:
+            self.set_multiple_depths(pairs, self.xchg.get_multiple_depths(pairs, depth))
+
+    def backtest_depths(self, pairs, recorded):
+        # recorded = {'base_alt': <OrderBook>} of this exchange at the current backtest tick (see Backtester.py)
+        depths = {}
         for (A, B) in pairs:
             slug = A + '_' + B
-            if slug in self.depth:
-                pairs.remove((A, B))  # already has been updated!
-
-        #TODO: Improve readability of the codes below
-        depths = self.xchg.get_multiple_depths(pairs)
-        self.depth.update(depths)
+            swapped_slug = B + '_' + A
+            if slug in recorded:
+                depths[slug] = OrderBook.from_orders(recorded[slug])
+            elif swapped_slug in recorded:
+                # recorded the other way around
+                depths[slug] = recorded[swapped_slug].inverted()
+            else:
+                depths[slug] = OrderBook()
+        return depths
+
+    def pairs_to_fetch(self, pairs):
+        # the pairs whose books haven't been fetched yet this tick
+        return [(A, B) for (A, B) in pairs if A + '_' + B not in self.fetched]
+
+    def set_multiple_depths(self, pairs, depths, record=True):
+        # takes in books fetched for pairs, e.g. by the FetchEngine for several exchanges at once
+        # record=False keeps them out of the tick recorder (e.g. when they come from a backtest)
+        self.updated = set()
+        for slug, book in depths.items():
+            # sort the depths by descending bid price and ascending ask price
+            # only books that are actually out of order get sorted,
+            # and books we did not fetch this call are left alone
+            if not self.xchg.sorted_depth:
+                book.ensure_sorted()
+            old = self.depth.get(slug)
+            if old is None or not old.same_levels(book):
+                self.updated.add(slug)
+            self.depth[slug] = book
+            self.fetched.add(slug)
+        if record and self.recorder is not None and depths:
+            self.recorder.record(time.time(), self.xchg.name, depths)
         for (A, B) in pairs:
             slug = A + '_' + B
             swapped_slug = B + '_' + A
-            self.depth[swapped_slug] = {}
-            self.depth[swapped_slug]['asks'] = [get_swapped_order(o) for o in depths[slug]['bids']]
-            self.depth[swapped_slug]['bids'] = [get_swapped_order(o) for o in depths[slug]['asks']]
-        # sort the depths by descending bid price and ascending ask price
-        # some depths have already been updated
-        for slug in self.depth:
-            self.depth[slug]['bids'].sort(key=lambda x: x.p, reverse=True)
-            self.depth[slug]['asks'].sort(key=lambda x: x.p, reverse=False)
+            self.depth[swapped_slug] = depths[slug].inverted()  # lazy view, levels are converted when read
 
     def update_all_balances(self):
         # key method!! when running in paper/live mode, fetch data from xchg
@@ -155,6 +185,12 @@ class Broker(object):
         if self.mode == 'PAPER' or self.mode == 'LIVE':
             self.balances = {}
         self.depth = {}
+        self.fetched = set()
+
+    def new_tick(self):
+        # lets update_multiple_depths refetch every pair while keeping the previous books around,
+        # so that it can tell which of them actually changed (see self.updated)
+        self.fetched = set()
 
     def buy(self, pair, price, volume):
         pass
@@ -0,0 +1,152 @@
+import heapq
+import math
+
+
+class CycleFinder(object):
+    """
+    Profitable cycle detection over all the markets of a single exchange.
+    currencies are nodes, and every market X_Y gives an edge X -> Y (sell X at the
+    highest X_Y bid) with weight -log(bid * (1 - fee)). a cycle is profitable when
+    its weights sum to less than -log(threshold), i.e. its spread exp(-sum) > threshold.
+
+    cycles of min_length to max_length legs are found with a hop-bounded Bellman-Ford
+    relaxation that keeps the paths_per_node lightest simple paths to every currency
+    at every hop, so a lighter walk through a currency twice doesn't hide a simple cycle.
+    one search costs O(max_length * paths_per_node * edges), however many hubs there are.
+    it finds the best cycle through an edge, not every one: a cycle that loses out to
+    paths_per_node lighter paths on the way is only found once those change.
+    update_market() only re-checks what the changed edges can affect:
+    the known cycles that use them, and the best cycle through each changed edge.
+    """
+
+    def __init__(self, trading_fee, max_length=5, min_length=3, threshold=1.0, paths_per_node=4):
+        self.log_fee = -math.log(1 - float(trading_fee))
+        self.max_length = max_length
+        self.min_length = min_length
+        self.paths_per_node = paths_per_node
+        self.limit = -math.log(threshold)
+        self.edges = {}  # edges[X][Y] = weight of selling X for Y
+        self.cycles = {}  # cycles[(A, B, ...)] = total weight of every known profitable cycle
+        self.edge_cycles = {}  # edge_cycles[(X, Y)] = set of known cycles going through X -> Y
+
+    @classmethod
+    def from_broker(cls, broker, pairs, max_length=5, min_length=3, threshold=1.0):
+        finder = cls(broker.xchg.trading_fee, max_length, min_length, threshold)
+        for pair in pairs:
+            finder.set_edge_from_broker(broker, pair)
+            finder.set_edge_from_broker(broker, (pair[1], pair[0]))
+        finder.scan()
+        return finder
+
+    def set_edge(self, X, Y, bid):
+        # bid = None (or 0) removes the edge
+        self.edges.setdefault(X, {})
+        self.edges.setdefault(Y, {})
+        if bid:
+            self.edges[X][Y] = -math.log(float(bid)) + self.log_fee
+        else:
+            self.edges[X].pop(Y, None)
+
+    def set_edge_from_broker(self, broker, pair):
+        X, Y = pair
+        book = broker.depth.get(X + '_' + Y)
+        self.set_edge(X, Y, book.best_bid() if book is not None else None)
+
+    def update_market(self, broker, pair):
+        """
+        re-reads both directions of one market from the broker's books and re-checks
+        only the cycles that can go through them.
+        returns the profitable cycles found or changed by this update.
+        """
+        X, Y = pair
+        self.set_edge_from_broker(broker, (X, Y))
+        self.set_edge_from_broker(broker, (Y, X))
+        return self.recheck([(X, Y), (Y, X)])
+
+    def update_markets(self, broker, pairs):
+        found = {}
+        for pair in pairs:
+            for spread, cycle in self.update_market(broker, pair):
+                found[cycle] = spread
+        return sorted(((spread, cycle) for cycle, spread in found.items()), reverse=True)
+
+    def recheck(self, changed_edges):
+        found = []
+        for X, Y in changed_edges:
+            # known cycles through this edge may have stopped being profitable
+            for cycle in list(self.edge_cycles.get((X, Y), ())):
+                weight = self.cycle_weight(cycle)
+                if weight is None or weight >= self.limit:
+                    self._forget(cycle)
+                else:
+                    self.cycles[cycle] = weight
+                    found.append(cycle)
+            # and the edge may have opened a new one
+            if Y in self.edges.get(X, {}):
+                path, weight = self._best_path(Y, X, self.min_length - 1, self.max_length - 1)
+                if path is not None and weight + self.edges[X][Y] < self.limit:
+                    found.append(self._remember((X,) + path[:-1]))
+        return [(math.exp(-self.cycles[cycle]), cycle) for cycle in set(found) if cycle in self.cycles]
+
+    def scan(self):
+        """
+        full search: the best cycle through every currency.
+        returns every known profitable cycle as a list of (spread, cycle), best first.
+        """
+        for node in list(self.edges):
+            path, weight = self._best_path(node, node, self.min_length, self.max_length)
+            if path is not None and weight < self.limit:
+                self._remember(path[:-1])
+        return self.profitable_cycles()
+
+    def profitable_cycles(self):
+        return sorted(((math.exp(-weight), cycle) for cycle, weight in self.cycles.items()), reverse=True)
+
+    def cycle_weight(self, cycle):
+        weight = 0
+        for X, Y in zip(cycle, cycle[1:] + cycle[:1]):
+            if Y not in self.edges.get(X, {}):
+                return None
+            weight += self.edges[X][Y]
+        return weight
+
+    def _best_path(self, src, dst, min_hops, max_hops):
+        """
+        hop-bounded Bellman-Ford: the lightest simple path src -> ... -> dst of min_hops to
+        max_hops edges it can find. returns (path, weight) with path = (src, ..., dst), or (None, None).
+        every hop relaxes the edges out of the paths kept at the last one. a path is only extended
+        to currencies it hasn't visited, and only the paths_per_node lightest per currency are kept.
+        """
+        level = {src: [(0.0, (src,))]}
+        best_path, best_weight = None, None
+        for hops in range(1, max_hops + 1):
+            nxt = {}
+            for X, paths in level.items():
+                for Y, w in self.edges.get(X, {}).items():
+                    for d, path in paths:
+                        if Y == dst:
+                            if hops >= min_hops and (best_weight is None or d + w < best_weight):
+                                best_path, best_weight = path + (dst,), d + w
+                        elif Y not in path:
+                            nxt.setdefault(Y, []).append((d + w, path + (Y,)))
+            level = {Y: heapq.nsmallest(self.paths_per_node, paths) for Y, paths in nxt.items()}
+            if not level:
+                break
+        return best_path, best_weight
+
+    def _canonical(self, cycle):
+        # same cycle, rotated to start at its smallest currency
+        i = cycle.index(min(cycle))
+        return tuple(cycle[i:] + cycle[:i])
+
+    def _remember(self, cycle):
+        cycle = self._canonical(list(cycle))
+        self.cycles[cycle] = self.cycle_weight(cycle)
+        for edge in zip(cycle, cycle[1:] + cycle[:1]):
+            self.edge_cycles.setdefault(edge, set()).add(cycle)
+        return cycle
+
+    def _forget(self, cycle):
+        self.cycles.pop(cycle, None)
+        for edge in zip(cycle, cycle[1:] + cycle[:1]):
+            self.edge_cycles.get(edge, set()).discard(cycle)
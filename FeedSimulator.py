@@ -0,0 +1,150 @@
+# local stand-in for an exchange's streaming market data
+# serves the protocol described in MarketFeed.py from a random walk over a few books,
+# so the streaming path can be run and tested without touching the network.
+
+import json
+import random
+import socketserver
+import threading
+from decimal import Decimal
+
+PRICE_STEP = Decimal('0.00000001')
+
+
+class _FeedHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        sim = self.server.simulator
+        try:
+            for line in self.rfile:
+                msg = json.loads(line.decode())
+                if msg.get('type') == 'subscribe':
+                    sim.subscribe(self.wfile, msg['markets'])
+        except (OSError, ValueError):
+            pass
+        finally:
+            sim.unsubscribe(self.wfile)
+
+
+class FeedSimulator(object):
+    """
+    books = {'ETH_BTC': (bids, asks)} with bids/asks as lists of (price, volume) strings
+    period = seconds between generated deltas
+    drop_rate = fraction of updates that are never sent (the sequence number still moves),
+                which makes the clients see gaps and resync
+    """
+
+    def __init__(self, books, host='127.0.0.1', port=0, period=0.05, drop_rate=0.0, seed=None):
+        self.books = {}
+        for market, (bids, asks) in books.items():
+            self.books[market] = {'bids': {Decimal(p): Decimal(v) for p, v in bids},
+                                  'asks': {Decimal(p): Decimal(v) for p, v in asks}}
+        self.seq = {market: 0 for market in books}
+        self.period = period
+        self.drop_rate = drop_rate
+        self.random = random.Random(seed)
+        self.clients = {}  # wfile -> set of subscribed markets
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+
+        self.server = socketserver.ThreadingTCPServer((host, port), _FeedHandler)
+        self.server.daemon_threads = True
+        self.server.simulator = self
+
+    @property
+    def address(self):
+        return self.server.server_address
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        threading.Thread(target=self.run, daemon=True).start()
+
+    def stop(self):
+        self.stopped.set()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def run(self):
+        while not self.stopped.wait(self.period):
+            self.step()
+
+    def subscribe(self, wfile, markets):
+        with self.lock:
+            subscribed = self.clients.setdefault(wfile, set())
+            for market in markets:
+                if market in self.books:
+                    subscribed.add(market)
+                    self._send(wfile, self.snapshot(market))
+
+    def unsubscribe(self, wfile):
+        with self.lock:
+            self.clients.pop(wfile, None)
+
+    def snapshot(self, market):
+        book = self.books[market]
+        return {'type': 'snapshot', 'market': market, 'seq': self.seq[market],
+                'bids': [[str(p), str(book['bids'][p])] for p in sorted(book['bids'], reverse=True)],
+                'asks': [[str(p), str(book['asks'][p])] for p in sorted(book['asks'])]}
+
+    def step(self):
+        # generates (and broadcasts) one random delta
+        with self.lock:
+            market = self.random.choice(sorted(self.books))
+            changes = self.random_changes(market)
+            self.seq[market] += 1
+            msg = {'type': 'update', 'market': market, 'seq': self.seq[market], 'changes': changes}
+            if self.random.random() < self.drop_rate:
+                return msg
+            for wfile, markets in list(self.clients.items()):
+                if market in markets:
+                    self._send(wfile, msg)
+        return msg
+
+    def random_changes(self, market):
+        book = self.books[market]
+        side = self.random.choice(['bids', 'asks'])
+        levels = book[side]
+        best_bid = max(book['bids']) if book['bids'] else None
+        best_ask = min(book['asks']) if book['asks'] else None
+        action = self.random.random()
+
+        if action < 0.2 and len(levels) > 1:
+            price = self.random.choice(sorted(levels))
+            del levels[price]
+            volume = Decimal(0)
+        elif action < 0.4 or not levels:
+            # new level somewhere within 1% of the best price, never crossing the book
+            if side == 'bids':
+                ref = best_bid if best_bid is not None else best_ask
+                price = ref * Decimal(1 - self.random.random() * 0.01)
+                if best_ask is not None and price >= best_ask:
+                    price = best_ask - PRICE_STEP
+            else:
+                ref = best_ask if best_ask is not None else best_bid
+                price = ref * Decimal(1 + self.random.random() * 0.01)
+                if best_bid is not None and price <= best_bid:
+                    price = best_bid + PRICE_STEP
+            price = price.quantize(PRICE_STEP)
+            volume = Decimal(self.random.randint(1, 100000)) / 1000
+            levels[price] = volume
+        else:
+            price = self.random.choice(sorted(levels))
+            volume = Decimal(self.random.randint(1, 100000)) / 1000
+            levels[price] = volume
+
+        return [[side, str(price), str(volume)]]
+
+    def _send(self, wfile, msg):
+        try:
+            wfile.write((json.dumps(msg) + '\n').encode())
+            wfile.flush()
+        except OSError:
+            self.clients.pop(wfile, None)
+
+
+if __name__ == "__main__":
+    sim = FeedSimulator({'ETH_BTC': ([('0.05', '3'), ('0.049', '5')], [('0.051', '2'), ('0.052', '4')]),
+                         'LTC_BTC': ([('0.01', '30'), ('0.009', '50')], [('0.0101', '20')])},
+                        port=9001, period=0.01)
+    sim.start()
+    print('feed simulator listening on {}:{}'.format(*sim.address))
+    sim.stopped.wait()
@@ -0,0 +1,126 @@
+# market data fetch engine
+# every exchange's depth requests run as coroutines on ONE asyncio event loop (in its own thread),
+# instead of one thread per request. each exchange gets its own connection pool and a cap on
+# how many of its requests are in flight at once.
+# bots stay synchronous: get_multiple_depths / get_all_depths block until the results are in.
+# blocking calls (adapters without an async api) go to the shared WorkerPool, queued under
+# the exchange and the bot that asked for them.
+
+import asyncio
+import threading
+from concurrent.futures import TimeoutError
+
+import config
+
+try:
+    import aiohttp
+except ImportError:  # without aiohttp, requests run on the WorkerPool with the pooled requests sessions
+    aiohttp = None
+
+from WorkerPool import current_owner, get_pool
+from exchanges.api.http_pool import get_session
+from exchanges.api.rate_limit import get_limiter
+
+# HTTP request timeout in seconds
+TIMEOUT = 10.0
+
+
+class FetchEngine(object):
+    def __init__(self, concurrency=config.FETCH_CONCURRENCY):
+        self.concurrency = concurrency  # max requests in flight per exchange
+        self.loop = asyncio.new_event_loop()
+        # only touched from the loop thread
+        self.sessions = {}
+        self.semaphores = {}
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.run(self.close_sessions())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+    def run(self, coro, timeout=None):
+        """
+        sync facade: runs coro on the engine's loop and waits for its result.
+        after timeout seconds the whole thing is cancelled (including its queued blocking calls)
+        and TimeoutError is raised.
+        """
+        future = asyncio.run_coroutine_threadsafe(self.owned(current_owner.get(), coro), self.loop)
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            future.cancel()
+            raise
+
+    async def owned(self, owner, coro):
+        # the coroutine (and every task it starts) works on behalf of owner
+        current_owner.set(owner)
+        return await coro
+
+    async def close_sessions(self):
+        for session in self.sessions.values():
+            await session.close()
+        self.sessions = {}
+
+    def semaphore(self, name):
+        if name not in self.semaphores:
+            self.semaphores[name] = asyncio.Semaphore(self.concurrency)
+        return self.semaphores[name]
+
+    def session(self, name):
+        if name not in self.sessions:
+            connector = aiohttp.TCPConnector(limit_per_host=self.concurrency)
+            self.sessions[name] = aiohttp.ClientSession(connector=connector,
+                                                        timeout=aiohttp.ClientTimeout(total=TIMEOUT))
+        return self.sessions[name]
+
+    async def get(self, name, url):
+        """
+        GET url on behalf of the exchange name, returns the response body as text.
+        at most self.concurrency of these run at once per exchange, within its rate limit.
+        """
+        async with self.semaphore(name):
+            if aiohttp is None:
+                # the pooled session waits for the rate limit itself
+                response = await self.run_blocking(name, get_session(name).get, url, timeout=TIMEOUT)
+                response.raise_for_status()
+                return response.content.decode()
+            await get_limiter().async_acquire(name, 'public')
+            async with self.session(name).get(url) as response:
+                response.raise_for_status()
+                return await response.text()
+
+    async def run_blocking(self, name, func, *args, **kwargs):
+        # for adapters that only have a blocking api, runs func on the WorkerPool under exchange name
+        future = get_pool().submit(name, func, *args, owner=current_owner.get(), **kwargs)
+        return await asyncio.wrap_future(future, loop=self.loop)
+
+    def get_multiple_depths(self, xchg, pairs, timeout=None, depth=None):
+        return self.run(xchg.async_get_multiple_depths(self, pairs, depth), timeout)
+
+    def get_all_depths(self, pairs_by_xchg, timeout=None, depth=None):
+        """
+        pairs_by_xchg = {<Exchange>: [(base, alt), ...]}
+        fetches every exchange's books at once, returns {<Exchange>: {'base_alt': <OrderBook>}}
+        depth limits the levels per side, see Exchange.depth_limit
+        """
+        async def fetch_all():
+            xchgs = list(pairs_by_xchg)
+            results = await asyncio.gather(*(xchg.async_get_multiple_depths(self, pairs_by_xchg[xchg], depth)
+                                             for xchg in xchgs))
+            return dict(zip(xchgs, results))
+
+        return self.run(fetch_all(), timeout)
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    # the process-wide engine, every bot shares its loop
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = FetchEngine()
+        return _engine
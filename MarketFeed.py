@@ -0,0 +1,133 @@
+# streaming market data
+# keeps a broker's books up to date from a feed of per-level deltas instead of
+# refetching whole REST snapshots every tick.
+#
+# the feed speaks newline-delimited JSON over TCP:
+#   client -> feed  {"type": "subscribe", "markets": ["ETH_BTC", ...]}
+#   feed -> client  {"type": "snapshot", "market": "ETH_BTC", "seq": 17,
+#                    "bids": [["0.05", "3"], ...], "asks": [...]}
+#   feed -> client  {"type": "update", "market": "ETH_BTC", "seq": 18,
+#                    "changes": [["bids", "0.05", "0"], ["asks", "0.051", "2.5"]]}
+# a volume of 0 deletes the level. markets are in the exchange's own orientation,
+# subscribing again to a market makes the feed send a fresh snapshot.
+# see FeedSimulator.py for a local stand-in.
+
+import json
+import logging
+import socket
+import threading
+import time
+
+from OrderBook import OrderBook
+
+
+class MarketFeed(threading.Thread):
+    def __init__(self, broker, address, pairs, logger_name, reconnect_delay=1.0):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.broker = broker
+        self.address = address  # (host, port)
+        self.log = logging.getLogger(logger_name)
+        self.reconnect_delay = reconnect_delay
+
+        # seq[market] = last applied sequence number, None while we wait for a snapshot
+        self.seq = {}
+        for pair in pairs:
+            test = broker.xchg.get_validated_pair(pair)
+            if test is not None:
+                (base, alt), swapped = test
+                self.seq[base + '_' + alt] = None
+
+        # hold this while reading the books, the feed thread holds it while applying deltas
+        self.lock = threading.Lock()
+        self.updated = set()  # markets changed since the last take_updates()
+        self.event = threading.Event()  # set whenever a book changes
+
+        self.sock = None
+        self.stopped = False
+
+    def run(self):
+        while not self.stopped:
+            try:
+                self.sock = socket.create_connection(self.address)
+                for market in self.seq:
+                    self.seq[market] = None
+                self.subscribe(list(self.seq))
+                for line in self.sock.makefile('r'):
+                    if line.strip():
+                        self.handle_message(json.loads(line))
+            except (OSError, ValueError) as e:
+                if not self.stopped:
+                    self.log.info('{} feed error: {}'.format(self.broker.xchg.name, e))
+            finally:
+                if self.sock is not None:
+                    self.sock.close()
+            if not self.stopped:
+                time.sleep(self.reconnect_delay)
+
+    def stop(self):
+        self.stopped = True
+        if self.sock is not None:
+            try:
+                self.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def subscribe(self, markets):
+        msg = json.dumps({'type': 'subscribe', 'markets': markets}) + '\n'
+        self.sock.sendall(msg.encode())
+
+    def resync(self, market):
+        # drop the book until a fresh snapshot arrives, so nobody trades on it in the meantime
+        base, alt = market.split('_')
+        with self.lock:
+            self.seq[market] = None
+            self.broker.depth.pop(market, None)
+            self.broker.depth.pop(alt + '_' + base, None)
+            self.updated.add(market)
+        self.event.set()
+        self.subscribe([market])
+
+    def handle_message(self, msg):
+        market = msg.get('market')
+        if market not in self.seq:
+            return  # not something we asked for
+
+        if msg['type'] == 'snapshot':
+            book = OrderBook.from_levels(msg['bids'], msg['asks'], self.broker.xchg.fixed_point_digits)
+            book.ensure_sorted()
+            base, alt = market.split('_')
+            with self.lock:
+                self.broker.depth[market] = book
+                self.broker.depth[alt + '_' + base] = book.inverted()
+                self.seq[market] = msg['seq']
+                self.updated.add(market)
+
+        elif msg['type'] == 'update':
+            last = self.seq[market]
+            if last is None or msg['seq'] <= last:
+                return  # waiting for a snapshot, or an old message
+            if msg['seq'] != last + 1:
+                self.log.info('{} feed gap on {}: expected seq {}, got {}. resyncing'.format(
+                    self.broker.xchg.name, market, last + 1, msg['seq']))
+                self.resync(market)
+                return
+            with self.lock:
+                book = self.broker.depth[market]
+                for side, price, volume in msg['changes']:
+                    book[side].update_level(price, volume)
+                self.seq[market] = msg['seq']
+                self.updated.add(market)
+
+        else:
+            return
+
+        self.event.set()
+
+    def take_updates(self):
+        # returns (and forgets) the markets that changed since the last call
+        with self.lock:
+            updated = self.updated
+            self.updated = set()
+            self.event.clear()
+        return updated
@@ -0,0 +1,51 @@
+# on-disk cache of exchange metadata (tradeable pairs, min volumes, majors, fees)
+# so a restart doesn't have to wait on every exchange's metadata endpoints.
+#
+# the file is one JSON object keyed by exchange name:
+#   {"Poloniex": {"time": 1476766800.0, "data": {...}}, ...}
+# decimals are stored as strings, see Exchange.fetch_metadata / set_metadata.
+
+import json
+import os
+import threading
+import time
+
+# several exchanges share the file and refresh it from their own threads
+_lock = threading.Lock()
+
+
+class MetadataCache(object):
+    def __init__(self, path, ttl):
+        self.path = path
+        self.ttl = ttl  # seconds before an entry is considered stale
+
+    def _read(self):
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def load(self, name):
+        """
+        returns (data, fresh) for the exchange, fresh = False once the entry is older than ttl.
+        returns (None, False) if nothing is cached.
+        """
+        with _lock:
+            entry = self._read().get(name)
+        if entry is None:
+            return None, False
+        return entry['data'], time.time() - entry['time'] < self.ttl
+
+    def store(self, name, data):
+        with _lock:
+            entries = self._read()
+            entries[name] = {'time': time.time(), 'data': data}
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # write then rename, so a crash never leaves half a file behind
+            tmp = self.path + '.tmp'
+            with open(tmp, 'w') as f:
+                json.dump(entries, f, indent=1, sort_keys=True)
+            os.replace(tmp, self.path)
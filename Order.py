@@ -3,6 +3,9 @@
 
 
 class Order(object):
+    # no per-instance __dict__, orders are created for every level we touch
+    __slots__ = ('p', 'v', 'type', 'pair', 'id', 'time')
+
     def __init__(self, price, volume, type=None, pair=None, order_id=None, timestamp=None):
         """
         markets are usually expressed in terms of BASE_ALT where you buy
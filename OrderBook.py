@@ -0,0 +1,474 @@
+# array-backed orderbook
+# each side of the book is a pair of parallel price/volume arrays instead of
+# one Order object per level. Order objects are only materialized on demand.
+
+from array import array
+from decimal import Decimal
+from itertools import accumulate, islice
+from operator import ge, le
+
+from Order import Order
+from utils import to_fixed, from_fixed
+
+
+class BaseBookSide(object):
+    """
+    accessors shared by BookSide and its views.
+    subclasses provide __len__, price(i), volume(i), cumulative_base_volume(n)
+    and cumulative_alt_volume(n), where the cumulative ones are O(1).
+    """
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield Order(self.price(i), self.volume(i))
+
+    def best_price(self):
+        if len(self) > 0:
+            return self.price(0)
+        return None
+
+    def best_volume(self):
+        if len(self) > 0:
+            return self.volume(0)
+        return None
+
+    def levels(self, n):
+        # the best n levels of this side
+        return self[:n]
+
+    def _cut_level(self, cumulative, desired):
+        # smallest number of levels n with cumulative(n) >= desired (binary search)
+        # returns None if the whole side is not enough
+        lo, hi = 1, len(self)
+        if hi == 0 or cumulative(hi) < desired:
+            return None
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if cumulative(mid) < desired:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def clip_base_volume(self, desired_base_vol):
+        """
+        the best levels of this side, with the last one reduced so that the
+        total base volume == desired_base_vol. None if the side is too thin.
+        """
+        n = self._cut_level(self.cumulative_base_volume, desired_base_vol)
+        if n is None:
+            return None
+        # more than likely, adding on the last order tacked on a bit of overshoot.
+        base_remainder = self.cumulative_base_volume(n) - desired_base_vol
+        return ClippedBookSide(self, n, self.volume(n - 1) - base_remainder)
+
+    def clip_alt_volume(self, desired_alt_vol):
+        """
+        same as clip_base_volume, but the total alt volume == desired_alt_vol
+        """
+        n = self._cut_level(self.cumulative_alt_volume, desired_alt_vol)
+        if n is None:
+            return None
+        # convert the alt overshoot back to units base and subtract from last order
+        alt_remainder = self.cumulative_alt_volume(n) - desired_alt_vol
+        return ClippedBookSide(self, n, self.volume(n - 1) - alt_remainder / self.price(n - 1))
+
+
+def _prefix_total(prefix, n):
+    if n is None or n > len(prefix):
+        n = len(prefix)
+    if n <= 0:
+        return 0
+    return prefix[n - 1]
+
+
+class BookSide(BaseBookSide):
+    """
+    one side (bids or asks) of an orderbook, sorted best price first.
+    prices[i] = price (in units alt) of 1 unit of base at level i
+    volumes[i] = volume of base offered at level i
+    descending = True for bids (highest price first), False for asks
+    digits = None stores Decimals. otherwise prices and volumes are stored as
+             integers in units of 10^-digits in contiguous int64 arrays, and
+             the volume sums are done in exact integer arithmetic.
+    price(i), volume(i) and the volume accessors always return Decimals.
+    cumulative base/alt volumes are computed once on first use and cached,
+    anything that changes the levels has to go through a method that drops them.
+    """
+
+    def __init__(self, prices=None, volumes=None, descending=False, digits=None):
+        if prices is None:
+            prices = [] if digits is None else array('q')
+        if volumes is None:
+            volumes = [] if digits is None else array('q')
+        self.prices = prices
+        self.volumes = volumes
+        self.descending = descending
+        self.digits = digits
+        self.version = 0  # bumped whenever the levels change, views use it to drop stale caches
+        self._base_prefix = None
+        self._alt_prefix = None
+
+    @classmethod
+    def from_levels(cls, levels, descending=False, digits=None, limit=None):
+        # levels is an iterable of (price, volume), given as str, Decimal or int, best first.
+        # limit = keep only the first limit levels, the rest are never converted
+        if limit is not None:
+            levels = islice(levels, limit)
+        if digits is None:
+            prices = []
+            volumes = []
+            for p, v in levels:
+                prices.append(p if isinstance(p, Decimal) else Decimal(p))
+                volumes.append(v if isinstance(v, Decimal) else Decimal(v))
+        else:
+            prices = array('q')
+            volumes = array('q')
+            for p, v in levels:
+                prices.append(to_fixed(p, digits))
+                volumes.append(to_fixed(v, digits))
+        return cls(prices, volumes, descending, digits)
+
+    def __len__(self):
+        return len(self.prices)
+
+    def __iter__(self):
+        if self.digits is None:
+            for p, v in zip(self.prices, self.volumes):
+                yield Order(p, v)
+        else:
+            for i in range(len(self.prices)):
+                yield Order(self.price(i), self.volume(i))
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return BookSide(self.prices[i], self.volumes[i], self.descending, self.digits)
+        return Order(self.price(i), self.volume(i))
+
+    def price(self, i):
+        if self.digits is None:
+            return self.prices[i]
+        return from_fixed(self.prices[i], self.digits)
+
+    def volume(self, i):
+        if self.digits is None:
+            return self.volumes[i]
+        return from_fixed(self.volumes[i], self.digits)
+
+    def set_volume(self, i, volume):
+        if self.digits is None:
+            self.volumes[i] = volume
+        else:
+            self.volumes[i] = to_fixed(volume, self.digits)
+        self._reset_cache()
+
+    def _reset_cache(self):
+        self.version += 1
+        self._base_prefix = None
+        self._alt_prefix = None
+
+    def _find(self, raw_price):
+        # index of the first level that is not better than raw_price (binary search)
+        prices = self.prices
+        lo, hi = 0, len(prices)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if (prices[mid] > raw_price) if self.descending else (prices[mid] < raw_price):
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def update_level(self, price, volume):
+        """
+        applies a single streaming delta: sets the volume offered at price,
+        adding the level if it is new. a volume of 0 deletes the level.
+        the side has to be sorted already.
+        """
+        if self.digits is None:
+            price = price if isinstance(price, Decimal) else Decimal(price)
+            volume = volume if isinstance(volume, Decimal) else Decimal(volume)
+        else:
+            price = to_fixed(price, self.digits)
+            volume = to_fixed(volume, self.digits)
+        i = self._find(price)
+        found = i < len(self.prices) and self.prices[i] == price
+        if volume <= 0:
+            if found:
+                del self.prices[i]
+                del self.volumes[i]
+        elif found:
+            self.volumes[i] = volume
+        else:
+            self.prices.insert(i, price)
+            self.volumes.insert(i, volume)
+        self._reset_cache()
+
+    def base_volume_prefix(self):
+        # prefix[i] = total base volume of levels 0..i (raw storage units)
+        if self._base_prefix is None:
+            self._base_prefix = list(accumulate(self.volumes))
+        return self._base_prefix
+
+    def alt_volume_prefix(self):
+        # prefix[i] = total alt volume of levels 0..i (raw storage units, 2 * digits in fixed-point mode)
+        if self._alt_prefix is None:
+            self._alt_prefix = list(accumulate(p * v for p, v in zip(self.prices, self.volumes)))
+        return self._alt_prefix
+
+    def cumulative_base_volume(self, n=None):
+        # total base volume of the best n levels (all levels if n is None)
+        total = _prefix_total(self.base_volume_prefix(), n)
+        if self.digits is None:
+            return total
+        return from_fixed(total, self.digits)
+
+    def cumulative_alt_volume(self, n=None):
+        # total alt volume of the best n levels (all levels if n is None)
+        total = _prefix_total(self.alt_volume_prefix(), n)
+        if self.digits is None:
+            return total
+        # price * volume carries twice the digits, so this stays exact
+        return from_fixed(total, 2 * self.digits)
+
+    def is_sorted(self):
+        # one linear pass, best price first
+        prices = self.prices
+        if self.descending:
+            return all(map(ge, prices, islice(prices, 1, None)))
+        return all(map(le, prices, islice(prices, 1, None)))
+
+    def ensure_sorted(self):
+        """
+        only sorts if the levels are actually out of order.
+        exchanges that list the side worst price first just get reversed.
+        returns True if anything had to be reordered
+        """
+        if self.is_sorted():
+            return False
+        prices = self.prices
+        if all(map(le if self.descending else ge, prices, islice(prices, 1, None))):
+            self.prices = self.prices[::-1]
+            self.volumes = self.volumes[::-1]
+            self._reset_cache()
+        else:
+            self.sort()
+        return True
+
+    def sort(self):
+        if len(self.prices) < 2:
+            return
+        levels = sorted(zip(self.prices, self.volumes), key=lambda l: l[0], reverse=self.descending)
+        prices = [p for p, v in levels]
+        volumes = [v for p, v in levels]
+        if self.digits is not None:
+            prices = array('q', prices)
+            volumes = array('q', volumes)
+        self.prices = prices
+        self.volumes = volumes
+        self._reset_cache()
+
+    def same_levels(self, other):
+        return isinstance(other, BookSide) and self.digits == other.digits and \
+            self.prices == other.prices and self.volumes == other.volumes
+
+    def inverted(self):
+        # this side seen from the reverse (alt_base) market, see InvertedBookSide
+        return InvertedBookSide(self)
+
+
+class InvertedBookSide(BaseBookSide):
+    """
+    zero-copy view of a BookSide expressed in units of the reverse market.
+    a bid for base_alt is an ask for alt_base (and vice versa), so
+    price(i) = 1 / p and volume(i) = p * v of the underlying level i, and the
+    sort direction flips along with the prices.
+    levels are only converted when they are read, and cached once converted.
+    most of the time the calculators only ever look at the first few.
+    """
+
+    def __init__(self, side):
+        self.side = side
+        self._version = None
+        self._prices = []
+        self._volumes = []
+
+    @property
+    def descending(self):
+        return not self.side.descending
+
+    @property
+    def digits(self):
+        return self.side.digits
+
+    def _level(self, i):
+        if self._version != self.side.version:
+            # underlying levels changed (re-sorted, streaming update...), drop what we converted
+            self._version = self.side.version
+            self._prices = []
+            self._volumes = []
+        if i < 0:
+            i += len(self.side)
+        while len(self._prices) <= i:
+            j = len(self._prices)
+            p = self.side.price(j)
+            self._prices.append(1 / p)
+            self._volumes.append(p * self.side.volume(j))
+        return self._prices[i], self._volumes[i]
+
+    def __len__(self):
+        return len(self.side)
+
+    def __iter__(self):
+        for i in range(len(self.side)):
+            yield Order(*self._level(i))
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            # materialize only the requested levels
+            levels = [self._level(j) for j in range(*i.indices(len(self.side)))]
+            return BookSide([p for p, v in levels], [v for p, v in levels], self.descending)
+        return Order(*self._level(i))
+
+    def price(self, i):
+        return self._level(i)[0]
+
+    def volume(self, i):
+        return self._level(i)[1]
+
+    def cumulative_base_volume(self, n=None):
+        # base of the reverse market is the alt of the underlying one
+        return self.side.cumulative_alt_volume(n)
+
+    def cumulative_alt_volume(self, n=None):
+        # sum of (1 / p) * (p * v) is just the underlying base volume
+        return self.side.cumulative_base_volume(n)
+
+    def is_sorted(self):
+        return self.side.is_sorted()
+
+    def ensure_sorted(self):
+        return self.side.ensure_sorted()
+
+    def sort(self):
+        self.side.sort()
+
+    def same_levels(self, other):
+        return isinstance(other, InvertedBookSide) and self.side.same_levels(other.side)
+
+    def inverted(self):
+        return self.side
+
+
+class ClippedBookSide(BaseBookSide):
+    """
+    lightweight view of the best n levels of a side, with the volume of the
+    last level replaced by last_volume. this is what the clipping functions return,
+    nothing of the underlying side is copied.
+    """
+
+    def __init__(self, side, n, last_volume):
+        self.side = side
+        self.n = n
+        self.last_volume = last_volume
+
+    @property
+    def descending(self):
+        return self.side.descending
+
+    def __len__(self):
+        return self.n
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            levels = [(self.price(j), self.volume(j)) for j in range(*i.indices(self.n))]
+            return BookSide([p for p, v in levels], [v for p, v in levels], self.descending)
+        return Order(self.price(i), self.volume(i))
+
+    def _index(self, i):
+        # negative indices count from the last clipped level, not the last one of the side
+        if i < 0:
+            i += self.n
+        if not 0 <= i < self.n:
+            raise IndexError('clipped level out of range')
+        return i
+
+    def price(self, i):
+        return self.side.price(self._index(i))
+
+    def volume(self, i):
+        i = self._index(i)
+        if i == self.n - 1:
+            return self.last_volume
+        return self.side.volume(i)
+
+    def cumulative_base_volume(self, n=None):
+        if n is not None and n < self.n:
+            return self.side.cumulative_base_volume(n)
+        return self.side.cumulative_base_volume(self.n - 1) + self.last_volume
+
+    def cumulative_alt_volume(self, n=None):
+        if n is not None and n < self.n:
+            return self.side.cumulative_alt_volume(n)
+        return self.side.cumulative_alt_volume(self.n - 1) + self.side.price(self.n - 1) * self.last_volume
+
+
+class OrderBook(object):
+    """
+    bids (someone wants to buy base from you) and asks (someone offering to sell base to you)
+    for a single base_alt market. depth['bids'] / depth['asks'] still work so that
+    code written against the old {'bids': [...], 'asks': [...]} dicts keeps working.
+    """
+
+    def __init__(self, bids=None, asks=None):
+        self.bids = bids if bids is not None else BookSide(descending=True)
+        self.asks = asks if asks is not None else BookSide(descending=False)
+
+    @classmethod
+    def from_levels(cls, bids, asks, digits=None, limit=None):
+        # bids and asks are iterables of (price, volume), limit = levels kept per side
+        return cls(BookSide.from_levels(bids, True, digits, limit),
+                   BookSide.from_levels(asks, False, digits, limit))
+
+    @classmethod
+    def from_orders(cls, book):
+        # converts a legacy {'bids': [Order...], 'asks': [Order...]} dict
+        if isinstance(book, OrderBook):
+            return book
+        return cls.from_levels([(o.p, o.v) for o in book.get('bids', [])],
+                               [(o.p, o.v) for o in book.get('asks', [])])
+
+    def __getitem__(self, type):
+        if type == 'bids':
+            return self.bids
+        elif type == 'asks':
+            return self.asks
+        raise KeyError(type)
+
+    def __contains__(self, type):
+        return type in ('bids', 'asks')
+
+    def best_bid(self):
+        return self.bids.best_price()
+
+    def best_ask(self):
+        return self.asks.best_price()
+
+    def sort(self):
+        # sort the depth by descending bid price and ascending ask price
+        self.bids.sort()
+        self.asks.sort()
+
+    def ensure_sorted(self):
+        # same as sort(), but books that are already in order only cost a linear check
+        bids_reordered = self.bids.ensure_sorted()
+        asks_reordered = self.asks.ensure_sorted()
+        return bids_reordered or asks_reordered
+
+    def same_levels(self, other):
+        # True if other has exactly the same levels on both sides
+        return self.bids.same_levels(other.bids) and self.asks.same_levels(other.asks)
+
+    def inverted(self):
+        # view of the same book as the reverse (alt_base) market, nothing is copied
+        return OrderBook(self.asks.inverted(), self.bids.inverted())
@@ -1,15 +1,16 @@
 # here is where the pair arbitrage strategy is implemented
 # along with the application loop for watching exchanges
 
-import threading
+from concurrent.futures import TimeoutError
 from itertools import combinations
 
+import config
 from Bot import Bot
+from FetchEngine import get_engine
 from PairwiseCalculator import PairwiseCalculator
 from utils_broker import create_broker
 
 
-# Requires HTTP connection
 def update_possible_pairs(xchg, possible_pairs):
     """
     Return major currency pairs available in the exchange
@@ -27,12 +28,14 @@ def tuplify(ls):
 
 
 class PairwiseBot(Bot):
-    def __init__(self, xchg_names, sleep):
+    def __init__(self, xchg_names, sleep, depth_limit=None):
         Bot.__init__(self, "Pairwise", sleep)
+        self.depth_limit = depth_limit  # order book levels fetched per side, see config.DEPTH_LIMIT
         self.brokers = [create_broker('PAPER', name, "Pairwise") for name in xchg_names]
         self.possible_pairs = {}
         self.shared_pairs = {}  # shared_pairs[(X, Y)] is a list of pairs (A, B) shared by two exchanges
         self.pairs_to_update = {}  # pairs_to_update[X] is a list of pairs to update for one exchange
+        self.calculator = None  # kept across ticks, only the books that changed get recomputed
 
     def init(self):
         self.update_pairs()
@@ -40,19 +43,42 @@ class PairwiseBot(Bot):
     def tick(self):
         self.log.info("tick")
         tuples_to_update = {broker.xchg: tuplify(self.pairs_to_update[broker.xchg]) for broker in self.brokers}
-        threads = [threading.Thread(target=broker.update_multiple_depths,
-                                    args=(tuples_to_update[broker.xchg],)) for broker in self.brokers]
-        [t.start() for t in threads]
-        [t.join() for t in threads]
-        self.trade_pair()
+        for broker in self.brokers:
+            broker.new_tick()
+        if self.backtest_data is not None:
+            for broker in self.brokers:
+                broker.update_multiple_depths(tuples_to_update[broker.xchg], self.backtest_data, self.tick_i)
+        else:
+            # every exchange's books are requested at once on the engine's event loop
+            pairs = {broker.xchg: broker.pairs_to_fetch(tuples_to_update[broker.xchg]) for broker in self.brokers}
+            try:
+                depths = get_engine().get_all_depths(pairs, config.FETCH_TIMEOUT, self.depth_limit)
+            except TimeoutError:
+                self.log.info("tick abandoned, market data took longer than {}s".format(config.FETCH_TIMEOUT))
+                return
+            for broker in self.brokers:
+                broker.set_multiple_depths(pairs[broker.xchg], depths[broker.xchg])
+        changed = set((broker.xchg, tuple(slug.split('_'))) for broker in self.brokers for slug in broker.updated)
+        self.trade_pair(changed)
+
+    def watched_pairs(self):
+        return {xchg: tuplify(pairs) for xchg, pairs in self.pairs_to_update.items()}
+
+    def requests_per_tick(self):
+        requests = {}
+        for broker in self.brokers:
+            for name, n in broker.xchg.depth_requests(self.pairs_to_update[broker.xchg]).items():
+                requests[name] = requests.get(name, 0) + n
+        return requests
 
     def update_pairs(self):
         exchanges = [broker.xchg for broker in self.brokers]
         possible_pairs = {}
+        self.calculator = None  # pair layout changes, start over
 
-        threads = [threading.Thread(target=update_possible_pairs, args=(xchg, possible_pairs)) for xchg in exchanges]
-        [t.start() for t in threads]
-        [t.join() for t in threads]
+        # exchange metadata is already loaded (see Exchange.load_metadata), no need for threads here
+        for xchg in exchanges:
+            update_possible_pairs(xchg, possible_pairs)
 
         for xchg in exchanges:
             self.pairs_to_update[xchg] = set()
@@ -67,7 +93,16 @@ class PairwiseBot(Bot):
         for xchg in exchanges:
             self.pairs_to_update[xchg] = list(self.pairs_to_update[xchg])
 
-    def trade_pair(self):
-        pc = PairwiseCalculator(self.brokers, self.pairs_to_update, self.shared_pairs, self.logger_name)
-        if pc.check_profits():
-            pc.get_best_trade()
+    def trade_pair(self, changed):
+        if self.calculator is None:
+            # first tick, everything is new
+            self.calculator = PairwiseCalculator(self.brokers, self.pairs_to_update, self.shared_pairs,
+                                                 self.logger_name)
+            profitable = self.calculator.check_profits()
+        else:
+            profitable = self.calculator.update(changed)
+        calc = self.calculator
+        self.opportunities = {(calc.brokers[b].xchg.name, calc.brokers[a].xchg.name, calc.pairs[p]):
+                              (profit, calc.pairs[p][1]) for (b, a, p), profit in calc.profits.items()}
+        if profitable:
+            self.calculator.get_best_trade()
@@ -1,76 +1,172 @@
 import logging
+from decimal import Decimal
 from itertools import permutations
 
-from Order import Order
+import numpy as np
+
 import config
-from utils import total_base_volume
+from Order import Order
 
 
-def get_profit_spread(bidder_fee, bid_price, asker_fee, ask_price):
+def walk_order_books(bids, bidder_fee, asks, asker_fee, min_base_vol=0):
     """
-    simple formula
-    explanation: if hi_bid = 110 and lo_ask = 100
-    then lo_ask will only return 0.998 units per 1 paid
-    I am selling base to the bidder at a rate of 110 per unit given
-    but i actually want to only sell 0.998 units (to match ask recv volume) < -- wait what???
-    so I scale by 0.998
-    finally, the bid order itself has an exchange fee so I only see 0.998 of *that*
-    NOTE: this does not take actual order volumes into account, so this is not
-    representative of what actual profits would be
+    sizes a pairwise arbitrage: sell base to the bidder, buy it back from the asker.
+    both ladders are walked together, best levels first, in a single O(n + m) pass.
+    every unit of base sold to the bidder at bid price P_b makes P_b * (1 - bidder_fee) alt,
+    and receiving it from the asker at ask price P_a costs P_a / (1 - asker_fee) alt.
+    that margin only shrinks as we go deeper, so we keep filling while it is positive
+    (and past that only as far as min_base_vol forces us to).
+    returns None if no volume >= min_base_vol is profitable, otherwise
+    {
+        'base_volume' : total base sold to the bidder,
+        'profit' : net alt profit,
+        'bidder_orders' : [<Order>...] sell orders, one per bid level used,
+        'asker_orders' : [<Order>...] buy orders, one per ask level used
+    }
     """
-    return bid_price * (1 - asker_fee) * (1 - bidder_fee) / ask_price
+    bidder_tx = 1 - bidder_fee
+    asker_tx = 1 - asker_fee
+    bidder_fills = []
+    asker_fills = []  # base received from each ask level (after fees)
+    base_vol = 0
+    profit = 0
+    i = j = 0
+    bid_left = bids.volume(0) if len(bids) > 0 else 0
+    ask_left = asks.volume(0) * asker_tx if len(asks) > 0 else 0
+    while i < len(bids) and j < len(asks):
+        margin = bids.price(i) * bidder_tx - asks.price(j) / asker_tx
+        if margin <= 0 and base_vol >= min_base_vol:
+            break
+        step = min(bid_left, ask_left)
+        if margin <= 0:
+            # only as much as we need to reach the minimum volume
+            step = min(step, min_base_vol - base_vol)
+        if step > 0:
+            if len(bidder_fills) == i:
+                bidder_fills.append(0)
+            if len(asker_fills) == j:
+                asker_fills.append(0)
+            bidder_fills[i] += step
+            asker_fills[j] += step
+            base_vol += step
+            profit += step * margin
+            bid_left -= step
+            ask_left -= step
+        if bid_left <= 0:
+            i += 1
+            bid_left = bids.volume(i) if i < len(bids) else 0
+        if ask_left <= 0:
+            j += 1
+            ask_left = asks.volume(j) * asker_tx if j < len(asks) else 0
+
+    if base_vol <= 0 or base_vol < min_base_vol or profit <= 0:
+        return None
+    return {
+        'base_volume': base_vol,
+        'profit': profit,
+        'bidder_orders': [Order(bids.price(k), v, 'sell') for k, v in enumerate(bidder_fills)],
+        'asker_orders': [Order(asks.price(k), v / asker_tx, 'buy') for k, v in enumerate(asker_fills)],
+    }
 
 
 class PairwiseCalculator(object):
+    # cells are only walked when the top of book spread (fees applied) beats this, i.e. 0.1% over break-even
+    spread_threshold = 1.001
+    # skip trades that profit less than this per unit of alt moved, None skips none
+    btc_risk = config.BTC_RISK
+
     def __init__(self, brokers, pairs_to_update, shared_pairs, logger_name):
         self.brokers = brokers
         self.pairs_to_update = pairs_to_update
         self.shared_pairs = shared_pairs
+        self.log = logging.getLogger(logger_name)
+
         """
-        first key = bidder exchange object
-        second key = asker exchange object
-        spread[x][y]['BTC_ETC'] = -0.1 # raw profits (bid - ask)
+        everything is stored as arrays indexed [exchange, pair] or [bidder, asker, pair],
+        exchanges in the order of self.brokers and pairs in the order of self.pairs.
+        profit_spread[b, a, p] = spread of selling pair p to broker b and buying it from broker a,
+        NaN where the pair is not shared by the two exchanges (or one of the books is empty)
         """
-        self.prices = {}  # maintains hi_bids and lo_asks for each broker
-        # prices[xchg]['BTC_CNY']['bid'] = 7000.0
+        self.pairs = sorted(set(tuple(pair) for pairs in shared_pairs.values() for pair in pairs))
+        self.pair_index = {pair: i for i, pair in enumerate(self.pairs)}
+        n, m = len(brokers), len(self.pairs)
+        self.shared = np.zeros((n, n, m), dtype=bool)
+        for (x, broker_x), (y, broker_y) in permutations(enumerate(brokers), 2):
+            for pair in shared_pairs.get(frozenset([broker_x.xchg, broker_y.xchg]), ()):
+                self.shared[x, y, self.pair_index[tuple(pair)]] = True
+        self.tx = np.array([1 - float(broker.xchg.trading_fee) for broker in brokers])
+
+        self.bids = np.full((n, m), np.nan)  # hi_bids for each broker
+        self.asks = np.full((n, m), np.nan)  # lo_asks for each broker
         self.balances = {}  # base and alt balances for each exchange
-        self.profit_spread = {}  # price spreads with transaction fees applied
-        self.profits = {}  # actual ALT profits, accounting for balances and volumes
+        self.profit_spread = np.full((n, n, m), np.nan)  # price spreads with transaction fees applied
+        self.profits = {}  # profits[(b, a, p)] = actual alt profits, only for cells worth calculating
+        self.orders = {}  # orders[(b, a, p)] = fill plan behind profits[(b, a, p)], see walk_order_books
 
         # self.update_balances()
         self.update_profit_spread()  # automatically perform calculations upon initialization
 
-        self.log = logging.getLogger(logger_name)
+    def pair_of(self, pair):
+        # index of pair in self.pairs, in either orientation
+        base, alt = pair
+        p = self.pair_index.get((base, alt))
+        if p is None:
+            p = self.pair_index.get((alt, base))
+        return p
 
-    def update_profit_spread(self):
-        # computes the profit spread, accounting for trading fees
-        for broker_x, broker_y in permutations(self.brokers, 2):
-            x, y = broker_x.xchg, broker_y.xchg
-            if x not in self.profit_spread:
-                self.profit_spread[x] = {}
-            xy_shared_pairs = self.shared_pairs[frozenset([x, y])]
-            self.profit_spread[x][y] = {(base + '_' + alt): 0 for base, alt in xy_shared_pairs}
+    def update_price(self, x, p):
+        # best bid/ask of pair p on broker x
+        broker = self.brokers[x]
+        bid = broker.get_highest_bid(self.pairs[p])
+        ask = broker.get_lowest_ask(self.pairs[p])
+        self.bids[x, p] = float(bid) if bid else np.nan
+        self.asks[x, p] = float(ask) if ask else np.nan
 
-        for broker in self.brokers:
-            best_prices = {}
+    def update_profit_spread(self):
+        # computes the profit spread, accounting for trading fees on both sides:
+        # bid * (1 - bidder fee) * (1 - asker fee) / ask, i.e. what one unit bought at ask sells for at bid.
+        # the whole bidder x asker x pair tensor in one pass
+        for x, broker in enumerate(self.brokers):
             for pair in self.pairs_to_update[broker.xchg]:
-                base, alt = pair
-                slug = base + '_' + alt
-                best_prices[slug] = {'bid': broker.get_highest_bid(pair), 'ask': broker.get_lowest_ask(pair)}
-            self.prices[broker.xchg] = best_prices
+                p = self.pair_of(tuple(pair))
+                if p is not None:
+                    self.update_price(x, p)
+        tx = self.tx[:, None, None] * self.tx[None, :, None]
+        with np.errstate(invalid='ignore'):
+            spread = self.bids[:, None, :] * tx / self.asks[None, :, :]
+        self.profit_spread = np.where(self.shared, spread, np.nan)
+
+    def update_spread_cells(self, x, p):
+        # recomputes only the cells where broker x is the bidder or the asker of pair p
+        # (same order of operations as update_profit_spread, so both give the exact same floats)
+        with np.errstate(invalid='ignore'):
+            as_bidder = self.bids[x, p] * (self.tx[x] * self.tx) / self.asks[:, p]
+            as_asker = self.bids[:, p] * (self.tx * self.tx[x]) / self.asks[x, p]
+        self.profit_spread[x, :, p] = np.where(self.shared[x, :, p], as_bidder, np.nan)
+        self.profit_spread[:, x, p] = np.where(self.shared[:, x, p], as_asker, np.nan)
 
-        for bidder, asker in permutations(self.brokers, 2):
-            b, a = bidder.xchg, asker.xchg
-            for base, alt in self.shared_pairs[frozenset([b, a])]:
-                slug = base + '_' + alt
-                hi_bid = self.prices[b][slug]['bid']
-                lo_ask = self.prices[a][slug]['ask']
-                if hi_bid is None or lo_ask is None:
-                    self.profit_spread[b][a][slug] = None
-                else:
-                    # ALT profit with fees applied
-                    self.profit_spread[b][a][slug] = \
-                        get_profit_spread(bidder.xchg.trading_fee, hi_bid, asker.xchg.trading_fee, lo_ask)
+    def update(self, changed_books):
+        """
+        incremental version of update_profit_spread + check_profits, for a calculator
+        that is kept across ticks.
+        changed_books = iterable of (exchange, pair) whose books changed since the last call.
+        only the spread and profit cells involving those books are recomputed.
+        returns True if any cell is currently profitable
+        """
+        x_index = {broker.xchg: x for x, broker in enumerate(self.brokers)}
+        cells = set()
+        for xchg, pair in changed_books:
+            x = x_index.get(xchg)
+            p = self.pair_of(pair)
+            if x is None or p is None:
+                continue
+            self.update_price(x, p)
+            cells.add((x, p))
+        for x, p in cells:
+            self.update_spread_cells(x, p)
+        if cells:
+            self.check_profits(cells)
+        return len(self.profits) > 0
 
     # def update_balances(self):
     #     base, alt = self.pair
@@ -78,8 +174,9 @@ class PairwiseCalculator(object):
     #         self.balances[broker.xchg.name] = {"base": broker.balances.get(base, 0),
     #                                            "alt": broker.balances.get(alt, 0)}
 
-    def check_profits(self):
+    def check_profits(self, changed=None):
         """
+        changed = set of (broker index, pair index) to re-check, None re-checks every cell.
         Examine each pair for profits. A number of trivial reject tests are performed:
         0) needs to have a positive profit spread to begin with that exceeds 0.01 USD
         1) account needs to have sufficient balance to fill the minimum order volume
@@ -87,61 +184,56 @@ class PairwiseCalculator(object):
         trade needs to profit at least 0.01 USD.
         """
         success = False
-        for broker_x, broker_y in permutations(self.brokers, 2):
-            x, y = broker_x.xchg, broker_y.xchg
-            if x not in self.profits:
-                self.profits[x] = {}
-            xy_shared_pairs = self.shared_pairs[frozenset([x, y])]
-            self.profits[x][y] = {(base + '_' + alt): None for base, alt in xy_shared_pairs}
-
-        for bidder, asker in permutations(self.brokers, 2):
-            for base, alt in self.shared_pairs[frozenset((bidder.xchg, asker.xchg))]:
-                b, a = bidder.xchg, asker.xchg
-                slug = base + '_' + alt
-                spread = self.profit_spread[b][a][slug]
-                # print(spread)
-                if spread is not None and spread > 1.001:
-                    # Algorithm: iteratively increase the volume on the volume-limited
-                    # exchange until profits stop increasing (i.e. arb opportunity lost)
-                    # ideally we want to increase BOTH until profits no longer increase,
-                    # but that introduces an icky optimization problem
-                    # temporary solution: trade EXACTLY the min volume base order
-                    # thereby saving you the trouble of deciding which to fix, etc.
-                    # (note: we will scale appropriately to account for trading fees)
-                    bids = bidder.depth[slug]['bids']
-                    asks = asker.depth[slug]['asks']
-                    profit = self.calculate_order(slug, bidder, bids, asker, asks)
-                    # after calculating the order, even though the spread is profitable, our balances make it not possible.
-                    # i.e. small magnitudes, requires too much shuffling money around to profit such a small amount.
-                    if profit > 0:
-                        self.profits[b][a][slug] = profit
-                        success = True
+        if changed is None:
+            self.profits = {}
+            self.orders = {}
+            # NaN compares False, so cells that are not shared or have empty books drop out
+            with np.errstate(invalid='ignore'):
+                cells = np.argwhere(self.profit_spread > self.spread_threshold)
+        else:
+            # only the cells where one of the changed books is the bidder or the asker
+            self.profits = {(b, a, p): profit for (b, a, p), profit in self.profits.items()
+                            if (b, p) not in changed and (a, p) not in changed}
+            self.orders = {cell: self.orders[cell] for cell in self.profits}
+            cells = set()
+            threshold = self.spread_threshold
+            with np.errstate(invalid='ignore'):
+                for x, p in changed:
+                    cells.update((x, a, p) for a in np.flatnonzero(self.profit_spread[x, :, p] > threshold))
+                    cells.update((b, x, p) for b in np.flatnonzero(self.profit_spread[:, x, p] > threshold))
+        for b, a, p in cells:
+            bidder, asker = self.brokers[b], self.brokers[a]
+            base, alt = self.pairs[p]
+            slug = base + '_' + alt
+            # Algorithm: iteratively increase the volume on both exchanges
+            # until profits stop increasing (i.e. arb opportunity lost)
+            # (note: we will scale appropriately to account for trading fees)
+            bids = bidder.get_orders((base, alt), 'bids')
+            asks = asker.get_orders((base, alt), 'asks')
+            plan = self.calculate_order(slug, bidder, bids, asker, asks)
+            # after calculating the order, even though the spread is profitable, our balances make it not possible.
+            # i.e. small magnitudes, requires too much shuffling money around to profit such a small amount.
+            if plan is not None:
+                self.profits[(b, a, p)] = plan['profit']
+                self.orders[(b, a, p)] = plan
+                success = True
 
         return success  # return True if there are any profits at all
 
     def calculate_order(self, slug, bidder, bids, asker, asks):
         """
-        in my original algorithm design, we traverse the depth to fill the minimum
-        volume desired. this is too complicated and hairy.
-        instead, i will only proceed if the top order volume naturally exceeds
-        the best price. cases where the second best is ``hidden'' under a small order
-        will be ignored for now.
-        """
-        """
-        first check - do the best orders have sufficient volume to satisfy xchg minimums?
+        walks the bidder's bids and the asker's asks together (see walk_order_books)
+        and sizes the trade to the volume of base that maximizes net alt profit,
+        as long as it satisfies both exchanges' minimum volumes.
+        returns the fill plan, or None if there is no profitable trade.
         """
         base, alt = slug.split('_')
         bidder_min_base_vol = bidder.xchg.get_min_vol((base, alt), bids)
         asker_min_base_vol = asker.xchg.get_min_vol((base, alt), asks)
-        min_base_vol = min(bidder_min_base_vol, asker_min_base_vol)  # remember, we have to trade approx same amount
-        if bids[0].v < min_base_vol:
-            self.log.info('{} insufficient best order volume to satisfy min trade: {} / {}'.format
-                          (bidder.xchg.name, bids[0].v, min_base_vol))
-            return 0
-        if asks[0].v < min_base_vol:
-            self.log.info('{} insufficient best order volume to satisfy min trade: {} / {}'.format
-                          (asker.xchg.name, asks[0].v, min_base_vol))
-            return 0
+        if bidder_min_base_vol is None or asker_min_base_vol is None:
+            self.log.info('{} / {} not enough depth to satisfy min trade'.format(bidder.xchg.name, asker.xchg.name))
+            return None
+        min_base_vol = max(bidder_min_base_vol, asker_min_base_vol)  # remember, we have to trade approx same amount
 
         """
         next thing to check - see if we have enough funds to make the trade
@@ -170,132 +262,46 @@ class PairwiseCalculator(object):
         """
         size the volume of base traded
         """
-        asker_tx = 1 - asker.xchg.trading_fee
-        bidder_tx = 1 - bidder.xchg.trading_fee
-
-        # TODO - weird shit going on here, fix this!!
-
-        # the line below computes how much base we could trade if we had unlimited balance
-        # but are limited by the order volumes of base between the exchanges.
-        # we receive a maximum of asks[0].v * asker_tx units of base from the asker
-        # and we can sell a maximum of bids[0].v to the bidder
-        max_base_xchg = min(bids[0].v, asks[0].v * asker_tx)
-        # computes how much base we could trade if we had unlimited volume, limited balance
-        # max_base_balance = min(bidder_base_balance, asker_base_afford)
-        # how much we will end up buying and selling
-        # base_vol = min(max_base_xchg, max_base_balance)
-        base_vol = max_base_xchg
+        plan = walk_order_books(bids, bidder.xchg.trading_fee, asks, asker.xchg.trading_fee, min_base_vol)
+        if plan is None:
+            return None
 
-        bidder_order = Order(bids[0].p, base_vol)
-        asker_order = Order(asks[0].p, base_vol / asker_tx)
-        # profit in units alt (BTC)
-        net_base = asker_order.v * asker_tx - bidder_order.v
-        net_alt = bidder_order.p * bidder_order.v * bidder_tx - asker_order.p * asker_order.v
-
-        if net_base > 0:
-            self.log.info(
-                'calculate_order_simple({}, {}, {}) : {} BTC'.format(bidder.xchg.name, asker.xchg.name, slug, net_base))
-            self.log.info('    net_base : {}'.format(net_base))
-            self.log.info('    net_alt : {}'.format(net_alt))
-            self.log.info('    base_vol : {} ~ {}'.format(min_base_vol, base_vol))
-            self.log.info('    asker_price : {}'.format(asker_order.p))
-            self.log.info('    bidder_price : {}'.format(bidder_order.p))
-
-        return net_base
-
-        # this is the final checkpoint - if the trade's profits are too small compared to the amount of BTC
+        # this is the final checkpoint - if the trade's profits are too small compared to the amount of alt
         # we have to move, then the trade is probably too risky to make.
+        if self.btc_risk is not None:
+            alt_moved = sum(o.p * o.v for o in plan['asker_orders'])
+            if plan['profit'] < alt_moved * Decimal(str(self.btc_risk)):
+                self.log.info('{} volume too large to justify risk of performing the trade'.format(slug))
+                return None
 
-    #         if net_alt / (asker_order.p * asker_order.v) < config.BTC_RISK:
-    #             print('Order volume too large to justify risk of performing the trade')
-    #             return None
-    #         else:
-    #             return {
-    #                 "bidder_order": bidder_order,
-    #                 "asker_order": asker_order,
-    #                 "profit": net_alt
-    #             }
-
-    #         base, alt = self.pair
-    #
-    #         bidder_min_base_vol = bidder.xchg.get_min_vol((base, alt),None)
-    #         asker_min_base_vol = asker.xchg.get_min_vol((base, alt),None)
-    #         min_base_vol = min(bidder_min_base_vol, asker_min_base_vol)
-    #
-    #         bidfee = bidder.xchg.trading_fee
-    #         askfee = asker.xchg.trading_fee
-    #         bids = self.clip_orders(bids, min_base_vol)
-    #         # small subtlety - we receive slightly
-    #         # less than the min volume so to cover our arbitrage
-    #         # properly we scale up the ask volume slightly
-    #         padded_buy_vol = min_base_vol * 1.0/(1.0 - askfee)
-    #         asks = self.clip_orders(asks, padded_buy_vol)
-    #
-    #         # check profits
-    #         bid_alt_recv = (1.0-bidfee) * sum([b.p*b.v for b in bids]) # units of alt to recv
-    #         ask_alt_give = sum([a.v*a.p for a in asks]) # units of alt to give
-    #         profit = bid_alt_recv - ask_alt_give
-    #         if profit > config.PROFIT_THRESH[alt]:
-    #             print('WOOHOO! Profitable, EXECUTABLE arbitrage detected')
-    #             bidder_order = (bids[-1].p , min_base_vol) # sell at the "lowest" price of profitable asks to fill as much as possible
-    #             asker_order  = (asks[-1].p , padded_buy_vol)  # buy at the "highest" price of profitable bids to fill as much as possible
-    #         else:
-    #             bidder_order, asker_order, profit = (None, None, profit)
-    #         return {
-    #                 "bidder_order":bidder_order,
-    #                 "asker_order":asker_order,
-    #                 "profit":profit,
-    #                 "bidder_recv":bid_alt_recv,
-    #                 "bidder_give":min_base_vol,
-    #                 "asker_give":ask_alt_give,
-    #                 "asker_recv":min_base_vol
-    #                 }
+        self.log.info(
+            'calculate_order({}, {}, {}) : {} {}'.format(bidder.xchg.name, asker.xchg.name, slug, plan['profit'], alt))
+        self.log.info('    base_vol : {} ~ {}'.format(min_base_vol, plan['base_volume']))
+        self.log.info('    bidder levels : {}'.format(len(plan['bidder_orders'])))
+        self.log.info('    asker levels : {}'.format(len(plan['asker_orders'])))
+        return plan
 
     def clip_orders(self, orders, desired_volume):
-        # given an array of bid or ask orders,
+        # given one side of the book,
         # and a desired volume, resize the orders so that
         # the total volume == desired_volume
-        # total_volume = lambda arr : sum([a.v for a in arr])
-        # volume = total_volume(orders) # original volume, in units base
-        i = 1
-        while total_base_volume(orders[:i]) < desired_volume:
-            i += 1
-            if i > len(orders):
-                # not enough orders in the orderbook!
-                break
-        # more than likely, adding on the last order tacked on a bit of overshoot.
-        # the remainder MUST be spanned by last order (i.e. cannot be in the second
-        # to last otherwise we would have caught it)
-        if desired_volume is None:
-            wtf = 1
-
-        remainder = total_base_volume(orders[:i]) - desired_volume
-        last_order = orders[i - 1]
-        orders[i - 1] = Order(last_order.p, last_order.v - remainder)
-        return orders[:i]
+        # returns None if there are not enough orders in the orderbook!
+        return orders.clip_base_volume(desired_volume)
 
     def get_best_trade(self):
-        # returns the bidder exchange, asker exchange,
-        # buy order (price, volume) and ask order (price, volume)
-        # TODO
-        best_profit = 0.0
+        # returns the bidder broker, asker broker, alt profit and fill plan of the most profitable cell
+        best_profit = 0
         hi_bidder = None
         lo_asker = None
-        for bidder in self.brokers:
-            for asker in self.brokers:
-                if bidder is asker:
-                    continue
-                for base, alt in self.shared_pairs[frozenset((bidder, asker))]:
-                    b, a = bidder.xchg, asker.xchg
-                    slug = base + '_' + alt
-                    profit = self.profits[b][a][slug]
-                    if profit is not None:
-                        if profit > best_profit:
-                            best_profit = profit
-                            hi_bidder = bidder
-                            lo_asker = asker
+        best_plan = None
+        for (b, a, p), profit in self.profits.items():
+            if profit > best_profit:
+                best_profit = profit
+                hi_bidder = self.brokers[b]
+                lo_asker = self.brokers[a]
+                best_plan = self.orders[(b, a, p)]
 
-        return (hi_bidder, lo_asker, profit)
+        return (hi_bidder, lo_asker, best_profit, best_plan)
 
 # def print_matrix(self, matrix):
 #         """
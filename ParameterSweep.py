@@ -0,0 +1,88 @@
+# parameter sweeps over backtests
+# every combination in a grid of strategy thresholds is replayed over the same recorded ticks,
+# one backtest per job on a pool of processes. the tick stores are memory-mapped (see TickStore.py),
+# so the workers share the data through the page cache instead of each loading a copy.
+# workers build their bots offline (see config.OFFLINE), from the cached exchange metadata.
+# see main_sweep.py for running one from the command line.
+
+import itertools
+import json
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+
+import config
+from Backtester import Backtester, make_bot
+from PairwiseCalculator import PairwiseCalculator
+from TriangularCalculator import TriangularCalculator
+
+# parameter -> calculator classes whose attribute of the same name it sets
+PARAMETERS = {
+    'spread_threshold': (PairwiseCalculator, TriangularCalculator),
+    'volume_margin': (TriangularCalculator,),
+    'btc_risk': (PairwiseCalculator,),
+}
+DEFAULTS = {(cls, name): getattr(cls, name) for name, classes in PARAMETERS.items() for cls in classes}
+
+
+def grid(**values):
+    """
+    every combination of the given values, e.g.
+    grid(spread_threshold=[1.001, 1.002], btc_risk=[None, 0.001]) is a list of 4 {name: value} dicts
+    """
+    names = sorted(values)
+    return [dict(zip(names, combo)) for combo in itertools.product(*(values[name] for name in names))]
+
+
+def set_parameters(params):
+    # parameters left out go back to their defaults, workers run one configuration after another
+    for (cls, name), default in DEFAULTS.items():
+        value = params.get(name, default)
+        if isinstance(default, Decimal) and value is not None:
+            value = Decimal(str(value))
+        setattr(cls, name, value)
+
+
+def run_backtest(job):
+    # runs in a worker process: one configuration, one replay
+    params, bot_args, factory, tick_dir, start, end = job
+    # whatever the factory, nothing in a worker goes over the network (or needs api keys)
+    config.OFFLINE = True
+    set_parameters(params)
+    cpu = time.process_time()
+    bot = factory(*bot_args)
+    bot.log.setLevel(logging.WARNING)  # logging every tick would cost more than the tick
+    stats = Backtester(bot, tick_dir).run(start, end)
+    return {
+        'params': params,
+        'ticks': stats['ticks'],
+        'opportunities': stats['opportunities'],
+        'profit': {currency: str(profit) for currency, profit in stats['profit'].items()},
+        'seconds': stats['seconds'],
+        'cpu_seconds': time.process_time() - cpu,
+        'ticks_per_second': stats['ticks_per_second'],
+    }
+
+
+def sweep(configs, bot_args=('pair',), processes=None, out=None, tick_dir=config.TICK_DIR,
+          start=None, end=None, factory=make_bot):
+    """
+    backtests factory(*bot_args) (see Backtester.make_bot) once per configuration in configs
+    (e.g. from grid()), on processes worker processes (None for one per cpu).
+    returns the summaries in the order of configs, also appended to the file out as JSON lines.
+    """
+    jobs = [(params, bot_args, factory, tick_dir, start, end) for params in configs]
+    results = []
+    f = open(out, 'a') if out is not None else None
+    try:
+        with ProcessPoolExecutor(processes) as executor:
+            for result in executor.map(run_backtest, jobs):
+                results.append(result)
+                if f is not None:
+                    f.write(json.dumps(result) + '\n')
+                    f.flush()
+    finally:
+        if f is not None:
+            f.close()
+    return results
@@ -0,0 +1,85 @@
+# records every book the brokers fetch into the tick store (see TickStore.py), one store per exchange
+# under config.TICK_DIR. the bots only copy the levels and queue them, encoding and disk writes
+# happen on the recorder's own thread. when it falls behind, snapshots are dropped (and counted)
+# rather than holding up a tick.
+
+import os
+import queue
+import threading
+
+import config
+from OrderBook import BookSide, InvertedBookSide
+from TickStore import TickWriter, fixed_levels
+
+# snapshots waiting to be written before new ones get dropped
+MAX_QUEUED = 10000
+
+
+def copy_side(side):
+    # (prices, volumes, digits) of a book side, detached from the book
+    if isinstance(side, BookSide):
+        return list(side.prices), list(side.volumes), side.digits
+    levels = [(o.p, o.v) for o in side]
+    return [p for p, v in levels], [v for p, v in levels], None
+
+
+class TickRecorder(object):
+    def __init__(self, tick_dir=config.TICK_DIR):
+        self.tick_dir = tick_dir
+        self.queue = queue.Queue(MAX_QUEUED)
+        self.writers = {}  # writers[xchg_name] = TickWriter, only touched from the recorder thread
+        self.stats = {'recorded': 0, 'dropped': 0}
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def record(self, t, xchg_name, depths):
+        # queues depths = {'base_alt': <OrderBook>} fetched from exchange xchg_name at time t
+        books = []
+        for slug, book in depths.items():
+            if isinstance(book.bids, InvertedBookSide):
+                # a view of the market the exchange lists the other way around: record that market,
+                # its levels are exact where 1 / price isn't (the backtester reads either orientation)
+                base, alt = slug.split('_')
+                slug, book = alt + '_' + base, book.inverted()
+            books.append((slug, copy_side(book.bids), copy_side(book.asks)))
+        try:
+            self.queue.put_nowait((t, xchg_name, books))
+        except queue.Full:
+            self.stats['dropped'] += len(books)
+
+    def stop(self):
+        # writes out everything queued so far, then stops the thread
+        self.queue.put(None)
+        self.thread.join()
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            t, xchg_name, books = item
+            writer = self.writers.get(xchg_name)
+            if writer is None:
+                writer = self.writers[xchg_name] = TickWriter(os.path.join(self.tick_dir, xchg_name))
+            for slug, bids, asks in books:
+                writer.write(t, slug, (fixed_levels(*bids), fixed_levels(*asks)))
+            self.stats['recorded'] += len(books)
+            if self.queue.empty():
+                # caught up, put what we have on disk
+                for writer in self.writers.values():
+                    writer.flush()
+        for writer in self.writers.values():
+            writer.close()
+
+
+_recorder = None
+_recorder_lock = threading.Lock()
+
+
+def get_recorder():
+    # the process-wide recorder, every broker records through it
+    global _recorder
+    with _recorder_lock:
+        if _recorder is None:
+            _recorder = TickRecorder()
+        return _recorder
@@ -0,0 +1,66 @@
+# decides when a bot ticks
+# a tick runs as soon as fresh book data arrives (when the bot has a data event, e.g. a MarketFeed),
+# and otherwise on a fixed period. the period is kept on a monotonic grid (start + k * period),
+# so it doesn't drift by however long each tick took.
+# when a tick overruns, the deadlines it slept through are merged into ONE catch-up tick
+# and counted as missed, instead of running a burst of back-to-back ticks.
+# a throttle (seconds to hold back, e.g. until the exchanges' rate limits have the budget for a tick)
+# delays ticks that are due. with a period of 0, ticks run as fast as the throttle lets them.
+
+import time
+
+
+class TickScheduler(object):
+    def __init__(self, period, event=None, throttle=None):
+        self.period = period
+        self.event = event  # threading.Event set when new data arrives, None to tick on the period only
+        self.throttle = throttle  # returns how many seconds a due tick still has to wait, None never waits
+        self.deadline = time.monotonic()  # next periodic tick, the first one is right away
+        self.stats = {'ticks': 0, 'data': 0, 'timer': 0, 'missed': 0, 'throttled': 0}
+
+    def wait(self):
+        """
+        blocks until the next tick is due, returns why: 'data' or 'timer'.
+        """
+        reason = self.wait_due()
+        delay = self.throttle() if self.throttle is not None else 0
+        if delay > 0:
+            self.stats['throttled'] += 1
+            time.sleep(delay)
+        return self.count(reason)
+
+    def wait_due(self):
+        now = time.monotonic()
+        if now < self.deadline:
+            if self.event is not None:
+                if self.event.wait(self.deadline - now):
+                    # data ticks stand in for the periodic one, next timer tick a full period later
+                    now = time.monotonic()
+                    self.skip_to(now + self.period)
+                    return 'data'
+            else:
+                time.sleep(self.deadline - now)
+            self.deadline += self.period
+            return 'timer'
+        if self.period <= 0:
+            if self.event is not None:
+                # no timer at all, only data wakes us up
+                self.event.wait()
+                return 'data'
+            return 'timer'
+
+        # late: serve the oldest deadline now, drop the ones after it that already passed
+        missed = int((now - self.deadline) // self.period)
+        self.stats['missed'] += missed
+        self.deadline += (missed + 1) * self.period
+        return 'timer'
+
+    def skip_to(self, t):
+        # moves the next deadline to the first point of the grid at or after t
+        if t > self.deadline and self.period > 0:
+            self.deadline += -((self.deadline - t) // self.period) * self.period
+
+    def count(self, reason):
+        self.stats['ticks'] += 1
+        self.stats[reason] += 1
+        return reason
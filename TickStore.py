@@ -0,0 +1,266 @@
+# columnar store of recorded order book snapshots, one store (directory) per exchange
+# every column is its own flat binary file, so a reader can memory-map them and only touch
+# the pages it actually needs.
+#
+# snapshots.<column>: one row per recorded book, time order
+#   time (unix seconds), pair (index into pairs.json), keyframe (1 = full book),
+#   start/count (its rows in the level columns)
+# levels.<column>: one row per level that changed since the pair's previous snapshot
+#   side (0 bids, 1 asks), level (0 = best), price, volume
+#   prices/volumes are integers in units of 10^-DIGITS, anything past that is truncated.
+#   a row with volume -1 cuts the side at that level (the book got shorter).
+# a pair's first snapshot in every session and every KEYFRAME_EVERY-th one after that is a keyframe,
+# so a reader can start anywhere without replaying the whole file.
+
+import json
+import os
+from array import array
+
+import numpy as np
+
+from OrderBook import BookSide, OrderBook
+from utils import from_fixed, to_fixed
+
+DIGITS = 8
+KEYFRAME_EVERY = 100
+SNAPSHOT_COLUMNS = [('time', '<f8'), ('pair', '<u2'), ('keyframe', 'u1'), ('start', '<u8'), ('count', '<u4')]
+LEVEL_COLUMNS = [('side', 'u1'), ('level', '<u2'), ('price', '<i8'), ('volume', '<i8')]
+CUT = -1  # volume of a row that cuts the side
+
+
+def column_path(path, table, column):
+    return os.path.join(path, '{}.{}'.format(table, column))
+
+
+def fixed_levels(prices, volumes, digits):
+    # one side's levels (Decimals, or ints in units of 10^-digits) as ints in units of 10^-DIGITS
+    if digits is None:
+        return [to_fixed(p, DIGITS) for p in prices], [to_fixed(v, DIGITS) for v in volumes]
+    if digits == DIGITS:
+        return list(prices), list(volumes)
+    if digits < DIGITS:
+        scale = 10 ** (DIGITS - digits)
+        return [p * scale for p in prices], [v * scale for v in volumes]
+    scale = 10 ** (digits - DIGITS)
+    return [p // scale for p in prices], [v // scale for v in volumes]
+
+
+class TickWriter(object):
+    """
+    appends snapshots to the store in path. rows are buffered until flush().
+    only one writer per store at a time.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.pairs = []
+        if os.path.exists(os.path.join(path, 'pairs.json')):
+            with open(os.path.join(path, 'pairs.json')) as f:
+                self.pairs = json.load(f)['pairs']
+        self.pair_ids = {slug: i for i, slug in enumerate(self.pairs)}
+        self.files = {}
+        for table, columns in (('snapshots', SNAPSHOT_COLUMNS), ('levels', LEVEL_COLUMNS)):
+            for column, dtype in columns:
+                self.files[(table, column)] = open(column_path(path, table, column), 'ab')
+        self.rows = os.path.getsize(column_path(path, 'levels', 'side'))  # 1 byte per row
+        self.last_time = 0.0
+        self.previous = {}  # previous[(pair id, side)] = (prices, volumes) last written
+        self.since_keyframe = {}  # since_keyframe[pair id] = snapshots written since its last keyframe
+        self.buffers = {key: [] for key in self.files}
+
+    def pair_id(self, slug):
+        if slug not in self.pair_ids:
+            self.pair_ids[slug] = len(self.pairs)
+            self.pairs.append(slug)
+            # the name has to be on disk before any row that refers to it
+            tmp = os.path.join(self.path, 'pairs.json.tmp')
+            with open(tmp, 'w') as f:
+                json.dump({'pairs': self.pairs, 'digits': DIGITS}, f)
+            os.replace(tmp, os.path.join(self.path, 'pairs.json'))
+        return self.pair_ids[slug]
+
+    def write(self, t, slug, sides):
+        """
+        sides = ((bid prices, bid volumes), (ask prices, ask volumes)) as ints in units of 10^-DIGITS
+        times never go backwards in the store, an earlier t is recorded as the last one written.
+        """
+        pair = self.pair_id(slug)
+        t = max(t, self.last_time)
+        self.last_time = t
+        keyframe = pair not in self.since_keyframe or self.since_keyframe[pair] >= KEYFRAME_EVERY
+        self.since_keyframe[pair] = 0 if keyframe else self.since_keyframe[pair] + 1
+        b = self.buffers
+        start = self.rows
+        for side, (prices, volumes) in enumerate(sides):
+            old_prices, old_volumes = ((), ()) if keyframe else self.previous.get((pair, side), ((), ()))
+            for level, (p, v) in enumerate(zip(prices, volumes)):
+                if level < len(old_prices) and old_prices[level] == p and old_volumes[level] == v:
+                    continue
+                b[('levels', 'side')].append(side)
+                b[('levels', 'level')].append(level)
+                b[('levels', 'price')].append(p)
+                b[('levels', 'volume')].append(v)
+                self.rows += 1
+            if len(prices) < len(old_prices):
+                b[('levels', 'side')].append(side)
+                b[('levels', 'level')].append(len(prices))
+                b[('levels', 'price')].append(0)
+                b[('levels', 'volume')].append(CUT)
+                self.rows += 1
+            self.previous[(pair, side)] = (prices, volumes)
+        b[('snapshots', 'time')].append(t)
+        b[('snapshots', 'pair')].append(pair)
+        b[('snapshots', 'keyframe')].append(int(keyframe))
+        b[('snapshots', 'start')].append(start)
+        b[('snapshots', 'count')].append(self.rows - start)
+
+    def flush(self):
+        # level rows go out before the snapshots that point at them, a reader never sees dangling rows
+        for table, columns in (('levels', LEVEL_COLUMNS), ('snapshots', SNAPSHOT_COLUMNS)):
+            for column, dtype in columns:
+                key = (table, column)
+                if self.buffers[key]:
+                    np.asarray(self.buffers[key], dtype=dtype).tofile(self.files[key])
+                    self.buffers[key] = []
+                self.files[key].flush()
+
+    def close(self):
+        self.flush()
+        for f in self.files.values():
+            f.close()
+
+
+def _map(path, dtype):
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r')
+
+
+class TickReader(object):
+    """
+    memory-maps the store in path. snapshots written after it was opened aren't seen.
+    books come out as OrderBooks with digits (None for Decimals, see config.FIXED_POINT_DIGITS).
+    """
+
+    CHUNK = 1 << 16  # snapshot index rows pulled out of the maps at a time
+
+    def __init__(self, path):
+        self.path = path
+        self.pairs = []
+        if os.path.exists(os.path.join(path, 'pairs.json')):
+            with open(os.path.join(path, 'pairs.json')) as f:
+                self.pairs = json.load(f)['pairs']
+        self.pair_ids = {slug: i for i, slug in enumerate(self.pairs)}
+        self.snapshots = {column: _map(column_path(path, 'snapshots', column), dtype)
+                          for column, dtype in SNAPSHOT_COLUMNS}
+        self.levels = {column: _map(column_path(path, 'levels', column), dtype) for column, dtype in LEVEL_COLUMNS}
+        # a writer may have been halfway through a flush, only count complete snapshot rows
+        n = min(len(c) for c in self.snapshots.values())
+        self.snapshots = {column: c[:n] for column, c in self.snapshots.items()}
+        self.times = self.snapshots['time']
+        self._pair_index = {}
+
+    def __len__(self):
+        return len(self.times)
+
+    def pair_index(self, pair):
+        # (snapshot numbers, keyframe snapshot numbers) of a pair id, both in time order
+        if pair not in self._pair_index:
+            snaps = np.flatnonzero(self.snapshots['pair'] == pair)
+            self._pair_index[pair] = (snaps, snaps[self.snapshots['keyframe'][snaps] == 1])
+        return self._pair_index[pair]
+
+    def first_needed(self, pairs, i):
+        # where replaying has to start for these pairs' books to be complete at snapshot i
+        first = i
+        for pair in pairs:
+            snaps, keyframes = self.pair_index(pair)
+            k = np.searchsorted(keyframes, i, side='right') - 1
+            if k >= 0:
+                first = min(first, int(keyframes[k]))
+        return first
+
+    def apply(self, state, pair, keyframe, start, count, digits):
+        # brings state[(pair, side)] = [prices, volumes] up to date with one snapshot's rows
+        if keyframe:
+            state[(pair, 0)] = [[], []]
+            state[(pair, 1)] = [[], []]
+        if count == 0:
+            return
+        s, e = start, start + count
+        for side, level, p, v in zip(self.levels['side'][s:e].tolist(), self.levels['level'][s:e].tolist(),
+                                     self.levels['price'][s:e].tolist(), self.levels['volume'][s:e].tolist()):
+            prices, volumes = state.setdefault((pair, side), [[], []])
+            if v == CUT:
+                del prices[level:], volumes[level:]
+                continue
+            if digits is None:
+                p, v = from_fixed(p, DIGITS), from_fixed(v, DIGITS)
+            elif digits != DIGITS:
+                p, v = p * 10 ** digits // 10 ** DIGITS, v * 10 ** digits // 10 ** DIGITS
+            if level < len(prices):
+                prices[level], volumes[level] = p, v
+            else:
+                prices.append(p)
+                volumes.append(v)
+
+    def book(self, state, pair, digits):
+        sides = []
+        for side, descending in ((0, True), (1, False)):
+            prices, volumes = state.get((pair, side), ([], []))
+            if digits is None:
+                sides.append(BookSide(list(prices), list(volumes), descending, None))
+            else:
+                sides.append(BookSide(array('q', prices), array('q', volumes), descending, digits))
+        return OrderBook(*sides)
+
+    def replay(self, start=None, end=None, markets=None, digits=None):
+        """
+        yields (time, {'base_alt': <OrderBook>}) in time order, one item per recorded time,
+        with the books recorded at that time. markets = slugs to replay (None for all).
+        start/end bound the times (None for no bound).
+        """
+        pairs = [i for slug, i in self.pair_ids.items() if markets is None or slug in markets]
+        if not pairs or not len(self):
+            return
+        lo = 0 if start is None else int(np.searchsorted(self.times, start, side='left'))
+        hi = len(self) if end is None else int(np.searchsorted(self.times, end, side='right'))
+        first = self.first_needed(pairs, lo)
+        wanted = np.zeros(len(self.pairs), dtype=bool)
+        wanted[pairs] = True
+        state = {}
+        current, depths = None, {}
+        for c in range(first, hi, self.CHUNK):
+            chunk = slice(c, min(c + self.CHUNK, hi))
+            rows = np.flatnonzero(wanted[self.snapshots['pair'][chunk]]) + c
+            columns = [self.snapshots[column][rows].tolist() for column in ('time', 'pair', 'keyframe', 'start', 'count')]
+            for i, t, pair, keyframe, s, n in zip(rows.tolist(), *columns):
+                self.apply(state, pair, keyframe, s, n, digits)
+                if i < lo:
+                    continue
+                if current is not None and t != current:
+                    yield current, depths
+                    depths = {}
+                current = t
+                depths[self.pairs[pair]] = self.book(state, pair, digits)
+        if depths:
+            yield current, depths
+
+    def book_at(self, slug, t, digits=None):
+        # the book of slug as last recorded at or before time t, None if there is none
+        pair = self.pair_ids.get(slug)
+        if pair is None:
+            return None
+        snaps, keyframes = self.pair_index(pair)
+        k = np.searchsorted(self.times[snaps], t, side='right') - 1
+        if k < 0:
+            return None
+        last = int(snaps[k])
+        f = np.searchsorted(keyframes, last, side='right') - 1
+        first = int(keyframes[f]) if f >= 0 else int(snaps[0])
+        state = {}
+        for i in snaps[np.searchsorted(snaps, first):k + 1].tolist():
+            self.apply(state, pair, int(self.snapshots['keyframe'][i]), int(self.snapshots['start'][i]),
+                       int(self.snapshots['count'][i]), digits)
+        return self.book(state, pair, digits)
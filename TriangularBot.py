@@ -4,34 +4,82 @@
 
 from itertools import combinations
 
+import config_tri as config
 from Bot import Bot
+from CycleFinder import CycleFinder
+from MarketFeed import MarketFeed
 from TriangularCalculator import TriangularCalculator
+from TriangularScanner import TriangularScanner
 from utils_broker import create_broker
 
 
 class TriangularBot(Bot):
-    def __init__(self, xchg_name, targets, sleep):
+    def __init__(self, xchg_name, targets, sleep, feed_address=None):
         # TriangularBot only trades on ONE broker
         Bot.__init__(self, 'TriangularBot[{}]'.format(xchg_name), sleep)
         self.broker = create_broker('PAPER', xchg_name, self.logger_name)
         self.targets = targets
         self.available_pairs = {}           # available_pairs[A] is a list of all possible (B, C)
         self.pairs_to_update = {}           # pairs_to_update[A] is [(A, B), (B, C), (C, A), (A, B'), ...]
+        self.scanners = {}                  # scanners[A] screens every roundtrip through A at once
+        self.feed_address = feed_address    # (host, port) of a streaming feed, None to poll REST snapshots
+        self.feed = None
+        self.cycle_finder = None            # cycles of up to MAX_CYCLE_LENGTH legs over the pairs we watch
 
     def init(self):
         self.update_pairs()
+        # the roundtrip pairs already link every major to every other one we can trade through,
+        # so longer cycles come from the same books without fetching anything more
+        self.cycle_finder = CycleFinder.from_broker(self.broker, self.triangle_pairs(), config.MAX_CYCLE_LENGTH)
+        if self.feed_address is not None:
+            self.feed = MarketFeed(self.broker, self.feed_address, set(self.triangle_pairs()), self.logger_name)
+            self.feed.start()
+
+    def data_event(self):
+        # with a feed, every book change wakes us up (changes during a tick are merged into the next one)
+        return self.feed.event if self.feed is not None else None
+
+    def triangle_pairs(self):
+        return [pair for target in self.targets for pair in self.pairs_to_update[target]]
+
+    def watched_pairs(self):
+        return {self.broker.xchg: self.triangle_pairs()}
+
+    def requests_per_tick(self):
+        if self.feed is not None:
+            return None
+        return self.broker.xchg.depth_requests(self.triangle_pairs())
 
     def tick(self):
         # Instead of looping over each pair, it makes more sense to trade one broker at a time
         # (Otherwise if we update all the brokers first and then trade each pair, slippage time increases!)
         self.log.info("tick")
-        self.broker.clear()
+        self.opportunities = {}
+        if self.feed is not None:
+            # the feed keeps the books fresh, nothing to refetch
+            updated = [tuple(market.split('_')) for market in self.feed.take_updates()]
+            with self.feed.lock:
+                self.find_cycles(updated)
+                for target in self.targets:
+                    self.trade_tri(self.broker, target)
+            return
+        # the previous books stay around, so the cycle search only re-checks the ones that changed
+        self.broker.new_tick()
         # We could update the ENTIRE depth here,
         # but it turns out that some exchanges trade FAR more currencies than we want to see.
         # Better to just update on each pair we trade (after all, we affect the orderbook)
+        updated = set()
         for target in self.targets:     # This loop is actually only ONE iteration
-            self.broker.update_multiple_depths(self.pairs_to_update[target])
+            self.broker.update_multiple_depths(self.pairs_to_update[target], self.backtest_data, self.tick_i,
+                                               config.DEPTH_LIMIT)
+            updated |= self.broker.updated
             self.trade_tri(self.broker, target)
+        self.find_cycles([tuple(slug.split('_')) for slug in updated])
+
+    def find_cycles(self, pairs):
+        # re-checks the cycles through the markets of pairs, which have just changed
+        for spread, cycle in self.cycle_finder.update_markets(self.broker, pairs):
+            self.log.info('profitable cycle {} : {}'.format(' -> '.join(cycle + cycle[:1]), spread))
 
     # Requires HTTP connection
     def get_roundtrip_pairs(self, target):
@@ -57,6 +105,8 @@ class TriangularBot(Bot):
         """
         for target in self.targets:
             self.available_pairs[target] = self.get_roundtrip_pairs(target)
+            self.scanners[target] = TriangularScanner(target, self.available_pairs[target],
+                                                      self.broker.xchg.trading_fee)
             self.pairs_to_update[target] = []
             for b, c in self.available_pairs[target]:
                 self.pairs_to_update[target].append((target, b))
@@ -66,9 +116,13 @@ class TriangularBot(Bot):
 
     def trade_tri(self, broker, target):
         # This bot only trades on one exchange at a time
-        pc = TriangularCalculator(broker, target, self.available_pairs[target], self.logger_name)
+        pc = TriangularCalculator(broker, target, self.available_pairs[target], self.logger_name,
+                                  self.scanners[target])
         if pc.check_profits():
             pc.get_best_roundtrip()
+        for slug, trip in pc.roundtrips.items():
+            B, C = slug.split('_')
+            self.opportunities[(target, B, C)] = (trip['profit'], target)
 
         # TODO: Submit order
         # TODO: Each broker automatically cancels orders if they don't go through.
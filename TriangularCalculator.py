@@ -1,32 +1,119 @@
 import logging
 from decimal import Decimal
 
-import utils
+from Order import Order
+from TriangularScanner import TriangularScanner
+
+
+def walk_roundtrip(legs, tx, min_volume=0):
+    """
+    finds the most profitable amount of A to put through a roundtrip.
+    legs = [A_B bids, B_C bids, C_A bids], every leg sells what the previous one got.
+    the amount of A we get back is a concave piecewise-linear function of the amount
+    we put in, with a breakpoint wherever one of the legs runs out of a level.
+    between breakpoints every 1A put in comes back as tx^n * (product of the current prices),
+    so we walk the ladders together (O(total levels)) and keep going while that is > 1,
+    or until min_volume is reached.
+    returns None if no volume >= min_volume is profitable, otherwise
+    {
+        'volume' : amount of A put in,
+        'profit' : net gain of A,
+        'orders' : [[<Order>...], ...] sell orders per leg, one per level used
+    }
+    """
+    n = len(legs)
+    level = [0] * n
+    left = []  # volume left at the current level of each leg
+    for leg in legs:
+        if len(leg) == 0:
+            return None
+        left.append(leg.volume(0))
+    fills = [[] for _ in legs]
+    volume = 0
+    profit = 0
+    while True:
+        # rate[k] = amount of leg k's currency one A turns into, rate[n] comes back as A
+        rate = [1]
+        for k in range(n):
+            rate.append(rate[-1] * legs[k].price(level[k]) * tx)
+        margin = rate[n] - 1
+        if margin <= 0 and volume >= min_volume:
+            break
+
+        # the first leg to run out of its level bounds the step (in A)
+        bound = min(range(n), key=lambda k: left[k] / rate[k])
+        step = left[bound] / rate[bound]
+        if margin <= 0 and volume + step > min_volume:
+            step = min_volume - volume
+            bound = None  # stops at min_volume, no level runs out
+        for k in range(n):
+            if len(fills[k]) == level[k]:
+                fills[k].append(0)
+            fills[k][level[k]] += step * rate[k]
+            left[k] -= step * rate[k]
+        volume += step
+        profit += step * margin
+        if bound is None:
+            break
+
+        # avoid leftover rounding dust on the leg that bounded the step
+        left[bound] = 0
+        exhausted = False
+        for k in range(n):
+            if left[k] <= 0:
+                level[k] += 1
+                if level[k] == len(legs[k]):
+                    exhausted = True  # one leg ran out of depth
+                    break
+                left[k] = legs[k].volume(level[k])
+        if exhausted:
+            break
+
+    if volume <= 0 or volume < min_volume or profit <= 0:
+        return None
+    return {
+        'volume': volume,
+        'profit': profit,
+        'orders': [[Order(legs[k].price(i), v, 'sell') for i, v in enumerate(fills[k])] for k in range(n)],
+    }
 
 
 class TriangularCalculator(object):
     """
     Profit calculator for single-exchange triangular arbitrage, trading
-    minimum arbitrage volumes.
+    the most profitable volume that satisfies the minimum arbitrage volumes.
     all this data will be computed for a SINGLE exchange SINGLE pair
     (by single pair, I am referring to the start/end currencies of the arbitrage).
     therefore, data structures are different from PairwiseCalculator
     """
 
-    def __init__(self, broker, target, roundtrip_pairs, logger_name):
+    # roundtrips are only walked when their top of book spread (fees applied) beats this
+    spread_threshold = 1.001
+    # the walk starts this much above the minimum volumes, margin for precision error
+    volume_margin = Decimal('1.01')
+
+    def __init__(self, broker, target, roundtrip_pairs, logger_name, scanner=None):
         self.broker = broker
         self.target = target
         self.roundtrip_pairs = roundtrip_pairs
+        # the scanner only depends on the roundtrip pairs, bots should build it once and pass it in
+        if scanner is None:
+            scanner = TriangularScanner(target, roundtrip_pairs, broker.xchg.trading_fee)
+        self.scanner = scanner
         """
         self.spreads take the form of {'X_Y' : 0.1245, 'V_W' : 0.54321}
+        only roundtrips with spread > 1 are kept.
+        self.candidates is the same, as a list of (spread, X, Y) ranked best spread first.
         """
         self.spreads = {}
+        self.candidates = []
         """
         self.roundtrips take the form of
         {
             'X_Y' : {
-                'orders' : [<Order>,<Order>,<Order>]
+                'orders' : [[<Order>...], [<Order>...], [<Order>...]] (A_B, B_C, C_A sells)
                 'profit' : 12.345
+                'volume' : amount of A put in
             },
             'V_W' : {
                 'orders' :
@@ -43,13 +130,11 @@ class TriangularCalculator(object):
         returns True if profitable round-trip exists between any 3 currencies.
         checks for spread between implied_hi_bid and market lo_ask
         """
-        is_profitable = False
-
-        for B, C in self.roundtrip_pairs:
-            if self.check_profit_oneway(self.target, B, C) > 1 or \
-                            self.check_profit_oneway(self.target, C, B) > 1:
-                is_profitable = True
-        return is_profitable
+        # every roundtrip in both directions at once, see TriangularScanner
+        self.candidates = self.scanner.candidates(self.broker, 1)
+        for spread, B, C in self.candidates:
+            self.spreads[B + '_' + C] = spread
+        return len(self.candidates) > 0
 
     def check_profit_oneway(self, A, B, C):
         """
@@ -85,9 +170,10 @@ class TriangularCalculator(object):
 
     def check_roundtrip(self, A, B, C):
         """
-        Calculates minimum profit of a given roundtrip (A, B, C)
+        Calculates the best profit of a given roundtrip (A, B, C)
         Accumulates profits on A (commonly BTC)
-        Minimum Profit : expected gain of A when minimum volume requirements for trades are 'tightly' satisfied.
+        Best Profit : expected gain of A at the most profitable volume that still satisfies
+        the minimum volume requirements for trades. returns False if there is none.
         double check_roundtrip(str A, str B, str C)
         """
         tx = 1 - self.broker.xchg.trading_fee
@@ -122,6 +208,9 @@ class TriangularCalculator(object):
         min_AA = self.broker.xchg.get_min_vol((A, B), O_AB_Sell)
         min_BB = self.broker.xchg.get_min_vol((B, C), O_BC_Sell)
         min_CC = self.broker.xchg.get_min_vol((C, A), O_CA_Sell)
+        if min_AA is None or min_BB is None or min_CC is None:
+            self.log.info('{}_{}_{} not enough depth to satisfy min trade, skipping...'.format(A, B, C))
+            return False
 
         # P_XY_Sell : price of 1X with respect to Y when we sell X
         P_AB_Sell = self.broker.get_highest_bid((A, B))
@@ -144,59 +233,31 @@ class TriangularCalculator(object):
 
         # V : Minimum volume of A which satisfies minimum volume requirements for trades
         # Margin for precision error
-        V = max(min_AA, min_BA, min_CA) * Decimal('1.01')
-
-        max_AA = O_AB_Sell[0].v
-        max_BB = O_BC_Sell[0].v
-        max_CC = O_CA_Sell[0].v
-        
-        max_BA = max_BB / P_AB_Sell / tx
-        max_CA = max_CC / P_BC_Sell / P_AB_Sell / tx / tx
-        
-        W = min(max_AA, max_BA, max_CA) * Decimal('0.99')
-        
-        # O_XY_Sell_Clipped : Clipped Order list of X_Y to sell (bids)
-        O_AB_Sell_Clipped = self.broker.xchg.get_clipped_base_volume(O_AB_Sell, V)
-        O_BC_Sell_Clipped = self.broker.xchg.get_clipped_base_volume(O_BC_Sell,
-                                                                     utils.total_alt_volume(O_AB_Sell_Clipped) * tx)
-        O_CA_Sell_Clipped = self.broker.xchg.get_clipped_base_volume(O_CA_Sell,
-                                                                     utils.total_alt_volume(O_BC_Sell_Clipped) * tx)
-        
-        if not O_AB_Sell_Clipped:
-            return False
-        if not O_BC_Sell_Clipped:
-            return False
-        if not O_CA_Sell_Clipped:
-            return False
+        V = max(min_AA, min_BA, min_CA) * self.volume_margin
 
-        netA = utils.total_alt_volume(O_CA_Sell_Clipped) * tx - utils.total_base_volume(O_AB_Sell_Clipped)
-        netB = utils.total_alt_volume(O_AB_Sell_Clipped) * tx - utils.total_base_volume(O_BC_Sell_Clipped)
-        netC = utils.total_alt_volume(O_BC_Sell_Clipped) * tx - utils.total_base_volume(O_CA_Sell_Clipped)
+        # walk all three ladders for the most profitable volume of A >= V, see walk_roundtrip
+        trip = walk_roundtrip([O_AB_Sell, O_BC_Sell, O_CA_Sell], tx, V)
 
         slug = B + '_' + C
-        self.roundtrips[slug] = {}
-        self.roundtrips[slug]['profit'] = netA
-        
+        if trip is None:
+            self.roundtrips.pop(slug, None)
+            return False
+        self.roundtrips[slug] = trip
+        netA = trip['profit']
+
         if netA > 0 :
             self.log.info('check_roundtrip({}, {}, {}) : {} BTC'.format(A, B, C, netA))
             self.log.info('    netA : {}'.format(netA))
-            self.log.info('    netB : {}'.format(netB))
-            self.log.info('    netC : {}'.format(netC))
-            self.log.info('    Volume : {} ~ {}'.format(V, W))
+            self.log.info('    Volume : {} ~ {}'.format(V, trip['volume']))
             self.log.info('    P_AB_Sell : {}'.format(P_AB_Sell))
             self.log.info('    P_BC_Sell : {}'.format(P_BC_Sell))
             self.log.info('    P_CA_Sell : {}'.format(P_CA_Sell))
-            
-            self.log.info('============================')
-            for o in O_AB_Sell_Clipped :
-                self.log.info('(price:{}, volume:{})'.format(o.p, o.v))
-            self.log.info('============================')
-            for o in O_BC_Sell_Clipped :
-                self.log.info('(price:{}, volume:{})'.format(o.p, o.v))
-            self.log.info('============================')
-            for o in O_CA_Sell_Clipped :
-                self.log.info('(price:{}, volume:{})'.format(o.p, o.v))
+
             self.log.info('============================')
+            for leg in trip['orders']:
+                for o in leg:
+                    self.log.info('(price:{}, volume:{})'.format(o.p, o.v))
+                self.log.info('============================')
 
         return netA
 
@@ -206,13 +267,11 @@ class TriangularCalculator(object):
         Takes the form of 3 trades that are computed to fill specific quantities of orders
         in each of 3 different markets in a single exchange.
         """
-        for slug, spread in self.spreads.items():
+        for spread, B, C in self.candidates:
             # Risk avoidance threshold 0.1%
-            B = slug.split('_')[0]
-            C = slug.split('_')[1]
             if spread > 1:
                 self.log.info('check_profit_oneway({}, {}, {}) : {}'.format(self.target, B, C, spread))
-            if spread > 1.001:
+            if spread > self.spread_threshold:
                 self.check_roundtrip(self.target, B, C)
 
         #TODO: Return orders to place
@@ -0,0 +1,74 @@
+import math
+
+import numpy as np
+
+
+class TriangularScanner(object):
+    """
+    Vectorized spread screen for every roundtrip of a single target currency.
+    The same spreads as TriangularCalculator.check_profit_oneway, computed for
+    every (B, C) in both directions in one pass:
+        log spread(A, B, C) = log P_AB + log P_BC + log P_CA + 3 log(1 - fee)
+    where P_XY is the highest X_Y bid.
+    The market index arrays only depend on the roundtrip pairs, so build this once
+    per set of pairs and call scan() every tick. Spreads are floats, this is only
+    a screen - check_roundtrip still does the exact (Decimal) math on the candidates.
+    """
+
+    def __init__(self, target, roundtrip_pairs, trading_fee):
+        self.target = target
+        self.roundtrip_pairs = list(roundtrip_pairs)
+        self.log_fee = 3 * math.log(1 - float(trading_fee))
+
+        A = target
+        index = {}
+        forward = []
+        reverse = []
+        for B, C in self.roundtrip_pairs:
+            forward.append([index.setdefault(pair, len(index)) for pair in ((A, B), (B, C), (C, A))])
+            reverse.append([index.setdefault(pair, len(index)) for pair in ((A, C), (C, B), (B, A))])
+        self.markets = sorted(index, key=index.get)  # every market whose best bid we need
+        self.forward = np.array(forward, dtype=np.intp).reshape(-1, 3)
+        self.reverse = np.array(reverse, dtype=np.intp).reshape(-1, 3)
+
+    def best_bids(self, broker):
+        # one lookup per market (not per triangle), NaN where the book is missing or empty
+        bids = np.full(len(self.markets), np.nan)
+        for i, (X, Y) in enumerate(self.markets):
+            book = broker.depth.get(X + '_' + Y)
+            if book is not None:
+                bid = book.best_bid()
+                if bid:
+                    bids[i] = float(bid)
+        return bids
+
+    def scan(self, broker):
+        """
+        returns (forward, reverse) spread arrays aligned with roundtrip_pairs:
+        forward[i] is the spread of (A, B, C), reverse[i] the spread of (A, C, B)
+        for roundtrip_pairs[i] = (B, C). NaN if any of the three books is empty.
+        """
+        log_bids = np.log(self.best_bids(broker))
+        forward = np.exp(log_bids[self.forward].sum(axis=1) + self.log_fee)
+        reverse = np.exp(log_bids[self.reverse].sum(axis=1) + self.log_fee)
+        return forward, reverse
+
+    def candidates(self, broker, threshold=1):
+        """
+        ranked list of (spread, B, C) for every roundtrip (A, B, C) with spread > threshold,
+        best spread first. (B, C) and (C, B) are separate entries.
+        """
+        forward, reverse = self.scan(broker)
+        spreads = np.concatenate((forward, reverse))
+        # NaN compares False, so empty books drop out here
+        hits = np.flatnonzero(spreads > threshold)
+        hits = hits[np.argsort(-spreads[hits], kind='stable')]
+        n = len(self.roundtrip_pairs)
+        ranked = []
+        for i in hits:
+            if i < n:
+                B, C = self.roundtrip_pairs[i]
+            else:
+                C, B = self.roundtrip_pairs[i - n]
+            ranked.append((float(spreads[i]), B, C))
+        return ranked
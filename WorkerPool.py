@@ -0,0 +1,155 @@
+# process-wide pool of worker threads for blocking exchange I/O
+# every bot and adapter submits its blocking calls here instead of starting threads of its own,
+# so the number of threads stays at config.IO_WORKERS however many bots and pairs there are.
+#
+# jobs are queued per exchange, and per owner (usually a bot) within an exchange.
+# free workers take turns between exchanges, and between owners within an exchange,
+# so one bot with a big tick can't starve the others. an exchange never has more than
+# config.FETCH_CONCURRENCY jobs running at once.
+
+import contextvars
+import threading
+from collections import deque
+from concurrent.futures import Future
+
+import config
+
+# who the current thread/task is working for, jobs submitted without an explicit owner are queued under it
+current_owner = contextvars.ContextVar('current_owner', default=None)
+
+
+class WorkerPool(object):
+    def __init__(self, workers=config.IO_WORKERS, per_exchange=config.FETCH_CONCURRENCY):
+        self.per_exchange = per_exchange
+        self.cond = threading.Condition()
+        self.queues = {}  # queues[exchange][owner] = deque of (future, func, args, kwargs)
+        self.exchanges = deque()  # exchanges with queued jobs, in turn order
+        self.owners = {}  # owners[exchange] = deque of owners with queued jobs, in turn order
+        self.running = {}  # running[exchange] = number of jobs being run
+        self.stats = {'submitted': 0, 'completed': 0, 'failed': 0, 'cancelled': 0}
+        self.stopped = False
+        self.threads = [threading.Thread(target=self.work, daemon=True) for _ in range(workers)]
+        [t.start() for t in self.threads]
+
+    def submit(self, exchange, func, *args, owner=None, **kwargs):
+        """
+        queues func(*args, **kwargs) on behalf of exchange (any hashable, usually its name)
+        returns a concurrent.futures.Future. cancelling it before a worker picks it up drops the job.
+        """
+        if owner is None:
+            owner = current_owner.get()
+        future = Future()
+        with self.cond:
+            owners = self.queues.setdefault(exchange, {})
+            if not owners:
+                self.exchanges.append(exchange)
+                self.owners[exchange] = deque()
+            if owner not in owners:
+                owners[owner] = deque()
+                self.owners[exchange].append(owner)
+            owners[owner].append((future, func, args, kwargs))
+            self.stats['submitted'] += 1
+            self.cond.notify_all()
+        return future
+
+    def cancel(self, owner):
+        # drops every queued job of owner, e.g. the requests left over from an abandoned tick
+        # returns how many jobs were dropped. jobs already running finish on their own.
+        dropped = 0
+        with self.cond:
+            for exchange in list(self.exchanges):
+                jobs = self.queues[exchange].pop(owner, None)
+                if jobs is None:
+                    continue
+                for future, func, args, kwargs in jobs:
+                    if future.cancel():
+                        dropped += 1
+                self.owners[exchange].remove(owner)
+                if not self.owners[exchange]:
+                    self.exchanges.remove(exchange)
+                    del self.queues[exchange]
+                    del self.owners[exchange]
+            self.stats['cancelled'] += dropped
+        return dropped
+
+    def queue_depths(self):
+        # {exchange: number of queued jobs}
+        with self.cond:
+            return {exchange: sum(len(jobs) for jobs in owners.values()) for exchange, owners in self.queues.items()}
+
+    def metrics(self):
+        with self.cond:
+            return {'queued': {exchange: sum(len(jobs) for jobs in owners.values())
+                               for exchange, owners in self.queues.items()},
+                    'running': {exchange: n for exchange, n in self.running.items() if n},
+                    'stats': dict(self.stats)}
+
+    def stop(self):
+        with self.cond:
+            self.stopped = True
+            self.cond.notify_all()
+
+    def _next_job(self):
+        # round robin over exchanges that are under their cap, then over that exchange's owners
+        for _ in range(len(self.exchanges)):
+            exchange = self.exchanges[0]
+            self.exchanges.rotate(-1)
+            if self.running.get(exchange, 0) >= self.per_exchange:
+                continue
+            owners = self.owners[exchange]
+            owner = owners[0]
+            jobs = self.queues[exchange][owner]
+            job = jobs.popleft()
+            if jobs:
+                owners.rotate(-1)
+            else:
+                owners.popleft()
+                del self.queues[exchange][owner]
+            if not owners:
+                self.exchanges.remove(exchange)
+                del self.queues[exchange]
+                del self.owners[exchange]
+            return exchange, job
+        return None, None
+
+    def work(self):
+        while True:
+            with self.cond:
+                exchange, job = self._next_job()
+                while job is None:
+                    if self.stopped:
+                        return
+                    self.cond.wait()
+                    exchange, job = self._next_job()
+                future, func, args, kwargs = job
+                if not future.set_running_or_notify_cancel():
+                    self.stats['cancelled'] += 1
+                    continue
+                self.running[exchange] = self.running.get(exchange, 0) + 1
+
+            try:
+                result = func(*args, **kwargs)
+            except BaseException as e:
+                future.set_exception(e)
+                outcome = 'failed'
+            else:
+                future.set_result(result)
+                outcome = 'completed'
+
+            with self.cond:
+                self.running[exchange] -= 1
+                self.stats[outcome] += 1
+                self.cond.notify_all()  # the exchange may be back under its cap
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    # the process-wide pool, shared by every bot and adapter
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = WorkerPool()
+        return _pool
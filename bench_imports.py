@@ -0,0 +1,45 @@
+# import-time benchmark
+# imports each module in a fresh interpreter (best of a few runs) and reports how long it took,
+# with sockets disabled so any network access at import time shows up as an error.
+# usage: python bench_imports.py [module ...]
+
+import subprocess
+import sys
+
+MODULES = ['utils_broker', 'TriangularBot', 'PairwiseBot',
+           'exchanges.Poloniex', 'exchanges.BTER', 'exchanges.Bitfinex']
+RUNS = 5
+
+SNIPPET = '''
+import socket, sys, time
+def no_network(*args, **kwargs):
+    raise RuntimeError('network access at import time')
+socket.socket.connect = no_network
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start)
+print(int('pandas' in sys.modules))
+'''
+
+
+def time_import(module):
+    # returns (seconds, pandas imported), or (None, error message)
+    best = None
+    for _ in range(RUNS):
+        proc = subprocess.run([sys.executable, '-c', SNIPPET.format(module=module)],
+                              stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+        if proc.returncode != 0:
+            return None, proc.stderr.strip().splitlines()[-1]
+        seconds, pandas = proc.stdout.split()
+        if best is None or float(seconds) < best:
+            best = float(seconds)
+    return best, pandas == '1'
+
+
+if __name__ == "__main__":
+    for module in sys.argv[1:] or MODULES:
+        seconds, info = time_import(module)
+        if seconds is None:
+            print('{:<24} FAILED  {}'.format(module, info))
+        else:
+            print('{:<24} {:8.1f} ms{}'.format(module, seconds * 1000, '  (imports pandas)' if info else ''))
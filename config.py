@@ -3,6 +3,7 @@
 # DO NOT let this file fall into the wrong hands!
 
 TICK_DIR = './data'  # path to folder containing serialized historical tick data
+RECORD_TICKS = False  # record every fetched book into TICK_DIR (see TickRecorder.py), for backtesting
 
 # reference values in USD for each currency
 # this is approximate. Unless values are a magnitude away from true values, I should be fine
@@ -32,6 +33,36 @@ PAPER_BALANCE = {k: 20 / v for k, v in VALUE_REF.items()}  # for 7 exchanges, ha
 # as you grow more confident in the stability of the trading bot, you can increase riskiness by decreasing this number.
 BTC_RISK = 0.001
 
+# orderbook prices/volumes are stored as integers in units of 10^-FIXED_POINT_DIGITS (8 = satoshis),
+# in contiguous int64 arrays: exact integer volume sums, and the exchange strings are parsed without
+# going through Decimal. anything past the last digit is truncated.
+# None keeps one Decimal object per price and volume instead.
+FIXED_POINT_DIGITS = 8
+
+# max market data requests in flight per exchange, see FetchEngine.py
+FETCH_CONCURRENCY = 8
+# seconds a tick waits for its market data before it is abandoned (None waits forever)
+FETCH_TIMEOUT = 10
+# threads shared by every bot for blocking exchange calls, see WorkerPool.py
+IO_WORKERS = 8
+# request budgets per exchange and endpoint class, overriding the defaults in exchanges/api/rate_limit.py
+# e.g. {'poloniex': {'public': (6, 6)}} is 6 requests per second with bursts of up to 6, None lifts a limit.
+# bots wait for their tick's budget before ticking, so a tick period of 0 polls as fast as the limits allow.
+RATE_LIMITS = {}
+
+# order book levels fetched per side, None for full books.
+# either one number for every pair, or per pair: {('ETH', 'BTC'): 20, ...} (pairs left out get full books).
+# strategies override this in their own config.
+DEPTH_LIMIT = None
+
+# exchange metadata (pairs, min volumes, majors, fees) is cached here between runs, None disables the cache.
+# entries older than METADATA_TTL seconds are still used at startup, but refreshed in the background.
+METADATA_CACHE = TICK_DIR + '/metadata.json'
+METADATA_TTL = 6 * 60 * 60
+# no network at all: exchanges take their metadata from METADATA_CACHE however old it is, never refresh it,
+# and don't read their api keys. backtests run this way (see Backtester.py), a missing cache is an error.
+OFFLINE = False
+
 keys_dir = "exchanges/keys/"
 # BTER API
 BTER_KEYFILE = keys_dir + "bter_key.txt"
@@ -2,3 +2,4 @@ from config import *
 
 EXCHANGES = ['BTER', 'POLO', 'BITF']
 TICK_PERIOD = 5
+DEPTH_LIMIT = 20
@@ -3,3 +3,8 @@ from config import *
 EXCHANGES = ['BTER', 'POLO','BITF']
 TARGETS = {'BTER': ['BTC'], 'POLO': ['BTC'], 'BITF':['BTC']}
 TICK_PERIOD = 1
+DEPTH_LIMIT = 20  # check_roundtrip rarely walks past the first few levels
+MAX_CYCLE_LENGTH = 5  # longest cycle (in legs) the cycle search over the roundtrip pairs looks for
+# streaming feeds (see MarketFeed.py), e.g. {'POLO': ('127.0.0.1', 9001)}
+# exchanges without an entry poll REST snapshots every tick
+FEEDS = {}
@@ -2,35 +2,53 @@ import os
 from decimal import Decimal
 
 from Order import Order
-from utils import get_swapped_order, total_base_volume
+from OrderBook import OrderBook
+from utils import get_swapped_order
+from utils_depth import decode
 from .Exchange import Exchange
 from .api import bter_api
 
 
 class BTER(Exchange):
+    # BTER lists asks worst price first, Broker reverses them on ingestion
+    sorted_depth = False
+    api_name = 'bter'
+
     def __init__(self, keyfile, logger_name):
         # TODO: Rename one of "keyfile"s
-        keyfile = os.path.abspath(keyfile)
-        self.keyhandler = bter_api.KeyHandler(keyfile)
-        key = self.keyhandler.getKeys()[0]
+        # keyfile = None for market data only (see config.OFFLINE)
         self.conn = bter_api.BTERConnection()
-        self.api = bter_api.TradeAPI(key, self.keyhandler)
-        self.min_volumes = bter_api.get_min_volumes()
+        self.keyhandler = self.api = None
+        if keyfile is not None:
+            keyfile = os.path.abspath(keyfile)
+            self.keyhandler = bter_api.KeyHandler(keyfile)
+            key = self.keyhandler.getKeys()[0]
+            self.api = bter_api.TradeAPI(key, self.keyhandler)
         Exchange.__init__(self, 'BTER', Decimal('0.002'), logger_name)
 
+    def get_market_symbol(self, pair):
+        base, alt = pair
+        return base.lower() + '_' + alt.lower()
+
+    def get_market_min_volume(self, pair):
+        return self.min_volumes.get(self.get_market_symbol(pair))
+
+    def fetch_min_volumes(self):
+        return bter_api.get_min_volumes()
+
     def get_min_vol(self, pair, depth):
-        test = self.get_validated_pair(pair)
-        if test is not None:
-            true_pair, swapped = test
-            base, alt = true_pair
-            slug = base.lower() + '_' + alt.lower()
-            alt_vol = Decimal(self.min_volumes[slug])
-            if swapped:
+        market = self.get_market(pair)
+        if market is not None:
+            alt_vol = market.min_volume
+            if market.swapped:
                 return alt_vol
             else:
-                return total_base_volume(self.get_clipped_alt_volume(depth, alt_vol))
+                clipped = self.get_clipped_alt_volume(depth, alt_vol)
+                if clipped is None:
+                    return None  # the book is too thin to trade the minimum
+                return clipped.cumulative_base_volume()
 
-    def get_major_currencies(self):
+    def fetch_major_currencies(self):
         majors = []
         for sym, cap in bter_api.get_market_cap().items():
             if len(cap) >= 5:
@@ -38,30 +56,40 @@ class BTER(Exchange):
         majors.append('CNY')  # BTER focuses on CNY.
         return majors
 
-    def get_tradeable_pairs(self):
+    def fetch_tradeable_pairs(self):
         tradeable_pairs = []
-        for pair in bter_api.all_pairs:
+        for pair in bter_api.get_all_pairs():
             base, alt = pair.split('_')
             tradeable_pairs.append((base.upper(), alt.upper()))
         return tradeable_pairs
 
-    def get_depth(self, base, alt):
-        book = {'bids': [], 'asks': []}
-        pair, swapped = self.get_validated_pair((base, alt))
-        if pair is None:
-            return
+    def book_from_depth(self, market, asks, bids, limit=None):
+        # BTER has no depth parameter, extra levels are dropped here instead.
+        # its asks come worst price first, so they have to be turned around before cutting
+        if limit is not None and len(asks) > 1 and Decimal(asks[0][0]) > Decimal(asks[-1][0]):
+            asks = asks[::-1]
+        book = OrderBook.from_levels(bids, asks, self.fixed_point_digits, limit)
+        if market.swapped:
+            book = book.inverted()
+        return book
 
-        pairstr = pair[0].lower() + '_' + pair[1].lower()
-        asks, bids = bter_api.getDepth(pairstr)
+    def get_depth(self, base, alt, depth=None):
+        market = self.get_market((base, alt))
+        if market is None:
+            return OrderBook()
 
-        if not swapped:
-            book['bids'] = [Order(Decimal(b[0]), Decimal(b[1])) for b in bids]
-            book['asks'] = [Order(Decimal(a[0]), Decimal(a[1])) for a in asks]
-        else:
-            book['asks'] = [get_swapped_order(Order(Decimal(b[0]), Decimal(b[1]))) for b in bids]
-            book['bids'] = [get_swapped_order(Order(Decimal(a[0]), Decimal(a[1]))) for a in asks]
+        text = bter_api.BTERConnection().makeRequest('/api/1/depth/' + market.symbol, method='GET')
+        response = bter_api.common.validateResponse(decode(text))
+        return self.book_from_depth(market, response['asks'], response['bids'], depth)
 
-        return book
+    async def async_get_depth(self, engine, base, alt, depth=None):
+        market = self.get_market((base, alt))
+        if market is None:
+            return OrderBook()
+
+        text = await engine.get(self.api_name, 'https://' + bter_api.common.domain + '/api/1/depth/' + market.symbol)
+        response = bter_api.common.validateResponse(decode(text))
+        return self.book_from_depth(market, response['asks'], response['bids'], depth)
 
     def get_balance(self, currency):
         funds = self.api.getFunds(self.conn, error_handler=None)
@@ -77,11 +105,10 @@ class BTER(Exchange):
         return {k: Decimal(v) for k, v in funds}
 
     def submit_order(self, order_type, pair, price, volume):
-        true_pair, swapped = self.get_validated_pair(pair)
-        if true_pair is not None:
-            base, alt = true_pair
-            slug = base.lower() + '_' + alt.lower()
-            if not swapped:
+        market = self.get_market(pair)
+        if market is not None:
+            slug = market.symbol
+            if not market.swapped:
                 if order_type == 'buy':
                     self.api.placeOrder(slug, 'buy', price, volume)
                 elif order_type == 'sell':
@@ -1,61 +1,86 @@
 from decimal import Decimal
 
-from Order import Order
-from utils import get_swapped_order, total_base_volume
+from OrderBook import OrderBook
+from utils_depth import decode
 
 from .Exchange import Exchange
 from .api import bitfinex_api
 
 
 class Bitfinex(Exchange):
+    # books come back best price first on both sides
+    sorted_depth = True
+    api_name = 'bitfinex'
+
     def __init__(self, keyfile, logger_name):
-        key, secret = open(keyfile, 'r').read().split()
+        # keyfile = None for market data only (see config.OFFLINE)
+        key, secret = open(keyfile, 'r').read().split() if keyfile is not None else (None, None)
         self.api = bitfinex_api
         self.client = self.api.Client()
         self.trader = self.api.TradeClient(key, secret)
-        self.min_volumes = \
-            {info['pair']: Decimal(info['minimum_order_size']) for info in self.client.symbols_details()}
         Exchange.__init__(self, 'Bitfinex', Decimal('0.002'), logger_name)
 
-    def get_major_currencies(self):
+    def fetch_major_currencies(self):
         return ['USD', 'BTC', 'ETH', 'ETC', 'BFX', 'ZEC', 'XMR', 'RRT', 'LTC']
 
-    def get_tradeable_pairs(self):
+    def fetch_tradeable_pairs(self):
         tradeable_pairs = []
         for symbol in self.client.symbols():
             base, alt = symbol[:3].upper(), symbol[3:].upper()
             tradeable_pairs.append((base, alt))
         return tradeable_pairs
 
+    def get_market_symbol(self, pair):
+        base, alt = pair
+        return base.lower() + alt.lower()
+
+    def get_market_min_volume(self, pair):
+        return self.min_volumes.get(self.get_market_symbol(pair))
+
+    def fetch_min_volumes(self):
+        return {info['pair']: Decimal(info['minimum_order_size']) for info in self.client.symbols_details()}
+
     def get_min_vol(self, pair, depth):
-        test = self.get_validated_pair(pair)
-        if test is not None:
-            true_pair, swapped = test
-            base, alt = true_pair
-            slug = base.lower() + alt.lower()
-            alt_vol = self.min_volumes[slug]
-            if swapped:
+        market = self.get_market(pair)
+        if market is not None:
+            alt_vol = market.min_volume
+            if market.swapped:
                 return alt_vol
             else:
-                return total_base_volume(self.get_clipped_alt_volume(depth, alt_vol))
+                clipped = self.get_clipped_alt_volume(depth, alt_vol)
+                if clipped is None:
+                    return None  # the book is too thin to trade the minimum
+                return clipped.cumulative_base_volume()
 
-    def get_depth(self, base, alt):
-        book = {'bids': [], 'asks': []}
-        pair, swapped = self.get_validated_pair((base, alt))
+    def book_from_depth(self, market, depth):
+        asks, bids = depth['asks'], depth['bids']
+        book = OrderBook.from_levels(((b['price'], b['amount']) for b in bids),
+                                     ((a['price'], a['amount']) for a in asks),
+                                     self.fixed_point_digits)
+        if market.swapped:
+            book = book.inverted()
+        return book
 
-        if pair is not None:
-            true_base, true_alt = pair
-            depth = self.client.order_book(true_base.lower() + true_alt.lower())
-            asks, bids = depth['asks'], depth['bids']
+    def depth_parameters(self, depth):
+        # bitfinex sends 50 levels per side unless told otherwise
+        if depth is None:
+            return None
+        return {'limit_bids': depth, 'limit_asks': depth}
 
-            if not swapped:
-                book['bids'] = [Order(b['price'], b['amount']) for b in bids]
-                book['asks'] = [Order(a['price'], a['amount']) for a in asks]
-            else:
-                book['asks'] = [get_swapped_order(Order(b['price'], b['amount'])) for b in bids]
-                book['bids'] = [get_swapped_order(Order(a['price'], a['amount'])) for a in asks]
+    def get_depth(self, base, alt, depth=None):
+        market = self.get_market((base, alt))
+        if market is None:
+            return OrderBook()
+        response = self.client.order_book(market.symbol, self.depth_parameters(depth), raw=True)
+        return self.book_from_depth(market, response)
 
-        return book
+    async def async_get_depth(self, engine, base, alt, depth=None):
+        market = self.get_market((base, alt))
+        if market is None:
+            return OrderBook()
+        url = self.client.url_for(self.api.client.PATH_ORDERBOOK, market.symbol, self.depth_parameters(depth))
+        text = await engine.get(self.api_name, url)
+        return self.book_from_depth(market, decode(text))
 
     def get_balance(self, currency):
         balances = self.get_all_balances()
@@ -1,41 +1,145 @@
 import abc
-import copy
+import asyncio
 import logging
-import threading
+from decimal import Decimal
 
-import utils
-
-
-def update_depth(pair, xchg, depth):
-    base, alt = pair
-    try:
-        depth[base + '_' + alt] = xchg.get_depth(base, alt)
-    except:
-        xchg.log.info("Problem in {}".format(xchg.name))
-        depth[base + '_' + alt] = {'bids': [], 'asks': []}
+import config
+from MetadataCache import MetadataCache
+from OrderBook import OrderBook
+from WorkerPool import get_pool
+from .Market import Market
+from .api.rate_limit import get_limiter
 
 
 class Exchange(object):
     """docstring for Exchange"""
     __metaclass__ = abc.ABCMeta
 
+    # set to True in adapters whose exchange already returns depth sorted best price first,
+    # the Broker then skips the sortedness check for their books
+    sorted_depth = False
+    # name of the exchange's pooled session and request budget, see api/http_pool.py and api/rate_limit.py
+    api_name = None
+
     def __init__(self, name, trading_fee, logger_name):
         super(Exchange, self).__init__()
         self.name = name
         self.log = logging.getLogger(logger_name)
         self.trading_fee = trading_fee
+        self.fixed_point_digits = config.FIXED_POINT_DIGITS  # orderbook storage mode, see config.py
         self.ok = True
-        self.tradeable_pairs = self.get_tradeable_pairs()
+        self.tradeable_pairs = []
+        self.major_currencies = []
+        self.min_volumes = {}  # min_volumes[symbol] = minimum order volume, in the market's alt
+        self.markets = {}
+        self.metadata_cache = None
+        if self.api_name in config.RATE_LIMITS:
+            get_limiter().set_limits(self.api_name, config.RATE_LIMITS[self.api_name])
+        if config.METADATA_CACHE is not None:
+            self.metadata_cache = MetadataCache(config.METADATA_CACHE, config.METADATA_TTL)
+        self.load_metadata()
 
     @abc.abstractmethod
-    def get_major_currencies(self):
+    def fetch_major_currencies(self):
         return NotImplemented
 
     # Output:
     @abc.abstractmethod
-    def get_tradeable_pairs(self):
+    def fetch_tradeable_pairs(self):
         return NotImplemented
 
+    def fetch_min_volumes(self):
+        # {symbol: min volume} for the exchanges that publish them, see get_market_min_volume
+        return {}
+
+    def fetch_trading_fee(self):
+        # none of the exchanges publish it, the adapters hardcode theirs
+        return self.trading_fee
+
+    def get_major_currencies(self):
+        return self.major_currencies
+
+    def get_tradeable_pairs(self):
+        return self.tradeable_pairs
+
+    def fetch_metadata(self):
+        # everything we need about the exchange before the first tick, in cacheable (JSON) form
+        return {
+            'pairs': [list(pair) for pair in self.fetch_tradeable_pairs()],
+            'min_volumes': {symbol: str(vol) for symbol, vol in self.fetch_min_volumes().items()},
+            'majors': list(self.fetch_major_currencies()),
+            'fee': str(self.fetch_trading_fee()),
+        }
+
+    def set_metadata(self, metadata):
+        # markets is rebuilt aside and swapped in whole, so a refresh never shows a half-built index.
+        # the cached 'fee' is only a record: the adapter's own trading_fee always wins, so changing
+        # the hardcoded fee takes effect right away instead of after the cache goes stale
+        self.min_volumes = {symbol: Decimal(vol) for symbol, vol in metadata['min_volumes'].items()}
+        self.major_currencies = list(metadata['majors'])
+        tradeable_pairs = [tuple(pair) for pair in metadata['pairs']]
+        self.markets = self.build_markets(tradeable_pairs)
+        self.tradeable_pairs = tradeable_pairs
+
+    def load_metadata(self):
+        """
+        starts from the cached metadata when there is any, so startup doesn't wait on the network.
+        a stale cache is refreshed in the background, no cache at all means fetching it right now.
+        offline (see config.OFFLINE) the cache is all there is, stale or not.
+        """
+        metadata, fresh = None, False
+        if self.metadata_cache is not None:
+            metadata, fresh = self.metadata_cache.load(self.name)
+        if config.OFFLINE:
+            if metadata is None:
+                raise RuntimeError('{} has no cached metadata in {}, it has to be fetched online first'.format(
+                    self.name, config.METADATA_CACHE))
+            self.set_metadata(metadata)
+            return
+        if metadata is None:
+            self.refresh_metadata()
+            return
+        self.set_metadata(metadata)
+        if not fresh:
+            get_pool().submit(self.name, self.refresh_metadata, True)
+
+    def refresh_metadata(self, background=False):
+        try:
+            metadata = self.fetch_metadata()
+        except Exception as e:
+            if not background:
+                raise
+            self.log.info('{} metadata refresh failed, keeping the cached one: {}'.format(self.name, e))
+            return
+        self.set_metadata(metadata)
+        if self.metadata_cache is not None:
+            self.metadata_cache.store(self.name, metadata)
+
+    def get_market_symbol(self, pair):
+        # the exchange's name for a listed (base, alt) market, override in adapters
+        base, alt = pair
+        return base + '_' + alt
+
+    def get_market_min_volume(self, pair):
+        # minimum order volume of a listed (base, alt) market, in alt. None if unknown
+        return None
+
+    def build_markets(self, tradeable_pairs):
+        """
+        indexes every listed market under both orientations of its pair,
+        markets[(base, alt)] = markets[(alt, base)] = <Market>,
+        so validating a pair is a single dict lookup instead of a scan of tradeable_pairs.
+        a pair listed both ways keeps its own market.
+        """
+        markets = {}
+        for pair in tradeable_pairs:
+            base, alt = pair
+            symbol = self.get_market_symbol(pair)
+            min_volume = self.get_market_min_volume(pair)
+            markets.setdefault((alt, base), Market(pair, True, symbol, min_volume))
+            markets[pair] = Market(pair, False, symbol, min_volume)
+        return markets
+
     @abc.abstractmethod
     def get_min_vol(self, pair, depth):
         """
@@ -51,29 +155,63 @@ class Exchange(object):
 
     @abc.abstractmethod
     # TODO: Why two parameters, base and alt are given, not a pair?
-    def get_depth(self, base, alt):
+    def get_depth(self, base, alt, depth=None):
         """
         returns all bids (someone wants to buy Base from you)
         and asks (someone offering to sell base to you).
         If exchange does not support the base_alt market but supports
         the alt_base market instead, it is up to the exchange to convert
         retrieved data to the desired format.
+        depth = number of levels wanted per side (None for the whole book).
+        adapters pass it on to the exchange when it has a parameter for it,
+        otherwise they drop the extra levels while parsing.
         """
         return NotImplemented
 
-    def get_multiple_depths(self, pairs):
+    def depth_limit(self, depth, pair):
+        """
+        depth limits are given either for all pairs (an int, or None for full books)
+        or per pair: {(base, alt): int}, pairs missing from it get full books.
+        """
+        if isinstance(depth, dict):
+            base, alt = pair
+            return depth.get((base, alt), depth.get((alt, base)))
+        return depth
+
+    def depth_requests(self, pairs):
+        # {api name: number of requests} get_multiple_depths(pairs) makes, for pacing ticks to the rate limit
+        return {self.api_name: len(pairs)}
+
+    async def async_get_depth(self, engine, base, alt, depth=None):
+        """
+        coroutine version of get_depth, run on the FetchEngine's loop.
+        adapters override this with a real async request,
+        by default the blocking get_depth runs on the shared WorkerPool.
+        """
+        return await engine.run_blocking(self.name, self.get_depth, base, alt, depth)
+
+    async def async_get_multiple_depths(self, engine, pairs, depth=None):
+        async def fetch(pair):
+            base, alt = pair
+            try:
+                return await self.async_get_depth(engine, base, alt, self.depth_limit(depth, pair))
+            except Exception:
+                self.log.info("Problem in {}".format(self.name))
+                return OrderBook()
+
+        books = await asyncio.gather(*(fetch(pair) for pair in pairs))
+        return {base + '_' + alt: book for (base, alt), book in zip(pairs, books)}
+
+    def get_multiple_depths(self, pairs, depth=None):
         """
         Returns entire orderbook for multiple exchanges.
         Very useful for triangular arb, but note that not all exchanges support this.
-        the default implementation is to simply fetch one pair at a time, but this is very slow.
+        the default implementation is to request every pair at once on the FetchEngine's loop.
         Some exchanges already provide full orderbooks when fetching market data, so superclass those.
+        depth limits the levels per side, see depth_limit.
         """
-        depth = {}
-        threads = [threading.Thread(target=update_depth, args=(pair, self, depth)) for pair in pairs]
-
-        [t.start() for t in threads]
-        [t.join() for t in threads]
-        return depth
+        from FetchEngine import get_engine  # the engine pulls in aiohttp, only load it when we fetch
+        return get_engine().get_multiple_depths(self, pairs, depth=depth)
 
     @abc.abstractmethod
     def get_balance(self, currency):
@@ -113,25 +251,13 @@ class Exchange(object):
 
     def get_clipped_base_volume(self, orders, desired_base_vol):
         # it is already assumed that the orders are base_alt
-        # reduces given array of orders to match specific base vol
-        # borrowed from the original profit calculator
-
-        i = 1
-        while utils.total_base_volume(orders[:i]) < desired_base_vol:
-            i += 1
-            if i > len(orders):
-                # not enough orders in the orderbook!
-                self.log.info('Not enough orders in orderbook to satisfy required base volume!')
-                return None
-        # cor
-        base_remainder = utils.total_base_volume(orders[:i]) - desired_base_vol
-        # convert back to units base and subtract from last order
-        ret = []
-        for o in orders[:i] :
-            ret.append(copy.copy(o))
-        ret[i - 1].v -= base_remainder
-        
-        return ret
+        # reduces given side of the book to match specific base vol
+        # the cut level is found by binary search over the cached cumulative volumes
+        clipped = orders.clip_base_volume(desired_base_vol)
+        if clipped is None:
+            # not enough orders in the orderbook!
+            self.log.info('Not enough orders in orderbook to satisfy required base volume!')
+        return clipped
 
     def get_clipped_alt_volume(self, orders, desired_alt_volume):
         """
@@ -147,27 +273,17 @@ class Exchange(object):
         if not, then we have to compute the difference
         diff = min_vol(A_B) - (P1 * V1) = remaining units of A that we need to spend/give
         on the remaining orders.
-        iterate through the rest of the orders as long as min vol is not satisfied!
-        """
-
-        i = 1
-        while utils.total_alt_volume(orders[:i]) < desired_alt_volume:
-            i += 1
-            if i > len(orders):
-                # not enough orders in the orderbook!
-                self.log.info('Not enough orders in orderbook to satisfy required alt volume!')
-                return None
-        # more than likely, adding on the last order tacked on a bit of overshoot.
-        # the remainder MUST be spanned by last order (i.e. cannot be in the second
-        # to last otherwise we would have caught it)
-        alt_remainder = utils.total_alt_volume(orders[:i]) - desired_alt_volume
-        # convert back to units base and subtract from last order
-        ret = []
-        for o in orders[:i] :
-            ret.append(copy.copy(o))
-        ret[i - 1].v -= alt_remainder / ret[i - 1].p
-        
-        return ret
+        the first level where the cumulative alt volume reaches min vol is where we cut.
+        """
+        clipped = orders.clip_alt_volume(desired_alt_volume)
+        if clipped is None:
+            # not enough orders in the orderbook!
+            self.log.info('Not enough orders in orderbook to satisfy required alt volume!')
+        return clipped
+
+    def get_market(self, pair):
+        # the listed market behind pair (in either orientation), None if it isn't traded
+        return self.markets.get(tuple(pair))
 
     def get_validated_pair(self, pair):
         """
@@ -176,11 +292,8 @@ class Exchange(object):
         returns (true_pair, swapped)
         else if pair isn't even traded, return None
         """
-        base, alt = pair
-        if pair in self.tradeable_pairs:
-            return (pair, False)
-        elif (alt, base) in self.tradeable_pairs:
-            return ((alt, base), True)
-        else:
+        market = self.markets.get(tuple(pair))
+        if market is None:
             # pair is not even traded
             return None
+        return (market.pair, market.swapped)
@@ -0,0 +1,17 @@
+# one market listed on an exchange, as seen from either orientation of its pair
+
+
+class Market(object):
+    __slots__ = ('pair', 'swapped', 'symbol', 'min_volume')
+
+    def __init__(self, pair, swapped, symbol, min_volume=None):
+        """
+        pair = (base, alt) the exchange actually lists
+        swapped = True if we looked it up as (alt, base)
+        symbol = the exchange's own name for the market, ready for api calls
+        min_volume = minimum order volume, in the listed market's alt (None if unknown)
+        """
+        self.pair = pair
+        self.swapped = swapped
+        self.symbol = symbol
+        self.min_volume = min_volume
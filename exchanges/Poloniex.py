@@ -2,21 +2,29 @@
 ALL pairs are written in the order of (BIG coin)_(small coin)
 """
 
-from Order import Order
-from utils import get_swapped_order, total_base_volume
 from decimal import Decimal
 
+from Order import Order
+from OrderBook import OrderBook
+from utils import get_swapped_order
+from utils_depth import decode, decode_selected
+
 from .Exchange import Exchange
-from .api.poloniex_api import poloniex
+from .api.poloniex_api import poloniex, public_url
 
 
 class Poloniex(Exchange):
+    # books come back best price first on both sides
+    sorted_depth = True
+    api_name = 'poloniex'
+
     def __init__(self, keyfile, logger_name):
-        key, secret = open(keyfile, 'r').read().split()
+        # keyfile = None for market data only (see config.OFFLINE)
+        key, secret = open(keyfile, 'r').read().split() if keyfile is not None else (None, None)
         self.api = poloniex(key, secret)
         Exchange.__init__(self, 'Poloniex', Decimal('0.0025'), logger_name)
 
-    def get_major_currencies(self):
+    def fetch_major_currencies(self):
         majors = []
         for pair, rate in self.api.return24hVolume().items():
             if 'total' in pair:
@@ -27,71 +35,92 @@ class Poloniex(Exchange):
         majors.append('BTC')
         return majors
 
-    def get_tradeable_pairs(self):
+    def fetch_tradeable_pairs(self):
         tradeable_pairs = []
         for pair in self.api.returnTicker():
             alt, base = pair.split('_')
             tradeable_pairs.append((base.upper(), alt.upper()))
         return tradeable_pairs
 
+    def get_market_symbol(self, pair):
+        base, alt = pair
+        return alt.upper() + '_' + base.upper()
+
     # not all exchanges have the same min volumes!
+    def get_market_min_volume(self, pair):
+        return Decimal('0.0001')  # 0.011 reduces likelihood we run into rounding errors. but we miss a lot of opportunity
+
     def get_min_vol(self, pair, depth):
-        test = self.get_validated_pair(pair)
-        if test is not None:
-            true_pair, swapped = test
-            if swapped:
-                return Decimal('0.0001')  # 0.011 reduces likelihood we run into rounding errors. but we miss a lot of opportunity
+        market = self.get_market(pair)
+        if market is not None:
+            if market.swapped:
+                return market.min_volume
             else:
                 # we need to use the depth information to calculate
                 # how much alt we need to trade to fulfill min base vol
-                return total_base_volume(self.get_clipped_alt_volume(depth, Decimal('0.0001')))
-
-    def get_depth(self, base, alt):
-        book = {'bids': [], 'asks': []}
-        pair, swapped = self.get_validated_pair((base, alt))
-
-        if pair is not None:
-            true_base, true_alt = pair
-            depth = self.api.returnOrderBook(true_alt.upper() + '_' + true_base.upper())
-            asks, bids = depth['asks'], depth['bids']
-
-            if not swapped:
-                book['bids'] = [Order(Decimal(b[0]), Decimal(b[1])) for b in bids]
-                book['asks'] = [Order(Decimal(a[0]), Decimal(a[1])) for a in asks]
-            else:
-                book['asks'] = [get_swapped_order(Order(Decimal(b[0]), Decimal(b[1]))) for b in bids]
-                book['bids'] = [get_swapped_order(Order(Decimal(a[0]), Decimal(a[1]))) for a in asks]
-
+                clipped = self.get_clipped_alt_volume(depth, market.min_volume)
+                if clipped is None:
+                    return None  # the book is too thin to trade the minimum
+                return clipped.cumulative_base_volume()
+
+    def book_from_depth(self, market, depth, limit=None):
+        asks, bids = depth['asks'], depth['bids']
+        book = OrderBook.from_levels(bids, asks, self.fixed_point_digits, limit)
+        if market.swapped:
+            book = book.inverted()
         return book
 
+    def get_depth(self, base, alt, depth=None):
+        market = self.get_market((base, alt))
+        if market is None:
+            return OrderBook()
+        return self.book_from_depth(market, decode(self.api.returnOrderBookText(market.symbol, depth)))
+
+    async def async_get_depth(self, engine, base, alt, depth=None):
+        market = self.get_market((base, alt))
+        if market is None:
+            return OrderBook()
+        text = await engine.get(self.api_name, public_url('returnOrderBook', market.symbol, depth))
+        return self.book_from_depth(market, decode(text))
+
+    def all_depth_limit(self, pairs, depth):
+        # one depth parameter covers every market in the 'all' request, so ask for the deepest we need
+        limits = [self.depth_limit(depth, pair) for pair in pairs]
+        if not limits or None in limits:
+            return None
+        return max(limits)
+
     # Poloniex supports getting multiple orderbooks
-    def get_multiple_depths(self, pairs):
-        depth = {}
-        all_depths = self.api.returnOrderBook('all')
-
-        for pair in pairs:
-            book = {'bids': [], 'asks': []}
-            true_pair, swapped = self.get_validated_pair(pair)
-            if true_pair is not None:
-                true_base, true_alt = true_pair
-                slug = true_alt.upper() + '_' + true_base.upper()
-                if slug in all_depths:
-                    single_depth = all_depths[slug]
-                    asks, bids = single_depth['asks'], single_depth['bids']
-
-                    if not swapped:
-                        book['bids'] = [Order(Decimal(b[0]), Decimal(b[1])) for b in bids]
-                        book['asks'] = [Order(Decimal(a[0]), Decimal(a[1])) for a in asks]
-                    else:
-                        book['asks'] = [get_swapped_order(Order(Decimal(b[0]), Decimal(b[1]))) for b in bids]
-                        book['bids'] = [get_swapped_order(Order(Decimal(a[0]), Decimal(a[1]))) for a in asks]
+    def depth_requests(self, pairs):
+        # every market comes in the one 'all' request
+        return {self.api_name: 1}
+
+    def get_multiple_depths(self, pairs, depth=None):
+        text = self.api.returnOrderBookText('all', self.all_depth_limit(pairs, depth))
+        return self.books_from_all_depths(pairs, text, depth)
+
+    async def async_get_multiple_depths(self, engine, pairs, depth=None):
+        text = await engine.get(self.api_name, public_url('returnOrderBook', 'all', self.all_depth_limit(pairs, depth)))
+        return self.books_from_all_depths(pairs, text, depth)
+
+    def books_from_all_depths(self, pairs, text, depth=None):
+        # the 'all' response has every market on the exchange, only decode the ones we asked for
+        markets = [self.get_market(pair) for pair in pairs]
+        all_depths = decode_selected(text, set(market.symbol for market in markets if market is not None))
+        books = {}
+        for pair, market in zip(pairs, markets):
+            book = OrderBook()
+            if market is not None:
+                if market.symbol in all_depths:
+                    # pairs that want fewer levels than the request gave are cut while parsing
+                    book = self.book_from_depth(market, all_depths[market.symbol], self.depth_limit(depth, pair))
                 else:
-                    self.log.info('No {} orders'.format(slug))
+                    self.log.info('No {} orders'.format(market.symbol))
 
             base, alt = pair
-            depth[base + '_' + alt] = book
+            books[base + '_' + alt] = book
 
-        return depth
+        return books
 
     def get_balance(self, currency):
         # TODO: Does it really return "available" balances? (not trading)
@@ -106,11 +135,10 @@ class Poloniex(Exchange):
         return balances
 
     def submit_order(self, order_type, pair, price, volume):
-        true_pair, swapped = self.get_validated_pair(pair)
-        if true_pair is not None:
-            base, alt = true_pair
-            slug = alt.upper() + '_' + base.upper()
-            if not swapped:
+        market = self.get_market(pair)
+        if market is not None:
+            slug = market.symbol
+            if not market.swapped:
                 if order_type == 'buy':
                     self.api.buy(slug, price, volume)
                 elif order_type == 'sell':
@@ -1,5 +1,4 @@
-import pandas as pd
-import Quandl
+# pandas is heavy, it is imported when a data source is actually used rather than with the package
 
 
 class CSVDataSource:
@@ -13,6 +12,7 @@ class CSVDataSource:
         :param fname: csv file name
         :param fields: header names
         """
+        import pandas as pd
         self.data = pd.read_csv(fname, names=fields, parse_dates=True)
 
     def parse_timestamp_column(self, label, unit, set_index=True):
@@ -22,6 +22,7 @@ class CSVDataSource:
         :param unit: if column is already a timestamp, i.e. an integer, whats the time unit.
         :return:
         """
+        import pandas as pd
         if isinstance(self.data[label][0], pd.tslib.Timestamp):
             if set_index:
                 self.data.set_index(label, inplace=True)
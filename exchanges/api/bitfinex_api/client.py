@@ -7,7 +7,7 @@ import json
 import time
 from decimal import Decimal
 
-import requests
+from ..http_pool import get_session
 
 PROTOCOL = "https"
 HOST = "api.bitfinex.com"
@@ -37,7 +37,7 @@ class TradeClient:
         self.URL = "{0:s}://{1:s}/{2:s}".format(PROTOCOL, HOST, VERSION)
         self.KEY = key
         self.SECRET = secret
-        pass
+        self.session = get_session('bitfinex')
 
     @property
     def _nonce(self):
@@ -76,7 +76,7 @@ class TradeClient:
         }
 
         signed_payload = self._sign_payload(payload)
-        r = requests.post(self.URL + "/order/new", headers=signed_payload, verify=True)
+        r = self.session.post(self.URL + "/order/new", headers=signed_payload, verify=True, timeout=TIMEOUT)
         json_resp = r.json()
 
         try:
@@ -97,7 +97,7 @@ class TradeClient:
         }
 
         signed_payload = self._sign_payload(payload)
-        r = requests.post(self.URL + "/order/cancel", headers=signed_payload, verify=True)
+        r = self.session.post(self.URL + "/order/cancel", headers=signed_payload, verify=True, timeout=TIMEOUT)
         json_resp = r.json()
 
         try:
@@ -117,7 +117,7 @@ class TradeClient:
         }
 
         signed_payload = self._sign_payload(payload)
-        r = requests.post(self.URL + "/order/cancel/all", headers=signed_payload, verify=True)
+        r = self.session.post(self.URL + "/order/cancel/all", headers=signed_payload, verify=True, timeout=TIMEOUT)
         json_resp = r.json()
         return json_resp
 
@@ -132,7 +132,7 @@ class TradeClient:
         }
 
         signed_payload = self._sign_payload(payload)
-        r = requests.post(self.URL + "/order/status", headers=signed_payload, verify=True)
+        r = self.session.post(self.URL + "/order/status", headers=signed_payload, verify=True, timeout=TIMEOUT)
         json_resp = r.json()
 
         try:
@@ -152,7 +152,7 @@ class TradeClient:
         }
 
         signed_payload = self._sign_payload(payload)
-        r = requests.post(self.URL + "/orders", headers=signed_payload, verify=True)
+        r = self.session.post(self.URL + "/orders", headers=signed_payload, verify=True, timeout=TIMEOUT)
         json_resp = r.json()
 
         return json_resp
@@ -167,7 +167,7 @@ class TradeClient:
         }
 
         signed_payload = self._sign_payload(payload)
-        r = requests.post(self.URL + "/positions", headers=signed_payload, verify=True)
+        r = self.session.post(self.URL + "/positions", headers=signed_payload, verify=True, timeout=TIMEOUT)
         json_resp = r.json()
         return json_resp
 
@@ -182,7 +182,7 @@ class TradeClient:
         }
 
         signed_payload = self._sign_payload(payload)
-        r = requests.post(self.URL + "/position/claim", headers=signed_payload, verify=True)
+        r = self.session.post(self.URL + "/position/claim", headers=signed_payload, verify=True, timeout=TIMEOUT)
         json_resp = r.json()
 
         return json_resp
@@ -199,7 +199,7 @@ class TradeClient:
         }
 
         signed_payload = self._sign_payload(payload)
-        r = requests.post(self.URL + "/mytrades", headers=signed_payload, verify=True)
+        r = self.session.post(self.URL + "/mytrades", headers=signed_payload, verify=True, timeout=TIMEOUT)
         json_resp = r.json()
 
         return json_resp
@@ -216,7 +216,7 @@ class TradeClient:
         }
 
         signed_payload = self._sign_payload(payload)
-        r = requests.post(self.URL + "/offer/new", headers=signed_payload, verify=True)
+        r = self.session.post(self.URL + "/offer/new", headers=signed_payload, verify=True, timeout=TIMEOUT)
         json_resp = r.json()
 
         return json_resp
@@ -229,7 +229,7 @@ class TradeClient:
         }
 
         signed_payload = self._sign_payload(payload)
-        r = requests.post(self.URL + "/offer/cancel", headers=signed_payload, verify=True)
+        r = self.session.post(self.URL + "/offer/cancel", headers=signed_payload, verify=True, timeout=TIMEOUT)
         json_resp = r.json()
 
         return json_resp
@@ -242,7 +242,7 @@ class TradeClient:
         }
 
         signed_payload = self._sign_payload(payload)
-        r = requests.post(self.URL + "/offer/status", headers=signed_payload, verify=True)
+        r = self.session.post(self.URL + "/offer/status", headers=signed_payload, verify=True, timeout=TIMEOUT)
         json_resp = r.json()
 
         return json_resp
@@ -257,7 +257,7 @@ class TradeClient:
         }
 
         signed_payload = self._sign_payload(payload)
-        r = requests.post(self.URL + "/offers", headers=signed_payload, verify=True)
+        r = self.session.post(self.URL + "/offers", headers=signed_payload, verify=True, timeout=TIMEOUT)
         json_resp = r.json()
 
         return json_resp
@@ -272,7 +272,7 @@ class TradeClient:
         }
 
         signed_payload = self._sign_payload(payload)
-        r = requests.post(self.URL + "/balances", headers=signed_payload, verify=True)
+        r = self.session.post(self.URL + "/balances", headers=signed_payload, verify=True, timeout=TIMEOUT)
         json_resp = r.json()
 
         return json_resp
@@ -297,7 +297,7 @@ class TradeClient:
             "wallet": wallet
         }
         signed_payload = self._sign_payload(payload)
-        r = requests.post(self.URL + "/history", headers=signed_payload, verify=True)
+        r = self.session.post(self.URL + "/history", headers=signed_payload, verify=True, timeout=TIMEOUT)
         json_resp = r.json()
 
         return json_resp
@@ -308,6 +308,9 @@ class Client:
     Client for the bitfinex.com API.
     See https://www.bitfinex.com/pages/api for API documentation.
     """
+    def __init__(self):
+        self.session = get_session('bitfinex')
+
     def url_for(self, path, path_arg=None, parameters=None):
         # build the basic url
         url = server() + '/' + path
@@ -414,7 +417,7 @@ class Client:
 
         return data
 
-    def order_book(self, symbol, parameters=None):
+    def order_book(self, symbol, parameters=None, raw=False):
         """
         curl "https://api.bitfinex.com/v1/book/btcusd"
 
@@ -431,8 +434,11 @@ class Client:
         curl "https://api.bitfinex.com/v1/book/btcusd?limit_bids=1&limit_asks=0"
         {"bids":[{"price":"561.1101","amount":"0.985","timestamp":"1395557729.0"}],"asks":[]}
 
+        raw=True leaves every field as the string bitfinex sent, skipping the Decimal conversion.
         """
         data = self._get(self.url_for(PATH_ORDERBOOK, path_arg=symbol, parameters=parameters))
+        if raw:
+            return data
 
         for type_ in data.keys():
             for list_ in data[type_]:
@@ -451,7 +457,7 @@ class Client:
         return data
 
     def _get(self, url):
-        return requests.get(url, timeout=TIMEOUT).json()
+        return self.session.get(url, timeout=TIMEOUT).json()
 
     def _build_parameters(self, parameters):
         # sort the keys so we can test easily in Python 3.3 (dicts are not ordered)
@@ -3,5 +3,13 @@
 from .public import getDepth, getTradeHistory, get_market_cap, get_min_volumes
 from .trade import TradeAPI
 from .keyhandler import KeyHandler
-from .common import all_currencies, all_pairs, max_digits, formatCurrency, fees, formatCurrencyDigits, \
+from .common import get_all_pairs, formatCurrency, formatCurrencyDigits, \
     truncateAmount, truncateAmountDigits, BTERConnection
+from . import common
+
+
+def __getattr__(name):
+    # all_currencies, all_pairs, max_digits and fees are only fetched when first used, see common.py
+    if name in ('all_pairs', 'all_currencies', 'max_digits', 'fees'):
+        return getattr(common, name)
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
@@ -1,15 +1,22 @@
 # Copyright (c) 2013 Alan McIntyre
 
-import http.client
 import json
 import decimal
-import ssl
+import threading
+
+from ..http_pool import get_session
 
 decimal.getcontext().rounding = decimal.ROUND_DOWN
 exps = [decimal.Decimal("1e-%d" % i) for i in range(16)]
 
 domain = 'data.bter.com'
 
+# the lazy market info (all_pairs, all_currencies, max_digits, fees) is left out on purpose,
+# a star import would fetch it right away. get it as common.<name> or with get_all_pairs()
+__all__ = ['exps', 'domain', 'parseJSONResponse', 'BTERConnection', 'get_all_pairs', 'validatePair',
+           'truncateAmountDigits', 'truncateAmount', 'formatCurrencyDigits', 'formatCurrency',
+           'validateResponse', 'errorMessage']
+
 def parseJSONResponse(response):
     def parse_decimal(var):
         return decimal.Decimal(var)
@@ -23,29 +30,60 @@ def parseJSONResponse(response):
     return r
 
 class BTERConnection:
+    # requests go through the shared keep-alive pool, so creating one of these is cheap
+    # and every connection made with it is reused by the others.
     def __init__(self, timeout=30):
-        self.conn = http.client.HTTPSConnection(domain, timeout=timeout)
+        self.timeout = timeout
+        self.session = get_session('bter')
 
     def close(self):
-        self.conn.close()
+        pass  # the pool outlives this connection
 
     def makeRequest(self, url, method='POST', extra_headers=None, params=''):
         headers = {"Content-type": "application/x-www-form-urlencoded"}
         if extra_headers is not None:
             headers.update(extra_headers)
 
-        self.conn.request(method, url, params, headers)
-        response = self.conn.getresponse().read().decode()
-
-        return response
+        response = self.session.request(method, 'https://' + domain + url, data=params, headers=headers,
+                                        timeout=self.timeout)
+        return response.content.decode()
 
     def makeJSONRequest(self, url, method='POST', extra_headers=None, params=""):
         response = self.makeRequest(url, method, extra_headers, params)
         return parseJSONResponse(response)
 
-all_pairs = BTERConnection().makeJSONRequest("/api/1/pairs", method="GET")
-all_currencies = list(set(sum([p.split('_') for p in all_pairs], [])))
-max_digits = dict((pair, {"price": 8, "amount": 8}) for pair in all_pairs)
+# the pair list comes from the server. it used to be fetched as soon as this module was imported,
+# now it is fetched the first time something asks for it (see __getattr__ below).
+_pairs_lock = threading.Lock()
+_market_info = None
+
+
+def _load_market_info():
+    global _market_info
+    with _pairs_lock:
+        if _market_info is None:
+            all_pairs = BTERConnection().makeJSONRequest("/api/1/pairs", method="GET")
+            max_digits = dict((pair, {"price": 8, "amount": 8}) for pair in all_pairs)
+            _market_info = {
+                'all_pairs': all_pairs,
+                'all_currencies': list(set(sum([p.split('_') for p in all_pairs], []))),
+                'max_digits': max_digits,
+                'fees': {k: 0.001 for k in list(max_digits.keys())},
+            }
+    return _market_info
+
+
+def get_all_pairs():
+    return _load_market_info()['all_pairs']
+
+
+def __getattr__(name):
+    # all_pairs, all_currencies, max_digits and fees
+    if name in ('all_pairs', 'all_currencies', 'max_digits', 'fees'):
+        return _load_market_info()[name]
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
+
 # min_orders = {'btc_cny': decimal.Decimal("0.1"),
 #               'ltc_cny': decimal.Decimal("0.1"),
 #               'ftc_cny': decimal.Decimal("0.1"),
@@ -75,13 +113,12 @@ max_digits = dict((pair, {"price": 8, "amount": 8}) for pair in all_pairs)
 #               'yac_btc': decimal.Decimal("0.1"),
 #               'wdc_btc': decimal.Decimal("0.1")}
 
-fees = {k: 0.001 for k in list(max_digits.keys())}
-
 
 
 
 
 def validatePair(pair):
+    all_pairs = get_all_pairs()
     if pair not in all_pairs:
         if "_" in pair:
             a, b = pair.split("_")
@@ -98,7 +135,7 @@ def truncateAmountDigits(value, digits):
 
 
 def truncateAmount(value, pair, price_or_amount):
-    return truncateAmountDigits(value, max_digits[pair][price_or_amount])
+    return truncateAmountDigits(value, _load_market_info()['max_digits'][pair][price_or_amount])
 
 
 def formatCurrencyDigits(value, digits):
@@ -111,7 +148,7 @@ def formatCurrencyDigits(value, digits):
 
 
 def formatCurrency(value, pair, price_or_amount):
-    return formatCurrencyDigits(value, max_digits[pair][price_or_amount])
+    return formatCurrencyDigits(value, _load_market_info()['max_digits'][pair][price_or_amount])
 
 
 def validateResponse(result, error_handler=None):
@@ -1,4 +1,6 @@
+import decimal
 import unittest
+from . import common
 from .common import *
 
 
@@ -18,7 +20,7 @@ class TestCommon(unittest.TestCase):
             self.assertEqual(formatCurrencyDigits(44.0, i), "44.0")
 
     def test_formatCurrencyByPair(self):
-        for p, d in list(max_digits.items()):
+        for p, d in list(common.max_digits.items()):
             self.assertEqual(formatCurrency(1.12, p, 'price'),
                              formatCurrencyDigits(1.12, d['price']))
             self.assertEqual(formatCurrency(44.0, p, 'price'),
@@ -38,7 +40,7 @@ class TestCommon(unittest.TestCase):
                              truncateAmountDigits(44.0, d['amount']))
 
     def test_truncateAmount(self):
-        for p, d in list(max_digits.items()):
+        for p, d in list(common.max_digits.items()):
             self.assertEqual(truncateAmount(1.12, p, 'price'),
                              truncateAmountDigits(1.12, d['price']))
             self.assertEqual(truncateAmount(44.0, p, 'price'),
@@ -50,7 +52,7 @@ class TestCommon(unittest.TestCase):
                              truncateAmountDigits(44.0, d['amount']))
         
     def test_validatePair(self):
-        for pair in all_pairs:
+        for pair in common.all_pairs:
             validatePair(pair)
         self.assertRaises(Exception, validatePair, "not_a_real_pair")
 
@@ -1,7 +1,7 @@
 import decimal
 import unittest
 import datetime
-from bterapi.public import *
+from .public import *
 
 
 class TestPublic(unittest.TestCase):
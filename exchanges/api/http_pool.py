@@ -0,0 +1,53 @@
+# shared keep-alive HTTP sessions, one per exchange
+# every REST client goes through these instead of opening a new connection (and TLS handshake)
+# per request. requests asks for gzip/deflate responses and decodes them for us.
+# every request waits for the exchange's rate limit first, see rate_limit.py
+
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .rate_limit import endpoint_class, get_limiter
+
+# at most this many connections to any one host, extra requests wait for a free connection
+MAX_CONNECTIONS_PER_HOST = 8
+# how many different hosts an exchange keeps a pool for
+MAX_HOSTS = 4
+
+_sessions = {}
+_lock = threading.Lock()
+
+
+class LimitedSession(requests.Session):
+    # a session that takes a token from the exchange's request budget before each request
+    def __init__(self, name):
+        requests.Session.__init__(self)
+        self.name = name
+
+    def request(self, method, url, *args, **kwargs):
+        get_limiter().acquire(self.name, endpoint_class(method))
+        return requests.Session.request(self, method, url, *args, **kwargs)
+
+
+def get_session(name, max_connections=MAX_CONNECTIONS_PER_HOST):
+    """
+    returns the process-wide session for the exchange name, creating it on first use.
+    connections are kept alive and reused across threads.
+    """
+    with _lock:
+        session = _sessions.get(name)
+        if session is None:
+            session = LimitedSession(name)
+            adapter = HTTPAdapter(pool_connections=MAX_HOSTS, pool_maxsize=max_connections, pool_block=True)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _sessions[name] = session
+        return session
+
+
+def close_all():
+    with _lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
@@ -1,10 +1,23 @@
-import urllib
-from urllib.request import urlopen, Request
+import urllib.parse
 import json
 import time
 import hmac
 import hashlib
 
+from .http_pool import get_session
+
+# HTTP request timeout in seconds
+TIMEOUT = 10.0
+
+
+def public_url(command, currencyPair=None, depth=None):
+    url = 'https://poloniex.com/public?command=' + command
+    if currencyPair is not None:
+        url += '&currencyPair=' + str(currencyPair)
+    if depth is not None:
+        url += '&depth=' + str(depth)
+    return url
+
 
 def createTimeStamp(datestr, format="%Y-%m-%d %H:%M:%S"):
     return time.mktime(time.strptime(datestr, format))
@@ -29,30 +42,29 @@ class poloniex:
         return after
 
     def api_query(self, command, req={}):
+        session = get_session('poloniex')
         if command == "returnTicker" or command == "return24hVolume":
-            ret = urlopen('https://poloniex.com/public?command=' + command)
-            return json.loads(ret.read().decode())
+            ret = session.get(public_url(command), timeout=TIMEOUT)
+            return json.loads(ret.content.decode())
         elif command == "returnOrderBook":
-            ret = urlopen(
-                'https://poloniex.com/public?command=' + command + '&currencyPair=' + str(req['currencyPair']))
-            return json.loads(ret.read().decode())
+            ret = session.get(public_url(command, req['currencyPair']), timeout=TIMEOUT)
+            return json.loads(ret.content.decode())
         elif command == "returnMarketTradeHistory":
-            ret = urlopen('https://poloniex.com/public?command=' + "returnTradeHistory" + '&currencyPair=' + str(
-                req['currencyPair']))
-            return json.loads(ret.read().decode())
+            ret = session.get(public_url("returnTradeHistory", req['currencyPair']), timeout=TIMEOUT)
+            return json.loads(ret.content.decode())
         else:
             req['command'] = command
             req['nonce'] = int(time.time() * 1000)
-            post_data = urllib.urlencode(req)
+            post_data = urllib.parse.urlencode(req)
 
-            sign = hmac.new(self.Secret, post_data, hashlib.sha512).hexdigest()
+            sign = hmac.new(self.Secret.encode(), post_data.encode(), hashlib.sha512).hexdigest()
             headers = {
                 'Sign': sign,
                 'Key': self.APIKey
             }
 
-            ret = urlopen(Request('https://poloniex.com/tradingApi', post_data, headers))
-            jsonRet = json.loads(ret.read().decode())
+            ret = session.post('https://poloniex.com/tradingApi', data=post_data, headers=headers, timeout=TIMEOUT)
+            jsonRet = json.loads(ret.content.decode())
             return self.post_process(jsonRet)
 
     def returnTicker(self):
@@ -64,6 +76,12 @@ class poloniex:
     def returnOrderBook(self, currencyPair):
         return self.api_query("returnOrderBook", {'currencyPair': currencyPair})
 
+    # same as returnOrderBook, but the undecoded response body (to decode only what we need of it)
+    # depth = number of orders per side
+    def returnOrderBookText(self, currencyPair, depth=None):
+        ret = get_session('poloniex').get(public_url("returnOrderBook", currencyPair, depth), timeout=TIMEOUT)
+        return ret.content.decode()
+
     def returnMarketTradeHistory(self, currencyPair):
         return self.api_query("returnMarketTradeHistory", {'currencyPair': currencyPair})
 
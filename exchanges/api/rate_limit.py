@@ -0,0 +1,122 @@
+# request budgets, one token bucket per exchange and endpoint class
+# every request made through the pooled sessions (http_pool) takes a token first, and waits when the
+# bucket is empty, so we stay under the exchanges' limits however fast the bots tick.
+# endpoint classes: 'public' is market data, 'private' is trading/account calls.
+# for every exchange we talk to, market data is GET and the signed private api is POST.
+
+import asyncio
+import threading
+import time
+
+# {exchange: {endpoint class: (requests per second, burst)}}, exchanges/classes left out aren't limited.
+# override them with config.RATE_LIMITS
+LIMITS = {
+    'poloniex': {'public': (6, 6), 'private': (6, 6)},  # 6 calls per second
+    'bter': {'public': (5, 10), 'private': (2, 4)},
+    'bitfinex': {'public': (1, 10), 'private': (1, 5)},  # 60 calls per minute
+}
+
+
+def endpoint_class(method):
+    return 'private' if method.upper() == 'POST' else 'public'
+
+
+class TokenBucket(object):
+    def __init__(self, rate, burst):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.tokens = self.burst
+        self.stamp = time.monotonic()
+
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+    def reserve(self, tokens):
+        # takes the tokens right away (going into debt if needed), returns how long to wait before using them.
+        # later callers queue up behind the debt, so waiters are served in order.
+        self.refill()
+        self.tokens -= tokens
+        return max(0.0, -self.tokens / self.rate)
+
+    def wait_time(self, tokens):
+        # seconds until the bucket holds tokens, without taking any
+        self.refill()
+        return max(0.0, (tokens - self.tokens) / self.rate)
+
+
+class RateLimiter(object):
+    def __init__(self, limits=LIMITS):
+        self.lock = threading.Lock()
+        self.buckets = {}  # buckets[(exchange, endpoint class)] = TokenBucket
+        self.stats = {}  # stats[exchange] = {'requests': n, 'throttled': n, 'waited': seconds}
+        for name, classes in limits.items():
+            self.set_limits(name, classes)
+
+    def set_limits(self, name, classes):
+        # classes = {endpoint class: (requests per second, burst)}, None removes the limit
+        with self.lock:
+            for kind, limit in classes.items():
+                if limit is None:
+                    self.buckets.pop((name, kind), None)
+                else:
+                    self.buckets[(name, kind)] = TokenBucket(*limit)
+
+    def reserve(self, name, kind, tokens=1):
+        with self.lock:
+            stats = self.stats.setdefault(name, {'requests': 0, 'throttled': 0, 'waited': 0.0})
+            stats['requests'] += tokens
+            bucket = self.buckets.get((name, kind))
+            delay = bucket.reserve(tokens) if bucket is not None else 0.0
+            if delay > 0:
+                stats['throttled'] += 1
+                stats['waited'] += delay
+            return delay
+
+    def acquire(self, name, kind='public', tokens=1):
+        # blocks until exchange name's budget allows the request
+        delay = self.reserve(name, kind, tokens)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def async_acquire(self, name, kind='public', tokens=1):
+        delay = self.reserve(name, kind, tokens)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def remaining(self, name, kind='public'):
+        # requests exchange name can make right now without waiting, None if it isn't limited
+        with self.lock:
+            bucket = self.buckets.get((name, kind))
+            if bucket is None:
+                return None
+            bucket.refill()
+            return max(0.0, bucket.tokens)
+
+    def wait_time(self, requests, kind='public'):
+        """
+        requests = {exchange: number of requests}
+        seconds until every exchange has the budget for its requests, e.g. for one tick's depth fetches.
+        """
+        with self.lock:
+            waits = [self.buckets[(name, kind)].wait_time(min(n, self.buckets[(name, kind)].burst))
+                     for name, n in requests.items() if (name, kind) in self.buckets]
+        return max(waits, default=0.0)
+
+    def metrics(self):
+        with self.lock:
+            return {name: dict(stats) for name, stats in self.stats.items()}
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_limiter():
+    # the process-wide limiter, every session and bot shares its budgets
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter()
+        return _limiter
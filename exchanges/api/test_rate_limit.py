@@ -0,0 +1,126 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from . import rate_limit
+from .rate_limit import RateLimiter, TokenBucket, endpoint_class
+
+
+class FakeClock(object):
+    # stands in for the time module, sleeping just moves the clock
+    def __init__(self):
+        self.now = 100.0
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+    async def async_sleep(self, seconds):
+        self.sleep(seconds)
+
+
+class TestTokenBucket(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch.object(rate_limit, 'time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_refill(self):
+        bucket = TokenBucket(2, 4)
+        self.assertEqual(bucket.reserve(4), 0)
+        self.assertEqual(bucket.wait_time(1), 0.5)
+        self.clock.sleep(0.25)
+        self.assertEqual(bucket.wait_time(1), 0.25)
+        self.assertEqual(bucket.wait_time(2), 0.75)
+        self.clock.sleep(0.25)
+        self.assertEqual(bucket.reserve(1), 0)
+
+    def test_burst_cap(self):
+        bucket = TokenBucket(2, 4)
+        self.clock.sleep(100)
+        bucket.refill()
+        self.assertEqual(bucket.tokens, 4)
+        # a fifth request right away has to wait for the refill
+        self.assertEqual([bucket.reserve(1) for _ in range(5)], [0, 0, 0, 0, 0.5])
+
+    def test_debt(self):
+        # reserving more than there is takes the tokens anyway, later callers queue up behind
+        bucket = TokenBucket(2, 4)
+        bucket.reserve(4)
+        self.assertEqual(bucket.reserve(3), 1.5)
+        self.assertEqual(bucket.reserve(1), 2)
+        self.assertEqual(bucket.wait_time(1), 2.5)
+        self.clock.sleep(2.5)
+        self.assertEqual(bucket.wait_time(1), 0)
+
+
+class TestRateLimiter(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch.object(rate_limit, 'time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.limiter = RateLimiter({'x': {'public': (2, 2), 'private': (1, 1)}, 'y': {'public': (10, 5)}})
+
+    def test_acquire(self):
+        for _ in range(4):
+            self.limiter.acquire('x')
+        # 2 right away, then one every 0.5s
+        self.assertEqual(self.clock.slept, [0.5, 0.5])
+        self.assertEqual(self.clock.now, 101.0)
+        self.assertEqual(self.limiter.metrics(), {'x': {'requests': 4, 'throttled': 2, 'waited': 1.0}})
+        # the private budget is separate
+        self.limiter.acquire('x', 'private')
+        self.assertEqual(self.clock.slept, [0.5, 0.5])
+
+    def test_async_acquire(self):
+        with mock.patch.object(rate_limit, 'asyncio', SimpleNamespace(sleep=self.clock.async_sleep)):
+            for _ in range(3):
+                asyncio.run(self.limiter.async_acquire('x'))
+        self.assertEqual(self.clock.slept, [0.5])
+
+    def test_unlimited(self):
+        self.assertIsNone(self.limiter.remaining('z'))
+        for _ in range(100):
+            self.limiter.acquire('z')
+        self.assertEqual(self.clock.slept, [])
+        self.limiter.set_limits('x', {'public': None})
+        self.assertIsNone(self.limiter.remaining('x'))
+
+    def test_remaining(self):
+        self.assertEqual(self.limiter.remaining('y'), 5)
+        for _ in range(5):
+            self.limiter.acquire('y')
+        self.assertEqual(self.limiter.remaining('y'), 0)
+        self.clock.sleep(0.25)
+        self.assertEqual(self.limiter.remaining('y'), 2.5)
+        self.clock.sleep(60)
+        self.assertEqual(self.limiter.remaining('y'), 5)
+
+    def test_wait_time(self):
+        self.assertEqual(self.limiter.wait_time({'x': 2, 'y': 5}), 0)
+        self.limiter.acquire('x')
+        self.limiter.acquire('x')
+        # x needs a second for 2 more, y has its 5 already
+        self.assertEqual(self.limiter.wait_time({'x': 2, 'y': 5}), 1)
+        # more requests than the burst can ever hold only wait for a full bucket
+        self.assertEqual(self.limiter.wait_time({'x': 10}), 1)
+        self.assertEqual(self.limiter.wait_time({'z': 10}), 0)
+        self.assertEqual(self.limiter.wait_time({}), 0)
+        # nothing was taken
+        self.clock.sleep(1)
+        self.assertEqual(self.limiter.remaining('x'), 2)
+
+    def test_endpoint_class(self):
+        self.assertEqual(endpoint_class('get'), 'public')
+        self.assertEqual(endpoint_class('POST'), 'private')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,17 @@
+# replays the ticks recorded in config.TICK_DIR through a bot, see Backtester.py
+# python main_backtest.py pair
+# python main_backtest.py tri POLO
+
+import sys
+
+from Backtester import Backtester, make_bot
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == 'pair':
+        bot = make_bot('pair')
+    elif len(sys.argv) > 2 and sys.argv[1] == 'tri':
+        bot = make_bot('tri', sys.argv[2])
+    else:
+        print('usage: python main_backtest.py pair | tri <exchange>')
+        sys.exit(1)
+    print(Backtester(bot).run())
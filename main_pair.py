@@ -1,5 +1,5 @@
 from PairwiseBot import PairwiseBot
-import config_tri as config
+import config_pair as config
 
-bot = PairwiseBot(config.EXCHANGES, 2)
+bot = PairwiseBot(config.EXCHANGES, 2, config.DEPTH_LIMIT)
 bot.start()
\ No newline at end of file
@@ -0,0 +1,33 @@
+# backtests every combination of the given thresholds over the ticks in config.TICK_DIR, see ParameterSweep.py
+# python main_sweep.py pair spread_threshold=1.0005,1.001,1.002 btc_risk=None,0.001
+# python main_sweep.py tri POLO spread_threshold=1.001,1.003 volume_margin=1.01,1.05
+
+import sys
+
+import config
+from ParameterSweep import PARAMETERS, grid, sweep
+
+
+def parse_values(text):
+    return [None if value == 'None' else float(value) for value in text.split(',')]
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if args[:1] == ['pair']:
+        bot_args, args = ('pair',), args[1:]
+    elif args[:1] == ['tri'] and len(args) > 1:
+        bot_args, args = ('tri', args[1]), args[2:]
+    else:
+        print('usage: python main_sweep.py pair | tri <exchange> [name=value,value,...] ...')
+        print('parameters: ' + ', '.join(sorted(PARAMETERS)))
+        sys.exit(1)
+    values = {}
+    for arg in args:
+        name, _, text = arg.partition('=')
+        if name not in PARAMETERS:
+            print('unknown parameter ' + name)
+            sys.exit(1)
+        values[name] = parse_values(text)
+    for result in sweep(grid(**values), bot_args, out=config.TICK_DIR + '/sweep.jsonl'):
+        print(result)
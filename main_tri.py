@@ -3,4 +3,4 @@ from TriangularBot import TriangularBot
 
 if __name__ == "__main__" :
     for xchg in config.EXCHANGES:
-        TriangularBot(xchg, config.TARGETS[xchg], config.TICK_PERIOD).start()
+        TriangularBot(xchg, config.TARGETS[xchg], config.TICK_PERIOD, config.FEEDS.get(xchg)).start()
@@ -0,0 +1,62 @@
+import unittest
+from decimal import Decimal
+
+from Broker import Broker
+from OrderBook import OrderBook
+
+
+class StubExchange(object):
+    name = 'Stub'
+    fixed_point_digits = None
+    trading_fee = Decimal('0.002')
+    sorted_depth = False
+
+
+def levels(side):
+    return [(o.p, o.v) for o in side]
+
+
+class TestSetMultipleDepths(unittest.TestCase):
+    def setUp(self):
+        self.broker = Broker('PAPER', StubExchange())
+        self.pairs = [('ETH', 'BTC'), ('LTC', 'BTC')]
+        # ETH_BTC is listed in order, LTC_BTC has its asks worst first and its bids shuffled
+        self.depths = {'ETH_BTC': OrderBook.from_levels([('0.05', '1'), ('0.04', '2')], [('0.051', '1')]),
+                       'LTC_BTC': OrderBook.from_levels([('0.009', '2'), ('0.01', '1'), ('0.008', '3')],
+                                                        [('0.0105', '2'), ('0.0101', '1')])}
+
+    def test_sorts_out_of_order_books(self):
+        eth_bids = self.depths['ETH_BTC'].bids.prices
+        self.broker.set_multiple_depths(self.pairs, self.depths)
+        ltc = self.broker.depth['LTC_BTC']
+        self.assertEqual([o.p for o in ltc.bids], [Decimal('0.01'), Decimal('0.009'), Decimal('0.008')])
+        self.assertEqual([o.p for o in ltc.asks], [Decimal('0.0101'), Decimal('0.0105')])
+        # the sorted book is left as it is
+        self.assertIs(self.broker.depth['ETH_BTC'].bids.prices, eth_bids)
+        self.assertEqual(self.broker.depth['ETH_BTC'].bids.version, 0)
+        # and the reverse markets are views of the sorted books
+        self.assertEqual(self.broker.depth['BTC_LTC'].asks.best_price(), 1 / Decimal('0.01'))
+        self.assertEqual(self.broker.depth['BTC_ETH'].bids.best_price(), 1 / Decimal('0.051'))
+        self.assertEqual(self.broker.updated, {'ETH_BTC', 'LTC_BTC'})
+        self.assertEqual(self.broker.fetched, {'ETH_BTC', 'LTC_BTC'})
+
+    def test_updated(self):
+        self.broker.set_multiple_depths(self.pairs, self.depths)
+        # the same ETH_BTC again, and LTC_BTC listed worst first with one ask changed
+        self.broker.new_tick()
+        depths = {'ETH_BTC': OrderBook.from_levels([('0.05', '1'), ('0.04', '2')], [('0.051', '1')]),
+                  'LTC_BTC': OrderBook.from_levels([('0.008', '3'), ('0.009', '2'), ('0.01', '1')],
+                                                   [('0.0101', '1'), ('0.0105', '3')])}
+        self.broker.set_multiple_depths(self.pairs, depths)
+        self.assertEqual(self.broker.updated, {'LTC_BTC'})
+        self.assertEqual(levels(self.broker.depth['LTC_BTC'].asks), [(Decimal('0.0101'), 1),
+                                                                     (Decimal('0.0105'), 3)])
+
+    def test_sorted_exchanges_are_trusted(self):
+        self.broker.xchg.sorted_depth = True
+        self.broker.set_multiple_depths(self.pairs, self.depths)
+        self.assertFalse(self.broker.depth['LTC_BTC'].bids.is_sorted())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,155 @@
+import itertools
+import math
+import random
+import unittest
+from decimal import Decimal
+
+from Broker import Broker
+from CycleFinder import CycleFinder
+from OrderBook import OrderBook
+
+
+class StubExchange(object):
+    name = 'Stub'
+    fixed_point_digits = None
+    trading_fee = Decimal('0.002')
+
+
+def brute_force(bids, fee, min_length, max_length):
+    # {cycle: spread} of every simple cycle, written from its smallest currency, whose spread beats 1
+    nodes = sorted(set(X for X, Y in bids) | set(Y for X, Y in bids))
+    cycles = {}
+    for length in range(min_length, max_length + 1):
+        for cycle in itertools.permutations(nodes, length):
+            if cycle[0] != min(cycle):
+                continue
+            spread = 1.0
+            for edge in zip(cycle, cycle[1:] + cycle[:1]):
+                if edge not in bids:
+                    break
+                spread *= bids[edge] * (1 - fee)
+            else:
+                if spread > 1:
+                    cycles[cycle] = spread
+    return cycles
+
+
+def edges_of(cycle):
+    return list(zip(cycle, cycle[1:] + cycle[:1]))
+
+
+def random_bids(r, nodes, density):
+    bids = {}
+    for X, Y in itertools.permutations(nodes, 2):
+        if r.random() < density:
+            bids[(X, Y)] = math.exp(r.uniform(-0.3, 0.3))
+    return bids
+
+
+class TestCycleFinder(unittest.TestCase):
+    def test_finds_simple_cycle_behind_a_better_walk(self):
+        # the lightest 4 leg walk A -> A is A B C B A, which isn't a cycle.
+        # the simple A B C D A behind it is still profitable and must be found
+        finder = CycleFinder(0)
+        for (X, Y), w in {('A', 'B'): 0, ('B', 'C'): -1, ('C', 'B'): -1, ('B', 'A'): 0.5,
+                          ('C', 'D'): 0.5, ('D', 'A'): 0.4}.items():
+            finder.set_edge(X, Y, math.exp(-w))
+        cycles = [cycle for spread, cycle in finder.scan()]
+        self.assertEqual(cycles, [('A', 'B', 'C', 'D')])
+
+    def test_scan_finds_the_best_cycle(self):
+        r = random.Random(1)
+        nodes = ['A', 'B', 'C', 'D', 'E', 'F', 'G']
+        for _ in range(20):
+            bids = random_bids(r, nodes, 0.5)
+            finder = CycleFinder(0.002, max_length=5)
+            for (X, Y), bid in bids.items():
+                finder.set_edge(X, Y, bid)
+            found = finder.scan()
+            expected = brute_force(bids, 0.002, 3, 5)
+            self.assertEqual(found, sorted(found, reverse=True))
+            # everything found is a profitable cycle, and the most profitable one is found
+            for spread, cycle in found:
+                self.assertAlmostEqual(spread, expected[cycle])
+            if expected:
+                self.assertAlmostEqual(found[0][0], max(expected.values()))
+            else:
+                self.assertEqual(found, [])
+
+    def test_triangles_are_exact(self):
+        # with 3 legs there is no walk to lose out to, recheck finds the best triangle through every edge
+        r = random.Random(3)
+        nodes = ['A', 'B', 'C', 'D', 'E', 'F']
+        bids = random_bids(r, nodes, 0.7)
+        finder = CycleFinder(0.002, max_length=3)
+        for (X, Y), bid in bids.items():
+            finder.set_edge(X, Y, bid)
+        expected = brute_force(bids, 0.002, 3, 3)
+        for edge in bids:
+            through = [spread for cycle, spread in expected.items() if edge in edges_of(cycle)]
+            found = [spread for spread, cycle in finder.recheck([edge])]
+            if through:
+                self.assertAlmostEqual(max(found), max(through))
+            else:
+                self.assertEqual(found, [])
+
+    def test_updates(self):
+        # edges come, change and go one at a time. known cycles stay profitable ones, and an edge that
+        # opens a profitable cycle gets the best one through it found
+        r = random.Random(2)
+        nodes = ['A', 'B', 'C', 'D', 'E', 'F']
+        finder = CycleFinder(0.002, max_length=4)
+        bids = {}
+        for _ in range(300):
+            X, Y = r.sample(nodes, 2)
+            if (X, Y) in bids and r.random() < 0.3:
+                del bids[(X, Y)]
+                finder.set_edge(X, Y, None)
+            else:
+                bids[(X, Y)] = math.exp(r.uniform(-0.3, 0.3))
+                finder.set_edge(X, Y, bids[(X, Y)])
+            found = finder.recheck([(X, Y)])
+            expected = brute_force(bids, 0.002, 3, 4)
+            self.assertLessEqual(set(finder.cycles), set(expected))
+            through = [spread for cycle, spread in expected.items() if (X, Y) in edges_of(cycle)]
+            if through:
+                self.assertAlmostEqual(max(spread for spread, cycle in found), max(through))
+            else:
+                self.assertEqual(found, [])
+
+    def test_hubs(self):
+        # every currency trades against every other: 5 leg paths between two of 40 currencies number
+        # in the millions, the relaxation only ever keeps paths_per_node of them per currency and hop
+        nodes = ['C%02d' % i for i in range(40)]
+        finder = CycleFinder(0.002, max_length=5)
+        for X, Y in itertools.permutations(nodes, 2):
+            finder.set_edge(X, Y, 1)
+        finder.set_edge('C01', 'C02', 1.002)
+        finder.set_edge('C02', 'C03', 1.002)
+        self.assertEqual(finder.scan(), [])
+        # now C03 -> C01 opens profitable cycles of every length, the triangle pays best
+        finder.set_edge('C03', 'C01', 1.01)
+        found = finder.recheck([('C03', 'C01')])
+        self.assertEqual([cycle for spread, cycle in found], [('C01', 'C02', 'C03')])
+
+    def test_from_broker(self):
+        broker = Broker('PAPER', StubExchange())
+        books = {'ETH_BTC': ('0.05', '0.0501'), 'LTC_BTC': ('0.01', '0.0101'), 'LTC_ETH': ('0.21', '0.211')}
+        for market, (bid, ask) in books.items():
+            base, alt = market.split('_')
+            book = OrderBook.from_levels([[bid, '1']], [[ask, '1']])
+            broker.depth[market] = book
+            broker.depth[alt + '_' + base] = book.inverted()
+        pairs = [tuple(market.split('_')) for market in books]
+        finder = CycleFinder.from_broker(broker, pairs, 3)
+        # BTC -> LTC -> ETH -> BTC pays 1/0.0101 * 0.21 * 0.05 = 1.0396 before fees,
+        # the other way round only 1/0.0501 * 1/0.211 * 0.01 = 0.946
+        self.assertEqual([cycle for spread, cycle in finder.profitable_cycles()], [('BTC', 'LTC', 'ETH')])
+        broker.depth['LTC_ETH'] = OrderBook.from_levels([['0.2', '1']], [['0.211', '1']])
+        broker.depth['ETH_LTC'] = broker.depth['LTC_ETH'].inverted()
+        self.assertEqual(finder.update_market(broker, ('LTC', 'ETH')), [])
+        self.assertEqual(finder.profitable_cycles(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import os
+import shutil
+import tempfile
+import unittest
+from decimal import Decimal
+
+import config
+from MetadataCache import MetadataCache
+from OrderBook import OrderBook
+from exchanges.BTER import BTER
+from exchanges.Bitfinex import Bitfinex
+from exchanges.Exchange import Exchange
+from exchanges.Poloniex import Poloniex
+
+METADATA = {'pairs': [['ETH', 'BTC'], ['LTC', 'BTC']], 'min_volumes': {}, 'majors': ['BTC', 'ETH'],
+            'fee': '0.001'}
+
+
+class StubExchange(Exchange):
+    fetches = 0
+
+    def __init__(self):
+        Exchange.__init__(self, 'Stub', Decimal('0.002'), 'test')
+
+    def fetch_major_currencies(self):
+        StubExchange.fetches += 1
+        return ['BTC']
+
+    def fetch_tradeable_pairs(self):
+        return [('ETH', 'BTC')]
+
+
+class TestLoadMetadata(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.saved = config.METADATA_CACHE, config.METADATA_TTL, config.OFFLINE
+        config.METADATA_CACHE = os.path.join(self.dir, 'metadata.json')
+        config.METADATA_TTL = 60
+        StubExchange.fetches = 0
+
+    def tearDown(self):
+        config.METADATA_CACHE, config.METADATA_TTL, config.OFFLINE = self.saved
+        shutil.rmtree(self.dir)
+
+    def test_fetches_without_cache(self):
+        xchg = StubExchange()
+        self.assertEqual(StubExchange.fetches, 1)
+        self.assertEqual(xchg.get_tradeable_pairs(), [('ETH', 'BTC')])
+        self.assertEqual(MetadataCache(config.METADATA_CACHE, 60).load('Stub')[0]['majors'], ['BTC'])
+
+    def test_cached(self):
+        MetadataCache(config.METADATA_CACHE, 60).store('Stub', METADATA)
+        xchg = StubExchange()
+        self.assertEqual(StubExchange.fetches, 0)
+        self.assertEqual(xchg.get_tradeable_pairs(), [('ETH', 'BTC'), ('LTC', 'BTC')])
+        self.assertEqual(xchg.get_major_currencies(), ['BTC', 'ETH'])
+        # the adapter's own fee wins over the cached one
+        self.assertEqual(xchg.trading_fee, Decimal('0.002'))
+
+    def test_offline_uses_stale_cache(self):
+        config.OFFLINE = True
+        config.METADATA_TTL = 0
+        MetadataCache(config.METADATA_CACHE, 0).store('Stub', METADATA)
+        xchg = StubExchange()
+        self.assertEqual(xchg.get_tradeable_pairs(), [('ETH', 'BTC'), ('LTC', 'BTC')])
+        self.assertEqual(StubExchange.fetches, 0)
+
+    def test_offline_without_cache_fails(self):
+        config.OFFLINE = True
+        self.assertRaises(RuntimeError, StubExchange)
+        config.METADATA_CACHE = None
+        self.assertRaises(RuntimeError, StubExchange)
+        self.assertEqual(StubExchange.fetches, 0)
+
+
+class TestMinVolume(unittest.TestCase):
+    # the adapters, built offline from cached metadata listing ETH_BTC
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.saved = config.METADATA_CACHE, config.OFFLINE
+        config.METADATA_CACHE = os.path.join(self.dir, 'metadata.json')
+        config.OFFLINE = True
+        cache = MetadataCache(config.METADATA_CACHE, 60)
+        for name, symbol in (('BTER', 'eth_btc'), ('Bitfinex', 'ethbtc'), ('Poloniex', 'BTC_ETH')):
+            cache.store(name, {'pairs': [['ETH', 'BTC']], 'min_volumes': {symbol: '0.1'}, 'majors': ['BTC'],
+                               'fee': '0.002'})
+        self.xchgs = [BTER(None, 'test'), Bitfinex(None, 'test'), Poloniex(None, 'test')]
+
+    def tearDown(self):
+        config.METADATA_CACHE, config.OFFLINE = self.saved
+        shutil.rmtree(self.dir)
+
+    def test_min_volume(self):
+        book = OrderBook.from_levels([('0.05', '1'), ('0.04', '10')], [('0.051', '1')])
+        # 0.1 BTC is the 0.05 of the first level and 1.25 ETH of the second (Poloniex wants 0.0001 BTC)
+        self.assertEqual([xchg.get_min_vol(('ETH', 'BTC'), book.bids) for xchg in self.xchgs],
+                         [Decimal('2.25'), Decimal('2.25'), Decimal('0.002')])
+        # the other way around the minimum (in BTC) is already in units of base
+        self.assertEqual(self.xchgs[0].get_min_vol(('BTC', 'ETH'), book.inverted().asks), Decimal('0.1'))
+
+    def test_book_thinner_than_min_volume(self):
+        book = OrderBook.from_levels([('0.05', '0.001')], [('0.051', '0.001')])
+        for xchg in self.xchgs:
+            self.assertIsNone(xchg.get_min_vol(('ETH', 'BTC'), book.bids), xchg.name)
+        self.assertIsNone(self.xchgs[0].get_min_vol(('ETH', 'BTC'), OrderBook().bids))
+
+
+if __name__ == '__main__':
+    unittest.main()
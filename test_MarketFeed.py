@@ -0,0 +1,138 @@
+import time
+import unittest
+from decimal import Decimal
+
+from Broker import Broker
+from FeedSimulator import FeedSimulator
+from MarketFeed import MarketFeed
+
+BOOKS = {'ETH_BTC': ([('0.05', '3'), ('0.049', '5')], [('0.051', '2'), ('0.052', '4')]),
+         'LTC_BTC': ([('0.01', '30'), ('0.009', '50')], [('0.0101', '20')])}
+
+
+class StubExchange(object):
+    # just enough of an Exchange for MarketFeed, markets are the keys of BOOKS
+    name = 'Stub'
+    fixed_point_digits = None
+
+    def get_validated_pair(self, pair):
+        base, alt = pair
+        if base + '_' + alt in BOOKS:
+            return (base, alt), False
+        if alt + '_' + base in BOOKS:
+            return (alt, base), True
+        return None
+
+
+class StubSocket(object):
+    def __init__(self):
+        self.sent = []
+
+    def sendall(self, data):
+        self.sent.append(data)
+
+
+def levels(side):
+    return [(o.p, o.v) for o in side]
+
+
+class TestMarketFeedMessages(unittest.TestCase):
+    def setUp(self):
+        self.broker = Broker('PAPER', StubExchange())
+        self.feed = MarketFeed(self.broker, None, [('ETH', 'BTC'), ('LTC', 'BTC')], 'test')
+        self.feed.sock = StubSocket()
+        bids, asks = BOOKS['ETH_BTC']
+        self.feed.handle_message({'type': 'snapshot', 'market': 'ETH_BTC', 'seq': 5,
+                                  'bids': [list(l) for l in bids], 'asks': [list(l) for l in asks]})
+
+    def update(self, seq, changes):
+        self.feed.handle_message({'type': 'update', 'market': 'ETH_BTC', 'seq': seq, 'changes': changes})
+
+    def test_snapshot(self):
+        book = self.broker.depth['ETH_BTC']
+        self.assertEqual(levels(book.bids), [(Decimal('0.05'), Decimal('3')), (Decimal('0.049'), Decimal('5'))])
+        self.assertEqual(self.broker.depth['BTC_ETH'].best_ask(), 1 / Decimal('0.05'))
+        self.assertEqual(self.feed.seq['ETH_BTC'], 5)
+        self.assertTrue(self.feed.event.is_set())
+        self.assertEqual(self.feed.take_updates(), {'ETH_BTC'})
+        self.assertFalse(self.feed.event.is_set())
+
+    def test_in_order_deltas(self):
+        self.update(6, [['bids', '0.05', '0'], ['asks', '0.0505', '1']])
+        self.update(7, [['bids', '0.049', '7']])
+        book = self.broker.depth['ETH_BTC']
+        self.assertEqual(levels(book.bids), [(Decimal('0.049'), Decimal('7'))])
+        self.assertEqual(book.best_ask(), Decimal('0.0505'))
+        self.assertEqual(self.broker.depth['BTC_ETH'].best_bid(), 1 / Decimal('0.0505'))
+        self.assertEqual(self.feed.seq['ETH_BTC'], 7)
+
+    def test_stale_message_is_ignored(self):
+        self.update(6, [['bids', '0.05', '1']])
+        self.update(6, [['bids', '0.05', '9']])
+        self.update(4, [['bids', '0.05', '9']])
+        self.assertEqual(self.broker.depth['ETH_BTC'].bids.volume(0), Decimal('1'))
+        self.assertEqual(self.feed.seq['ETH_BTC'], 6)
+        self.assertEqual(self.feed.sock.sent, [])
+
+    def test_updates_before_snapshot_are_ignored(self):
+        self.feed.handle_message({'type': 'update', 'market': 'LTC_BTC', 'seq': 1,
+                                  'changes': [['bids', '0.01', '1']]})
+        self.assertNotIn('LTC_BTC', self.broker.depth)
+
+    def test_gap_drops_book_and_resyncs(self):
+        self.feed.take_updates()
+        self.update(8, [['bids', '0.05', '1']])
+        self.assertNotIn('ETH_BTC', self.broker.depth)
+        self.assertNotIn('BTC_ETH', self.broker.depth)
+        self.assertIsNone(self.feed.seq['ETH_BTC'])
+        self.assertEqual(self.feed.take_updates(), {'ETH_BTC'})
+        self.assertIn(b'"ETH_BTC"', self.feed.sock.sent[-1])
+        # deltas are ignored until the fresh snapshot
+        self.update(9, [['bids', '0.05', '2']])
+        self.assertNotIn('ETH_BTC', self.broker.depth)
+        self.feed.handle_message({'type': 'snapshot', 'market': 'ETH_BTC', 'seq': 9,
+                                  'bids': [['0.05', '2']], 'asks': [['0.051', '2']]})
+        self.update(10, [['bids', '0.05', '4']])
+        self.assertEqual(self.broker.depth['ETH_BTC'].bids.volume(0), Decimal('4'))
+
+
+class TestMarketFeedWithSimulator(unittest.TestCase):
+    def run_feed(self, drop_rate):
+        sim = FeedSimulator(BOOKS, period=0.002, drop_rate=drop_rate, seed=1)
+        sim.start()
+        broker = Broker('PAPER', StubExchange())
+        feed = MarketFeed(broker, sim.address, [('ETH', 'BTC'), ('BTC', 'LTC')], 'test', reconnect_delay=0.05)
+        feed.start()
+        try:
+            time.sleep(0.5)
+            sim.stopped.set()
+            # a few more deltas that all get through, so the feed notices any gap left by dropped ones
+            sim.drop_rate = 0.0
+            for _ in range(20):
+                sim.step()
+            # no more deltas, the feed should catch up to the simulator's books
+            deadline = time.time() + 5
+            while time.time() < deadline:
+                with sim.lock, feed.lock:
+                    if feed.seq == sim.seq:
+                        break
+                time.sleep(0.01)
+            with sim.lock, feed.lock:
+                self.assertEqual(feed.seq, sim.seq)
+                for market, book in sim.books.items():
+                    self.assertEqual(levels(broker.depth[market].bids),
+                                     sorted(book['bids'].items(), reverse=True))
+                    self.assertEqual(levels(broker.depth[market].asks), sorted(book['asks'].items()))
+        finally:
+            feed.stop()
+            sim.stop()
+
+    def test_follows_simulator(self):
+        self.run_feed(0.0)
+
+    def test_recovers_from_dropped_updates(self):
+        self.run_feed(0.2)
+
+
+if __name__ == '__main__':
+    unittest.main()
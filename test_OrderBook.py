@@ -0,0 +1,216 @@
+import unittest
+from array import array
+from decimal import Decimal
+
+from OrderBook import BookSide, OrderBook
+from utils import get_swapped_order
+
+
+def levels(side):
+    return [(o.p, o.v) for o in side]
+
+
+class TestFixedPoint(unittest.TestCase):
+    LEVELS = [('0.05', '1.5'), ('0.0499', '0.00000001'), ('0.048', '120')]
+
+    def setUp(self):
+        self.side = BookSide.from_levels(self.LEVELS, True, digits=8)
+
+    def test_storage(self):
+        self.assertIsInstance(self.side.prices, array)
+        self.assertEqual(self.side.prices.typecode, 'q')
+        self.assertEqual(list(self.side.prices), [5000000, 4990000, 4800000])
+        self.assertEqual(list(self.side.volumes), [150000000, 1, 12000000000])
+        self.assertIsInstance(BookSide(digits=8).prices, array)
+
+    def test_reads_decimals(self):
+        decimal_side = BookSide.from_levels(self.LEVELS, True)
+        self.assertEqual(levels(self.side), levels(decimal_side))
+        self.assertIsInstance(self.side.price(0), Decimal)
+        self.assertEqual((self.side[-1].p, self.side[-1].v), (Decimal('0.048'), 120))
+        for n in (None, 0, 1, 2, 3):
+            self.assertEqual(self.side.cumulative_base_volume(n), decimal_side.cumulative_base_volume(n))
+            self.assertEqual(self.side.cumulative_alt_volume(n), decimal_side.cumulative_alt_volume(n))
+        # 0.075 + 0.000000000499 + 5.76, exact with 16 digits
+        self.assertEqual(self.side.cumulative_alt_volume(), Decimal('5.835000000499'))
+
+    def test_truncates_input(self):
+        side = BookSide.from_levels([('0.123456789', '1.000000009')], False, digits=8)
+        self.assertEqual(levels(side), [(Decimal('0.12345678'), 1)])
+
+    def test_changes(self):
+        self.side.update_level('0.0495', '2')
+        self.side.update_level(Decimal('0.0499'), 0)
+        self.side.set_volume(0, Decimal('0.5'))
+        self.assertEqual(levels(self.side), [(Decimal('0.05'), Decimal('0.5')), (Decimal('0.0495'), 2),
+                                             (Decimal('0.048'), 120)])
+        self.assertEqual(self.side.cumulative_base_volume(), Decimal('122.5'))
+        self.assertEqual(self.side.prices.typecode, 'q')
+        side = BookSide.from_levels(self.LEVELS[::-1], True, digits=8)
+        side.sort()
+        self.assertEqual(side.prices.typecode, 'q')
+        self.assertEqual(levels(side), levels(BookSide.from_levels(self.LEVELS, True)))
+
+    def test_same_levels(self):
+        self.assertTrue(self.side.same_levels(BookSide.from_levels(self.LEVELS, True, digits=8)))
+        self.assertFalse(self.side.same_levels(BookSide.from_levels(self.LEVELS, True)))
+        self.assertFalse(self.side.same_levels(BookSide.from_levels(self.LEVELS, True, digits=6)))
+
+
+class TestClip(unittest.TestCase):
+    # 1 base at 10, 2 at 8 and 3 at 5: 1, 3 and 6 base in total, 10, 26 and 41 alt
+    LEVELS = [('10', '1'), ('8', '2'), ('5', '3')]
+
+    def sides(self):
+        return [BookSide.from_levels(self.LEVELS, True), BookSide.from_levels(self.LEVELS, True, digits=8)]
+
+    def test_cut_on_level_boundary(self):
+        for side in self.sides():
+            clipped = side.clip_base_volume(3)
+            self.assertEqual(levels(clipped), [(10, 1), (8, 2)])
+            self.assertEqual(clipped.cumulative_base_volume(), 3)
+            self.assertEqual(clipped.cumulative_alt_volume(), 26)
+            self.assertEqual(levels(side.clip_alt_volume(26)), [(10, 1), (8, 2)])
+            # the whole side
+            self.assertEqual(levels(side.clip_base_volume(6)), levels(side))
+
+    def test_partial_last_level(self):
+        for side in self.sides():
+            clipped = side.clip_base_volume(4)
+            self.assertEqual(levels(clipped), [(10, 1), (8, 2), (5, 1)])
+            self.assertEqual(clipped.cumulative_base_volume(), 4)
+            self.assertEqual(clipped.cumulative_alt_volume(), 31)
+            # the best levels are still read from the side, only the last one is cut
+            self.assertEqual(clipped.cumulative_base_volume(2), 3)
+            # 31 alt is 26 for the first two levels and 1 base at 5
+            clipped = side.clip_alt_volume(31)
+            self.assertEqual(levels(clipped), [(10, 1), (8, 2), (5, 1)])
+            self.assertEqual(clipped.cumulative_alt_volume(), 31)
+            # inside the first level
+            self.assertEqual(levels(side.clip_base_volume(Decimal('0.5'))), [(10, Decimal('0.5'))])
+            self.assertEqual(levels(side.clip_alt_volume(5)), [(10, Decimal('0.5'))])
+
+    def test_more_than_the_side(self):
+        for side in self.sides():
+            self.assertIsNone(side.clip_base_volume(Decimal('6.01')))
+            self.assertIsNone(side.clip_alt_volume(42))
+        self.assertIsNone(BookSide().clip_base_volume(1))
+        self.assertIsNone(BookSide(digits=8).clip_alt_volume(1))
+
+    def test_inverted(self):
+        # seen from the reverse market: 10 at 0.1, 16 at 0.125 and 15 at 0.2, best (lowest) first
+        for side in self.sides():
+            inverted = side.inverted()
+            clipped = inverted.clip_base_volume(26)
+            self.assertEqual([o.v for o in clipped], [10, 16])
+            self.assertEqual(clipped.cumulative_alt_volume(), 3)
+            clipped = inverted.clip_base_volume(31)
+            self.assertEqual([o.v for o in clipped], [10, 16, 5])
+            self.assertEqual(clipped.cumulative_alt_volume(), 4)
+            self.assertEqual([o.v for o in inverted.clip_alt_volume(3)], [10, 16])
+            clipped = inverted.clip_alt_volume(4)
+            self.assertEqual([o.v for o in clipped], [10, 16, 5])
+            self.assertEqual(clipped.cumulative_base_volume(), 31)
+            self.assertIsNone(inverted.clip_base_volume(42))
+            self.assertIsNone(inverted.clip_alt_volume(7))
+
+    def test_negative_indices(self):
+        for side in self.sides():
+            clipped = side.clip_base_volume(2)
+            # the last clipped level, not the last level of the side
+            self.assertEqual(clipped.price(-1), 8)
+            self.assertEqual(clipped.volume(-1), 1)
+            self.assertEqual(levels(clipped[-1:]), levels(clipped[1:]))
+            self.assertEqual(clipped.price(-2), 10)
+            self.assertRaises(IndexError, clipped.price, 2)
+            self.assertRaises(IndexError, clipped.volume, -3)
+            self.assertEqual((clipped[-1].p, clipped[-1].v), (8, 1))
+
+
+def swapped_side(side, descending):
+    # the side materialized in units of the reverse market, level by level, then sorted
+    orders = [get_swapped_order(o) for o in side]
+    swapped = BookSide([o.p for o in orders], [o.v for o in orders], descending)
+    swapped.sort()
+    return swapped
+
+
+class TestInverted(unittest.TestCase):
+    def books(self):
+        bids = [('0.05', '1'), ('0.04', '10'), ('0.032', '25')]
+        asks = [('0.051', '1'), ('0.0625', '2')]
+        return [OrderBook.from_levels(bids, asks), OrderBook.from_levels(bids, asks, digits=8)]
+
+    def test_matches_swapped_book(self):
+        for book in self.books():
+            inverted = book.inverted()
+            # the reverse market's bids are the asks swapped and the other way around
+            for side, expected in ((inverted.bids, swapped_side(book.asks, True)),
+                                   (inverted.asks, swapped_side(book.bids, False))):
+                self.assertEqual(side.descending, expected.descending)
+                self.assertEqual(levels(side), levels(expected))
+                self.assertTrue(side.is_sorted())
+                # the view's alt volumes are the underlying base volumes, exact. the swapped book's
+                # (1 / p) * (p * v) can be off in the last digit, depending on the decimal context
+                for n in list(range(len(expected) + 1)) + [None]:
+                    self.assertEqual(side.cumulative_base_volume(n), expected.cumulative_base_volume(n))
+                    self.assertAlmostEqual(side.cumulative_alt_volume(n), expected.cumulative_alt_volume(n),
+                                           places=20)
+                self.assertEqual(levels(side[1:]), levels(expected[1:]))
+                self.assertEqual((side[-1].p, side[-1].v), (expected[-1].p, expected[-1].v))
+            self.assertEqual(inverted.best_bid(), 1 / Decimal('0.051'))
+            self.assertEqual(inverted.best_ask(), 1 / Decimal('0.05'))
+
+    def test_inverting_back(self):
+        for book in self.books():
+            inverted = book.inverted()
+            self.assertIs(inverted.inverted().bids, book.bids)
+            self.assertIs(inverted.inverted().asks, book.asks)
+            self.assertTrue(inverted.inverted().same_levels(book))
+
+    def test_follows_changes(self):
+        # the view converts lazily, and drops what it converted when the underlying side changes
+        book = self.books()[0]
+        inverted = book.inverted()
+        self.assertEqual(inverted.asks.best_volume(), Decimal('0.05'))
+        book.bids.update_level('0.055', '2')
+        self.assertEqual(levels(inverted.asks), levels(swapped_side(book.bids, False)))
+        self.assertEqual(inverted.asks.best_price(), 1 / Decimal('0.055'))
+
+
+class TestEnsureSorted(unittest.TestCase):
+    def test_already_sorted(self):
+        for digits in (None, 8):
+            side = BookSide.from_levels([('0.05', '1'), ('0.04', '2'), ('0.04', '3')], True, digits)
+            prices = side.prices
+            self.assertFalse(side.ensure_sorted())
+            # nothing is copied or reset
+            self.assertIs(side.prices, prices)
+            self.assertEqual(side.version, 0)
+
+    def test_worst_first(self):
+        for digits in (None, 8):
+            side = BookSide.from_levels([('0.06', '3'), ('0.052', '2'), ('0.051', '1')], False, digits)
+            self.assertTrue(side.ensure_sorted())
+            self.assertEqual(levels(side), [(Decimal('0.051'), 1), (Decimal('0.052'), 2), (Decimal('0.06'), 3)])
+            self.assertTrue(side.is_sorted())
+
+    def test_out_of_order(self):
+        for digits in (None, 8):
+            side = BookSide.from_levels([('0.04', '2'), ('0.05', '1'), ('0.03', '3')], True, digits)
+            side.cumulative_base_volume()
+            self.assertTrue(side.ensure_sorted())
+            self.assertEqual(levels(side), [(Decimal('0.05'), 1), (Decimal('0.04'), 2), (Decimal('0.03'), 3)])
+            # the cached volumes went with the old order
+            self.assertEqual(side.cumulative_base_volume(1), 1)
+            self.assertFalse(side.ensure_sorted())
+
+    def test_book(self):
+        book = OrderBook.from_levels([('0.05', '1'), ('0.04', '2')], [('0.06', '3'), ('0.051', '1')])
+        self.assertTrue(book.ensure_sorted())
+        self.assertEqual(book.best_ask(), Decimal('0.051'))
+        self.assertFalse(book.ensure_sorted())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,179 @@
+import logging
+import math
+import random
+import unittest
+from decimal import Decimal
+
+import numpy as np
+
+from Broker import Broker
+from OrderBook import BookSide, OrderBook
+from PairwiseCalculator import PairwiseCalculator, walk_order_books
+
+
+def bids(*levels):
+    return BookSide.from_levels(levels, True)
+
+
+def asks(*levels):
+    return BookSide.from_levels(levels, False)
+
+
+def orders(plan, key):
+    return [(o.p, o.v, o.type) for o in plan[key]]
+
+
+class TestWalkOrderBooks(unittest.TestCase):
+    def setUp(self):
+        self.bids = bids(('110', '2'), ('105', '3'))
+        self.asks = asks(('100', '1'), ('104', '3'), ('108', '5'))
+
+    def test_partial_fills(self):
+        # margins 10, 6 and 1 on the first 4 units, the 108 ask would lose 3 a unit
+        plan = walk_order_books(self.bids, 0, self.asks, 0)
+        self.assertEqual(plan['base_volume'], 4)
+        self.assertEqual(plan['profit'], 18)
+        self.assertEqual(orders(plan, 'bidder_orders'), [(110, 2, 'sell'), (105, 2, 'sell')])
+        self.assertEqual(orders(plan, 'asker_orders'), [(100, 1, 'buy'), (104, 3, 'buy')])
+
+    def test_fees(self):
+        fee = Decimal('0.01')
+        plan = walk_order_books(bids(('110', '1')), fee, asks(('100', '2')), fee)
+        # the 1 base the bidder gets costs 1 / 0.99 base on the ask side
+        self.assertEqual(plan['base_volume'], 1)
+        self.assertEqual(plan['profit'], 110 * (1 - fee) - 100 / (1 - fee))
+        self.assertEqual(orders(plan, 'asker_orders'), [(100, 1 / (1 - fee), 'buy')])
+
+    def test_unprofitable_top_of_book(self):
+        self.assertIsNone(walk_order_books(bids(('99', '1')), 0, asks(('100', '1')), 0))
+        self.assertIsNone(walk_order_books(bids(('100', '1')), 0, asks(('100', '1')), 0))
+        # profitable before fees only
+        fee = Decimal('0.002')
+        self.assertIsNone(walk_order_books(bids(('100.3', '1')), fee, asks(('100', '1')), fee))
+
+    def test_empty_books(self):
+        self.assertIsNone(walk_order_books(bids(), 0, self.asks, 0))
+        self.assertIsNone(walk_order_books(self.bids, 0, asks(), 0))
+
+    def test_min_volume_below_profitable_volume(self):
+        plan = walk_order_books(self.bids, 0, self.asks, 0, min_base_vol=3)
+        self.assertEqual(plan['base_volume'], 4)
+        self.assertEqual(plan['profit'], 18)
+
+    def test_min_volume_clips_into_losing_levels(self):
+        # the 5th unit loses 3 but is needed to reach the minimum, and no more than that is taken
+        plan = walk_order_books(self.bids, 0, self.asks, 0, min_base_vol=5)
+        self.assertEqual(plan['base_volume'], 5)
+        self.assertEqual(plan['profit'], 15)
+        self.assertEqual(orders(plan, 'asker_orders'), [(100, 1, 'buy'), (104, 3, 'buy'), (108, 1, 'buy')])
+
+    def test_min_volume_out_of_reach(self):
+        # only 5 base is bid for
+        self.assertIsNone(walk_order_books(self.bids, 0, self.asks, 0, min_base_vol=6))
+        # reachable, but the forced volume loses more than the rest makes
+        self.assertIsNone(walk_order_books(bids(('101', '1'), ('90', '10')), 0, asks(('100', '10')), 0,
+                                           min_base_vol=2))
+
+
+class StubExchange(object):
+    fixed_point_digits = None
+    log = logging.getLogger('test')
+
+    def __init__(self, name, trading_fee):
+        self.name = name
+        self.trading_fee = Decimal(trading_fee)
+
+    def get_min_vol(self, pair, depth):
+        return Decimal('0.01')
+
+
+PAIRS = [('ETH', 'BTC'), ('LTC', 'BTC')]
+
+
+def make_brokers(books):
+    # books[exchange][slug] = (bid, ask), three exchanges that don't all share every pair
+    xchgs = [StubExchange('A', '0.002'), StubExchange('B', '0.001'), StubExchange('C', '0.0025')]
+    brokers = [Broker('PAPER', xchg) for xchg in xchgs]
+    for broker in brokers:
+        for slug, (bid, ask) in books[broker.xchg.name].items():
+            set_book(broker, slug, bid, ask)
+    A, B, C = xchgs
+    shared_pairs = {frozenset([A, B]): PAIRS, frozenset([A, C]): [PAIRS[0]], frozenset([B, C]): [PAIRS[1]]}
+    return brokers, {xchg: PAIRS for xchg in xchgs}, shared_pairs
+
+
+def set_book(broker, slug, bid, ask):
+    broker.depth[slug] = OrderBook.from_levels([(bid, '1'), (Decimal(bid) * Decimal('0.99'), '5')] if bid else [],
+                                               [(ask, '1'), (Decimal(ask) * Decimal('1.01'), '5')] if ask else [])
+
+
+class TestProfitSpread(unittest.TestCase):
+    BOOKS = {'A': {'ETH_BTC': ('0.0505', '0.0507'), 'LTC_BTC': ('0.0102', '0.0103')},
+             'B': {'ETH_BTC': ('0.0499', '0.0501'), 'LTC_BTC': ('0.0104', '0.0105')},
+             'C': {'ETH_BTC': ('0.051', '0.0512'), 'LTC_BTC': (None, '0.0101')}}
+
+    def test_matches_scalar_formula(self):
+        brokers, pairs_to_update, shared_pairs = make_brokers(self.BOOKS)
+        pc = PairwiseCalculator(brokers, pairs_to_update, shared_pairs, 'test')
+        self.assertEqual(pc.profit_spread.shape, (3, 3, 2))
+        for b, bidder in enumerate(brokers):
+            for a, asker in enumerate(brokers):
+                for p, pair in enumerate(pc.pairs):
+                    spread = pc.profit_spread[b, a, p]
+                    bid = bidder.get_highest_bid(pair)
+                    ask = asker.get_lowest_ask(pair)
+                    shared = b != a and pair in shared_pairs[frozenset([bidder.xchg, asker.xchg])]
+                    if not shared or bid is None or ask is None:
+                        # not tradeable between the two, or C has no LTC bids
+                        self.assertTrue(math.isnan(spread), (b, a, pair))
+                        continue
+                    expected = bid * (1 - bidder.xchg.trading_fee) * (1 - asker.xchg.trading_fee) / ask
+                    self.assertAlmostEqual(spread, float(expected), places=12)
+        # C doesn't trade LTC with A, even though C's ask is the lowest
+        self.assertTrue(math.isnan(pc.profit_spread[0, 2, pc.pair_index[('LTC', 'BTC')]]))
+
+
+class TestIncrementalUpdate(unittest.TestCase):
+    def test_matches_full_recompute(self):
+        r = random.Random(1)
+
+        def quote():
+            if r.random() < 0.1:
+                return None, None  # emptied book
+            bid = Decimal(r.randint(4970, 5030)) / 100000
+            return bid, bid * Decimal('1.002')
+
+        books = {name: {slug: quote() for slug in ('ETH_BTC', 'LTC_BTC')} for name in 'ABC'}
+        brokers, pairs_to_update, shared_pairs = make_brokers(books)
+        pc = PairwiseCalculator(brokers, pairs_to_update, shared_pairs, 'test')
+        pc.check_profits()
+        profitable_ticks = 0
+        for _ in range(50):
+            # a couple of books change each tick, the calculator is kept across ticks
+            changed = set()
+            for _ in range(r.randint(1, 3)):
+                broker = r.choice(brokers)
+                pair = r.choice(PAIRS)
+                set_book(broker, '_'.join(pair), *quote())
+                changed.add((broker.xchg, pair))
+            found = pc.update(changed)
+            full = PairwiseCalculator(brokers, pairs_to_update, shared_pairs, 'test')
+            full.check_profits()
+            np.testing.assert_array_equal(pc.profit_spread, full.profit_spread)
+            self.assertEqual(pc.profits, full.profits)
+            self.assertEqual(set(pc.orders), set(full.orders))
+            self.assertEqual(found, len(full.profits) > 0)
+            profitable_ticks += found
+        # the random books did open and close opportunities along the way
+        self.assertTrue(0 < profitable_ticks < 50)
+
+    def test_unknown_books_are_ignored(self):
+        brokers, pairs_to_update, shared_pairs = make_brokers(TestProfitSpread.BOOKS)
+        pc = PairwiseCalculator(brokers, pairs_to_update, shared_pairs, 'test')
+        spread = pc.profit_spread.copy()
+        self.assertFalse(pc.update([(brokers[0].xchg, ('XRP', 'BTC')), (StubExchange('D', '0'), PAIRS[0])]))
+        np.testing.assert_array_equal(pc.profit_spread, spread)
+
+
+if __name__ == '__main__':
+    unittest.main()
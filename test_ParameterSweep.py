@@ -0,0 +1,72 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import config
+from MetadataCache import MetadataCache
+from OrderBook import OrderBook
+from PairwiseCalculator import PairwiseCalculator
+from ParameterSweep import grid, set_parameters, sweep
+from TickRecorder import TickRecorder
+
+# the ETH_BTC books main_pair.py's exchanges recorded at each of 3 ticks, (bid, ask) on every exchange.
+# on the first tick BTER's bid is 1.6% over Poloniex's ask and 1% over Bitfinex's, before ~0.45% of fees.
+# after that nothing pays
+TICKS = [{'BTER': ('0.0508', '0.0509'), 'Poloniex': ('0.0499', '0.05'), 'Bitfinex': ('0.0502', '0.0503')},
+         {'BTER': ('0.0502', '0.0503'), 'Poloniex': ('0.0499', '0.05'), 'Bitfinex': ('0.0501', '0.0502')},
+         {'BTER': ('0.0501', '0.0502'), 'Poloniex': ('0.0499', '0.05'), 'Bitfinex': ('0.0501', '0.0502')}]
+SYMBOLS = {'BTER': 'eth_btc', 'Bitfinex': 'ethbtc', 'Poloniex': 'BTC_ETH'}
+
+
+class TestSweep(unittest.TestCase):
+    def setUp(self):
+        # bots log into ./log, the workers build them offline from the metadata cache
+        self.cwd = os.getcwd()
+        self.dir = tempfile.mkdtemp()
+        os.chdir(self.dir)
+        os.mkdir('log')
+        self.saved = config.METADATA_CACHE, config.OFFLINE
+        config.METADATA_CACHE = os.path.join(self.dir, 'metadata.json')
+        cache = MetadataCache(config.METADATA_CACHE, 60)
+        for name, symbol in SYMBOLS.items():
+            cache.store(name, {'pairs': [['ETH', 'BTC']], 'min_volumes': {symbol: '0.001'},
+                               'majors': ['BTC', 'ETH'], 'fee': '0.002'})
+        self.tick_dir = os.path.join(self.dir, 'ticks')
+        recorder = TickRecorder(self.tick_dir)
+        for t, books in enumerate(TICKS):
+            for name, (bid, ask) in books.items():
+                recorder.record(float(t), name, {'ETH_BTC': OrderBook.from_levels([(bid, '10')], [(ask, '10')])})
+        recorder.stop()
+
+    def tearDown(self):
+        config.METADATA_CACHE, config.OFFLINE = self.saved
+        set_parameters({})
+        os.chdir(self.cwd)
+        shutil.rmtree(self.dir)
+
+    def test_two_points(self):
+        out = os.path.join(self.dir, 'sweep.jsonl')
+        configs = grid(spread_threshold=[1.001, 1.01])
+        results = sweep(configs, ('pair',), processes=2, out=out, tick_dir=self.tick_dir)
+        self.assertEqual([result['params'] for result in results], configs)
+        self.assertEqual([result['ticks'] for result in results], [3, 3])
+        # the 1.6% spread is an opportunity either way, the 1% one only under the lower threshold
+        self.assertEqual([result['opportunities'] for result in results], [2, 1])
+        self.assertEqual([list(result['profit']) for result in results], [['BTC'], ['BTC']])
+        with open(out) as f:
+            self.assertEqual([json.loads(line) for line in f], results)
+
+    def test_defaults(self):
+        self.assertEqual(PairwiseCalculator.btc_risk, config.BTC_RISK)
+        set_parameters({'btc_risk': None, 'spread_threshold': 1.01})
+        self.assertIsNone(PairwiseCalculator.btc_risk)
+        # parameters left out go back to their defaults
+        set_parameters({})
+        self.assertEqual(PairwiseCalculator.btc_risk, config.BTC_RISK)
+        self.assertEqual(PairwiseCalculator.spread_threshold, 1.001)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import shutil
+import tempfile
+import unittest
+from decimal import Decimal
+
+from OrderBook import OrderBook
+from TickRecorder import TickRecorder
+from TickStore import TickReader
+
+
+def levels(side):
+    return [(o.p, o.v) for o in side]
+
+
+class TestTickRecorder(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.recorder = TickRecorder(self.dir)
+        self.book = OrderBook.from_levels([('0.01', '30'), ('0.009', '50')], [('0.0103', '20')])
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def read(self, t, slug):
+        self.recorder.stop()
+        reader = TickReader(self.dir + '/Stub')
+        return reader.pairs, reader.book_at(slug, t)
+
+    def test_records_books_as_fetched(self):
+        self.recorder.record(1.0, 'Stub', {'LTC_BTC': self.book})
+        pairs, book = self.read(1.0, 'LTC_BTC')
+        self.assertEqual(pairs, ['LTC_BTC'])
+        self.assertEqual(levels(book.bids), levels(self.book.bids))
+        self.assertEqual(levels(book.asks), levels(self.book.asks))
+
+    def test_records_inverted_views_as_listed(self):
+        # BTC_LTC is only a view of LTC_BTC, 1 / 0.0103 would lose digits in the store
+        self.recorder.record(1.0, 'Stub', {'BTC_LTC': self.book.inverted()})
+        pairs, book = self.read(1.0, 'LTC_BTC')
+        self.assertEqual(pairs, ['LTC_BTC'])
+        self.assertEqual(levels(book.bids), [(Decimal('0.01'), 30), (Decimal('0.009'), 50)])
+        self.assertEqual(levels(book.asks), [(Decimal('0.0103'), 20)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import unittest
+from unittest import mock
+
+from TickScheduler import TickScheduler
+
+
+class FakeClock(object):
+    # stands in for the time module, sleeping just moves the clock
+    def __init__(self):
+        self.now = 100.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class FakeEvent(object):
+    # data arrives at the given clock times
+    def __init__(self, clock, arrivals):
+        self.clock = clock
+        self.arrivals = list(arrivals)
+
+    def wait(self, timeout=None):
+        if self.arrivals and (timeout is None or self.arrivals[0] <= self.clock.now + timeout):
+            self.clock.now = max(self.clock.now, self.arrivals.pop(0))
+            return True
+        self.clock.now += timeout
+        return False
+
+
+class TestTickScheduler(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch('TickScheduler.time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def run_ticks(self, scheduler, work):
+        # runs a tick of work[i] seconds after each wait, returns (reason, time) of each tick
+        ticks = []
+        for seconds in work:
+            reason = scheduler.wait()
+            ticks.append((reason, self.clock.now - 100))
+            self.clock.sleep(seconds)
+        return ticks
+
+    def test_deadlines_do_not_drift(self):
+        scheduler = TickScheduler(10)
+        ticks = self.run_ticks(scheduler, [3, 7, 9.5, 0, 4])
+        self.assertEqual(ticks, [('timer', 0), ('timer', 10), ('timer', 20), ('timer', 30), ('timer', 40)])
+        self.assertEqual(scheduler.stats['missed'], 0)
+
+    def test_missed_ticks(self):
+        scheduler = TickScheduler(10)
+        # the first tick takes 25s: the deadline at 10 is served late, the one at 20 is missed
+        ticks = self.run_ticks(scheduler, [25, 3, 3])
+        self.assertEqual(ticks, [('timer', 0), ('timer', 25), ('timer', 30)])
+        self.assertEqual(scheduler.stats['missed'], 1)
+        # a tick that overruns by several periods turns into one catch-up tick
+        self.clock.sleep(47)
+        ticks = self.run_ticks(scheduler, [0, 0])
+        self.assertEqual(ticks, [('timer', 80), ('timer', 90)])
+        self.assertEqual(scheduler.stats['missed'], 5)
+        self.assertEqual(scheduler.stats['ticks'], 5)
+
+    def test_data_wakes_up_early(self):
+        scheduler = TickScheduler(10, FakeEvent(self.clock, [104, 117]))
+        ticks = self.run_ticks(scheduler, [0, 1, 1, 0])
+        # data at 4 and 17 each push the next timer tick a full period further down the grid
+        self.assertEqual(ticks, [('timer', 0), ('data', 4), ('data', 17), ('timer', 30)])
+        self.assertEqual(scheduler.stats, {'ticks': 4, 'data': 2, 'timer': 2, 'missed': 0, 'throttled': 0})
+
+    def test_data_only(self):
+        # no period, every tick waits for data. data that came in during a tick is served right after it
+        scheduler = TickScheduler(0, FakeEvent(self.clock, [105, 105.5, 140]))
+        self.assertEqual(self.run_ticks(scheduler, [1, 0, 0]), [('data', 5), ('data', 6), ('data', 40)])
+
+    def test_throttle(self):
+        delays = [0, 2.5, 0]
+        scheduler = TickScheduler(10, throttle=lambda: delays.pop(0))
+        ticks = self.run_ticks(scheduler, [1, 1, 1])
+        # the held back tick doesn't move the grid
+        self.assertEqual(ticks, [('timer', 0), ('timer', 12.5), ('timer', 20)])
+        self.assertEqual(scheduler.stats['throttled'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+import logging
+import unittest
+from decimal import Decimal
+
+from Broker import Broker
+from OrderBook import BookSide, OrderBook
+from TriangularCalculator import TriangularCalculator, walk_roundtrip
+
+
+def leg(*levels):
+    return BookSide.from_levels(levels, True)
+
+
+def orders(trip):
+    return [[(o.p, o.v) for o in leg_orders] for leg_orders in trip['orders']]
+
+
+class TestWalkRoundtrip(unittest.TestCase):
+    def test_single_level(self):
+        # 1A -> 2B -> 1.2C -> 1.2A, the first leg only takes 10A
+        trip = walk_roundtrip([leg(('2', '10')), leg(('0.6', '100')), leg(('1', '100'))], 1)
+        self.assertEqual(trip['volume'], 10)
+        self.assertEqual(trip['profit'], 2)
+        self.assertEqual(orders(trip), [[(2, 10)], [(Decimal('0.6'), 20)], [(1, 12)]])
+
+    def test_fees(self):
+        tx = Decimal('0.998')
+        trip = walk_roundtrip([leg(('2', '10')), leg(('0.6', '100')), leg(('1', '100'))], tx)
+        self.assertEqual(trip['volume'], 10)
+        self.assertEqual(trip['profit'], 10 * (Decimal('1.2') * tx ** 3 - 1))
+
+    def test_multiple_levels(self):
+        # B_C runs out of its first level after 3A, A_B after 5A, and A_B is out of depth after 15A
+        legs = [leg(('2', '5'), ('1.9', '10')), leg(('0.6', '6'), ('0.55', '100')), leg(('1', '100'))]
+        trip = walk_roundtrip(legs, 1)
+        self.assertEqual(trip['volume'], 15)
+        self.assertEqual(trip['profit'], Decimal('0.6') + Decimal('0.2') + Decimal('0.45'))
+        self.assertEqual(orders(trip), [[(2, 5), (Decimal('1.9'), 10)],
+                                        [(Decimal('0.6'), 6), (Decimal('0.55'), 23)],
+                                        [(1, Decimal('16.25'))]])
+
+    def test_leg_out_of_depth(self):
+        # only 4B can be sold, i.e. 2A put in
+        trip = walk_roundtrip([leg(('2', '100')), leg(('0.6', '4')), leg(('1', '100'))], 1)
+        self.assertEqual(trip['volume'], 2)
+        self.assertEqual(trip['profit'], Decimal('0.4'))
+        self.assertIsNone(walk_roundtrip([leg(('2', '100')), leg(), leg(('1', '100'))], 1))
+
+    def test_min_volume(self):
+        # 10A at +0.2 each, the 1.5 level after it loses 0.1 per A
+        legs = [leg(('2', '10'), ('1.5', '100')), leg(('0.6', '1000')), leg(('1', '1000'))]
+        trip = walk_roundtrip(legs, 1, min_volume=5)
+        self.assertEqual(trip['volume'], 10)
+        self.assertEqual(trip['profit'], 2)
+        # past the profitable volume only as far as the minimum
+        trip = walk_roundtrip(legs, 1, min_volume=12)
+        self.assertEqual(trip['volume'], 12)
+        self.assertEqual(trip['profit'], Decimal('1.8'))
+        self.assertEqual(orders(trip)[0], [(2, 10), (Decimal('1.5'), 2)])
+        # the forced volume loses more than the rest makes
+        self.assertIsNone(walk_roundtrip(legs, 1, min_volume=40))
+        # more than the books hold
+        self.assertIsNone(walk_roundtrip([leg(('2', '10')), leg(('0.6', '100')), leg(('1', '100'))], 1,
+                                         min_volume=11))
+
+    def test_unprofitable(self):
+        self.assertIsNone(walk_roundtrip([leg(('2', '10')), leg(('0.5', '100')), leg(('1', '100'))], 1))
+        # profitable before fees only
+        self.assertIsNone(walk_roundtrip([leg(('2', '10')), leg(('0.501', '100')), leg(('1', '100'))],
+                                         Decimal('0.998')))
+
+
+class StubExchange(object):
+    # min_volume of base on every market, None from get_min_vol when the book can't fill it
+    name = 'Stub'
+    fixed_point_digits = None
+    trading_fee = Decimal('0.002')
+    log = logging.getLogger('test')
+
+    def __init__(self, min_volume):
+        self.min_volume = min_volume
+
+    def get_min_vol(self, pair, depth):
+        if depth.clip_base_volume(self.min_volume) is None:
+            return None
+        return self.min_volume
+
+
+class TestCheckRoundtrip(unittest.TestCase):
+    def calculator(self, min_volume):
+        broker = Broker('PAPER', StubExchange(Decimal(min_volume)))
+        # BTC -> ETH -> LTC -> BTC pays 20 * 5 * 0.0105 = 1.05 before fees
+        # and the books take 10 BTC, 1000 ETH and 10000 LTC
+        for slug, bid, volume in (('BTC_ETH', '20', '10'), ('ETH_LTC', '5', '1000'), ('LTC_BTC', '0.0105', '10000')):
+            broker.depth[slug] = OrderBook.from_levels([(bid, volume)], [])
+        return TriangularCalculator(broker, 'BTC', [('ETH', 'LTC')], 'test')
+
+    def test_roundtrip(self):
+        pc = self.calculator('0.1')
+        self.assertTrue(pc.check_roundtrip('BTC', 'ETH', 'LTC'))
+        self.assertEqual(pc.roundtrips['ETH_LTC']['volume'], 10)
+
+    def test_book_thinner_than_min_volume(self):
+        # 10 BTC can't fill a 20 BTC minimum, the roundtrip is skipped rather than failing the tick
+        pc = self.calculator('20')
+        self.assertFalse(pc.check_roundtrip('BTC', 'ETH', 'LTC'))
+        self.assertEqual(pc.roundtrips, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
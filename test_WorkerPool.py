@@ -0,0 +1,117 @@
+import threading
+import time
+import unittest
+
+from WorkerPool import WorkerPool, current_owner
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() > deadline:
+            raise AssertionError('timed out')
+        time.sleep(0.001)
+
+
+class TestWorkerPool(unittest.TestCase):
+    def setUp(self):
+        self.release = threading.Event()
+        self.ran = []
+        self.pools = []
+
+    def tearDown(self):
+        self.release.set()
+        for pool in self.pools:
+            pool.stop()
+
+    def pool(self, workers, per_exchange):
+        pool = WorkerPool(workers, per_exchange)
+        self.pools.append(pool)
+        return pool
+
+    def blocked(self, name):
+        # a job that holds its worker until the test lets go
+        self.ran.append(name)
+        self.release.wait()
+        return name
+
+    def test_per_exchange_cap(self):
+        pool = self.pool(4, 2)
+        futures = [pool.submit('X', self.blocked, i) for i in range(5)]
+        wait_for(lambda: pool.metrics()['running'] == {'X': 2})
+        # the other workers stay free for other exchanges
+        self.assertEqual(pool.submit('Y', lambda: 'y').result(5), 'y')
+        metrics = pool.metrics()
+        self.assertEqual(metrics['running'], {'X': 2})
+        self.assertEqual(metrics['queued'], {'X': 3})
+        self.assertEqual(pool.queue_depths(), {'X': 3})
+        self.assertEqual(len(pool.threads), 4)
+        self.release.set()
+        self.assertEqual([f.result(5) for f in futures], list(range(5)))
+        wait_for(lambda: pool.metrics()['running'] == {})
+        self.assertEqual(pool.metrics()['queued'], {})
+
+    def test_owners_take_turns(self):
+        pool = self.pool(1, 1)
+        first = pool.submit('X', self.blocked, 'first', owner='a')
+        wait_for(lambda: self.ran)
+        futures = [pool.submit('X', self.ran.append, 'a%d' % i, owner='a') for i in range(3)]
+        futures.append(pool.submit('X', self.ran.append, 'b0', owner='b'))
+        self.release.set()
+        [f.result(5) for f in [first] + futures]
+        self.assertEqual(self.ran, ['first', 'a0', 'b0', 'a1', 'a2'])
+
+    def test_cancel(self):
+        pool = self.pool(1, 1)
+        running = pool.submit('X', self.blocked, 'running', owner='old')
+        wait_for(lambda: self.ran)
+        stale = [pool.submit('X', self.ran.append, i, owner='old') for i in range(3)]
+        fresh = pool.submit('Y', self.ran.append, 'fresh', owner='new')
+        self.assertEqual(pool.cancel('old'), 3)
+        self.assertEqual(pool.cancel('old'), 0)
+        self.assertTrue(all(f.cancelled() for f in stale))
+        self.assertEqual(pool.metrics()['queued'], {'Y': 1})
+        # the job that was already running finishes on its own
+        self.release.set()
+        self.assertEqual(running.result(5), 'running')
+        fresh.result(5)
+        self.assertEqual(self.ran, ['running', 'fresh'])
+        self.assertEqual(pool.metrics()['stats']['cancelled'], 3)
+
+    def test_cancelled_future_is_skipped(self):
+        pool = self.pool(1, 1)
+        pool.submit('X', self.blocked, 'running')
+        wait_for(lambda: self.ran)
+        dropped = pool.submit('X', self.ran.append, 'dropped')
+        self.assertTrue(dropped.cancel())
+        self.release.set()
+        pool.submit('X', self.ran.append, 'after').result(5)
+        self.assertEqual(self.ran, ['running', 'after'])
+        self.assertEqual(pool.metrics()['stats']['cancelled'], 1)
+
+    def test_metrics(self):
+        pool = self.pool(2, 2)
+        self.assertEqual(pool.submit('X', lambda x: x * 2, 21).result(5), 42)
+        failed = pool.submit('X', lambda: 1 / 0)
+        self.assertRaises(ZeroDivisionError, failed.result, 5)
+        # futures resolve just before the counters are bumped
+        wait_for(lambda: pool.metrics()['stats']['completed'] + pool.metrics()['stats']['failed'] == 2)
+        self.assertEqual(pool.metrics(), {'queued': {}, 'running': {},
+                                          'stats': {'submitted': 2, 'completed': 1, 'failed': 1, 'cancelled': 0}})
+
+    def test_current_owner(self):
+        # jobs submitted without an owner are queued under the context's one
+        pool = self.pool(1, 1)
+        pool.submit('X', self.blocked, 'running')
+        wait_for(lambda: self.ran)
+        token = current_owner.set('bot')
+        try:
+            queued = pool.submit('X', self.ran.append, 'queued')
+        finally:
+            current_owner.reset(token)
+        self.assertEqual(pool.cancel('bot'), 1)
+        self.assertTrue(queued.cancelled())
+
+
+if __name__ == '__main__':
+    unittest.main()
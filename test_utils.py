@@ -0,0 +1,41 @@
+import unittest
+from decimal import Decimal
+
+from utils import from_fixed, to_fixed
+
+
+class TestFixedPoint(unittest.TestCase):
+    def test_to_fixed(self):
+        self.assertEqual(to_fixed('0.05', 8), 5000000)
+        self.assertEqual(to_fixed(Decimal('1.5'), 8), 150000000)
+        self.assertEqual(to_fixed(3, 8), 300000000)
+        self.assertEqual(to_fixed('.5', 2), 50)
+        self.assertEqual(to_fixed('5.', 2), 500)
+        self.assertEqual(to_fixed('1e-5', 8), 1000)
+        self.assertEqual(to_fixed(Decimal('2E+3'), 2), 200000)
+        self.assertEqual(to_fixed('0', 8), 0)
+
+    def test_truncates(self):
+        # digits past the last one are dropped, not rounded, towards zero for negative values too
+        self.assertEqual(to_fixed('0.123456789', 8), 12345678)
+        self.assertEqual(to_fixed('0.999999999', 8), 99999999)
+        self.assertEqual(to_fixed('-0.123456789', 8), -12345678)
+        self.assertEqual(to_fixed(Decimal('1.0000000099'), 8), 100000000)
+        self.assertEqual(to_fixed('1e-9', 8), 0)
+
+    def test_round_trip(self):
+        for s in ('0.05', '0.00000001', '123456.78901234', '21000000', '-0.5', '0'):
+            self.assertEqual(from_fixed(to_fixed(s, 8), 8), Decimal(s))
+            self.assertEqual(to_fixed(from_fixed(to_fixed(s, 8), 8), 8), to_fixed(s, 8))
+        # whatever is truncated stays truncated
+        self.assertEqual(from_fixed(to_fixed('0.123456789', 8), 8), Decimal('0.12345678'))
+
+    def test_from_fixed(self):
+        self.assertEqual(from_fixed(5000000, 8), Decimal('0.05'))
+        self.assertEqual(from_fixed(-1, 8), Decimal('-0.00000001'))
+        # price * volume carries twice the digits
+        self.assertEqual(from_fixed(to_fixed('0.05', 8) * to_fixed('3', 8), 16), Decimal('0.15'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import unittest
+from unittest import mock
+
+import utils_depth
+from utils_depth import decode, decode_selected
+
+# a small returnOrderBook('all') like payload, numbers both as strings and as JSON numbers
+PAYLOAD = '''{"BTC_ETH": {"asks": [["0.0510", 1.5], ["0.0512", 20]], "bids": [["0.0500", 3], ["0.0490", 0.25]],
+               "isFrozen": "0", "seq": 17},
+              "BTC_LTC":{"asks":[[0.0101,12.5]],"bids":[[0.01,7]],"isFrozen":"0","seq":4} ,
+              "BTC_XMR" : {"asks": [["0.002", 100]], "bids": [], "isFrozen": "1", "seq": 9}}'''
+
+
+class TestDecodeSelected(unittest.TestCase):
+    def test_matches_full_decode(self):
+        full = decode(PAYLOAD)
+        found = decode_selected(PAYLOAD, {'BTC_LTC', 'BTC_XMR'})
+        self.assertEqual(found, {'BTC_LTC': full['BTC_LTC'], 'BTC_XMR': full['BTC_XMR']})
+        # numbers keep the text they were sent as
+        self.assertEqual(found['BTC_LTC']['asks'], [['0.0101', '12.5']])
+        self.assertEqual(decode_selected(PAYLOAD, {'BTC_ETH'})['BTC_ETH']['bids'], [['0.0500', 3], ['0.0490', '0.25']])
+
+    def test_decodes_only_the_requested_books(self):
+        calls = []
+        raw_decode = utils_depth._decoder.raw_decode
+
+        def counting(text, i):
+            calls.append(i)
+            return raw_decode(text, i)
+
+        with mock.patch.object(utils_depth._decoder, 'raw_decode', counting):
+            found = decode_selected(PAYLOAD, ['BTC_LTC'])
+        self.assertEqual(list(found), ['BTC_LTC'])
+        self.assertEqual(calls, [PAYLOAD.index('{"asks":[[0.0101')])
+        # the other books aren't looked at, even if they wouldn't parse
+        broken = PAYLOAD.replace('"seq": 17}', '"seq": }')
+        self.assertRaises(ValueError, decode, broken)
+        self.assertEqual(decode_selected(broken, ['BTC_LTC']), decode_selected(PAYLOAD, ['BTC_LTC']))
+
+    def test_missing_keys(self):
+        self.assertEqual(decode_selected(PAYLOAD, ['BTC_DOGE']), {})
+        # a key that shows up as a string value first isn't taken for the key
+        text = '{"note": "BTC_ETH", "BTC_ETH": {"bids": [], "asks": []}}'
+        self.assertEqual(decode_selected(text, ['BTC_ETH']), {'BTC_ETH': {'bids': [], 'asks': []}})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,16 +1,42 @@
-import copy
 from decimal import Decimal
 
+from Order import Order
+
+# fixed-point mode stores prices and volumes as integers in units of 10^-digits
+# (8 digits = 1 satoshi for BTC), see config.FIXED_POINT_DIGITS
+
 
 def get_swapped_order(order):
     # given a bid/ask price and volume being bought/sold,
     # return the same order but as units of the reverse market.
-    c = copy.copy(order)
     alts_per_base = order.p
     vol_base = order.v
-    c.v = vol_base * alts_per_base
-    c.p = Decimal(1) / alts_per_base
-    return c
+    return Order(Decimal(1) / alts_per_base, vol_base * alts_per_base,
+                 order.type, order.pair, order.id, order.time)
+
+
+def to_fixed(value, digits):
+    """
+    converts a price/volume (str, Decimal or int) into an integer number of 10^-digits units.
+    anything past the last digit is truncated. strings are parsed directly,
+    which is much cheaper than going through Decimal first.
+    """
+    if isinstance(value, int):
+        return value * 10 ** digits
+    s = value if isinstance(value, str) else str(value)
+    if 'e' in s or 'E' in s:
+        s = format(Decimal(s), 'f')
+    negative = s.startswith('-')
+    if negative:
+        s = s[1:]
+    whole, _, frac = s.partition('.')
+    n = int(whole or '0') * 10 ** digits + int((frac + '0' * digits)[:digits] or '0')
+    return -n if negative else n
+
+
+def from_fixed(n, digits):
+    # exact conversion back to Decimal
+    return Decimal(n).scaleb(-digits)
 
 
 highest_price = lambda arr: max([o.p for o in arr])
@@ -1,24 +1,36 @@
+import importlib
+
 from Broker import Broker
 import config
-from exchanges.Bitfinex import Bitfinex
-from exchanges.BTER import BTER
-from exchanges.Poloniex import Poloniex
+
+# exchange name -> (adapter module, adapter class, keyfile setting in config)
+# adapters (and the api packages behind them) are only imported when their exchange is used
+EXCHANGE_ADAPTERS = {
+    'BTER': ('exchanges.BTER', 'BTER', 'BTER_KEYFILE'),
+    'POLO': ('exchanges.Poloniex', 'Poloniex', 'POLO_KEYFILE'),
+    'BITF': ('exchanges.Bitfinex', 'Bitfinex', 'BITF_KEYFILE'),
+}
+
+
+def get_exchange_class(xchg_name):
+    module_name, class_name = EXCHANGE_ADAPTERS[xchg_name][:2]
+    return getattr(importlib.import_module(module_name), class_name)
 
 
 # Broker utils
 def create_broker(mode, xchg_name, logger_name):
     # returns an array of Broker objects
-    if xchg_name == 'BTER':
-        xchg = BTER(config.BTER_KEYFILE, logger_name)
-    elif xchg_name == 'POLO':
-        xchg = Poloniex(config.POLO_KEYFILE, logger_name)
-    elif xchg_name == 'BITF':
-        xchg = Bitfinex(config.BITF_KEYFILE, logger_name)
-    else:
+    if xchg_name not in EXCHANGE_ADAPTERS:
         print('Exchange ' + xchg_name + ' not supported!')
         return None
+    # offline there are no private api calls to make, so no keys either
+    keyfile = None if config.OFFLINE else getattr(config, EXCHANGE_ADAPTERS[xchg_name][2])
+    xchg = get_exchange_class(xchg_name)(keyfile, logger_name)
 
     broker = Broker(mode, xchg)
+    if config.RECORD_TICKS:
+        from TickRecorder import get_recorder
+        broker.recorder = get_recorder()
     if mode == 'LIVE':
         broker.balances = broker.xchg.get_all_balances()  # use real starting balances.
     if mode == 'PAPER':
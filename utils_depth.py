@@ -0,0 +1,49 @@
+# decoding order book responses
+# exchanges send prices/volumes as JSON strings (or numbers). we keep numbers as the strings they
+# were sent as, so OrderBook.from_levels can turn them straight into Decimals or fixed-point ints
+# without going through float or a Decimal per field, and without callbacks for every value.
+
+import json
+
+# JSON numbers come back as their original text, e.g. 1.5 -> '1.5'. ints are left alone.
+_decoder = json.JSONDecoder(parse_float=str)
+_whitespace = ' \t\n\r'
+
+
+def decode(text):
+    return _decoder.decode(text)
+
+
+def decode_selected(text, keys):
+    """
+    decodes only the given top-level keys of a JSON object, e.g. the few markets we trade out of
+    Poloniex's returnOrderBook('all'), which is megabytes of books we'd otherwise parse for nothing.
+    returns {key: decoded value} for the keys that are present.
+
+    each key is located with a plain substring search and only its value is decoded.
+    a match only counts if it's a top-level key, i.e. preceded by '{' or ',', and followed by ':'.
+    that holds for exchange responses whose values never contain those keys as strings,
+    which is the case for every order book response we read (values are books of numbers).
+    """
+    found = {}
+    for key in keys:
+        needle = json.dumps(key)
+        start = 0
+        while True:
+            i = text.find(needle, start)
+            if i < 0:
+                break
+            start = i + len(needle)
+            j = i - 1
+            while j >= 0 and text[j] in _whitespace:
+                j -= 1
+            k = start
+            while k < len(text) and text[k] in _whitespace:
+                k += 1
+            if j >= 0 and text[j] in '{,' and text[k:k + 1] == ':':
+                k += 1
+                while text[k] in _whitespace:
+                    k += 1
+                found[key], _ = _decoder.raw_decode(text, k)
+                break
+    return found